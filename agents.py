@@ -2,36 +2,127 @@
 Multi-agent system with Planner, Executor, and Conversation agents
 """
 import asyncio
-import os
-from google import genai
+import re
+import time
 
-from memory import MemoryAgent
+from memory import MemoryAgent, DEFAULT_SESSION
+from llm_pool import llm_pool
 from observability import obs
-from context_engineering import summarize_history
-
-# Use consistent model name
-MODEL_NAME = "gemini-2.5-flash"  # Or "gemini-2.5-flash" if available
-
-# Initialize client with better error handling
-try:
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        print("ERROR: GOOGLE_API_KEY not found in environment variables!")
-        print("Please add GOOGLE_API_KEY to your .env file")
-    client = genai.Client(api_key=api_key)
-    print("✓ Gemini API client initialized")
-except Exception as e:
-    print(f"✗ Failed to initialize Gemini client: {e}")
-    client = None
+from metrics import registry, REQUESTS, REQUEST_LATENCY
+from response_cache import response_cache, cache_key, CACHE_REQUESTS
+from singleflight import single_flight
+from intent_router import IntentRouter
+from context_engineering import rolling_summaries
+from token_budget import token_budget, estimate_tokens, pack_turns, join_turns
+from tracing import span
+from tools import tool_executor, resolve_command
+from llm_client import get_client, MODEL_NAME
 
 memory = MemoryAgent()
 
 # ---------- PLANNER ----------
+EXECUTOR_COMMANDS = IntentRouter().add("EXECUTOR", ["open", "search", "scroll", "play"])
+
+# "then" separates sequential stages; "and" / "," separate parallel steps
+_STAGE_SPLIT = re.compile(r"\s*,?\s*\b(?:and then|then|after that)\b\s*", re.IGNORECASE)
+_STEP_SPLIT = re.compile(r"\s*(?:,|\band\b)\s*", re.IGNORECASE)
+
+# A clause after "and" only becomes its own step if it starts with one of these
+STEP_VERBS = {
+    "open", "search", "scroll", "play", "find", "show", "summarize", "summarise",
+    "explain", "tell", "write", "translate", "define", "describe", "compare",
+    "list", "give",
+}
+
+PLAN_STEP_LATENCY = registry.histogram(
+    "jarvis_plan_step_seconds", "Latency of individual plan steps", ["kind"]
+)
+
+
+class PlanStep:
+    """
+    One node of a task graph produced by PlannerAgent.plan
+    """
+
+    def __init__(self, step_id, kind, text, deps=()):
+        self.id = step_id
+        self.kind = kind
+        self.text = text
+        self.deps = tuple(deps)
+
+    def __repr__(self):
+        return f"PlanStep({self.id}, {self.kind}, {self.text!r}, deps={self.deps})"
+
+
 class PlannerAgent:
+    def plan(self, text):
+        """
+        Split a compound request into a small task graph. Steps within a
+        stage run concurrently; each stage depends on the previous one.
+
+        A request is only planned when every clause starts with an action
+        verb or is a tool command; anything else ("what did Napoleon do
+        after that war", "if x is 5 then what is y") is one AI step.
+        Parallel AI clauses in one stage stay a single step, since they
+        usually refer to each other ("tell me a joke and explain it").
+        """
+        stages = []
+        for stage_text in _STAGE_SPLIT.split(text.strip()):
+            clauses = []
+            for part in _STEP_SPLIT.split(stage_text):
+                if not part:
+                    continue
+                first = part.split(None, 1)[0].lower()
+                if clauses and first not in STEP_VERBS:
+                    # "rock and roll": not a new action, keep it together
+                    clauses[-1] = f"{clauses[-1]} and {part}"
+                else:
+                    clauses.append(part)
+            if clauses:
+                stages.append(clauses)
+
+        whole = [PlanStep(0, self.classify(text), text)]
+        if sum(len(clauses) for clauses in stages) < 2:
+            return whole
+
+        kinds = []
+        for clauses in stages:
+            stage_kinds = []
+            for clause in clauses:
+                kind = self._classify(clause)
+                if kind != "EXECUTOR" and clause.split(None, 1)[0].lower() not in STEP_VERBS:
+                    return whole
+                stage_kinds.append(kind)
+            kinds.append(stage_kinds)
+
+        steps = []
+        previous = []
+        for clauses, stage_kinds in zip(stages, kinds):
+            stage = []
+            ai_clauses = [c for c, k in zip(clauses, stage_kinds) if k == "AI"]
+            for clause, kind in zip(clauses, stage_kinds):
+                if kind == "EXECUTOR":
+                    steps.append(PlanStep(len(steps), kind, clause, previous))
+                    stage.append(steps[-1].id)
+            if ai_clauses:
+                steps.append(PlanStep(len(steps), "AI", " and ".join(ai_clauses), previous))
+                stage.append(steps[-1].id)
+            previous = stage
+
+        return steps if len(steps) > 1 else whole
+
     def classify(self, text):
-        try:
+        with span("planner.classify") as s:
             obs.log("Planner", "classify", text)
-            if any(w in text.lower() for w in ["open", "search", "scroll", "play"]):
+            route = self._classify(text)
+            if s:
+                s.set("route", route)
+            return route
+
+    def _classify(self, text):
+        # No logging here: plan() routes every clause through this
+        try:
+            if EXECUTOR_COMMANDS.matches(text):
                 return "EXECUTOR"
             return "AI"
         except Exception as e:
@@ -40,11 +131,28 @@ class PlannerAgent:
 
 # ---------- EXECUTOR ----------
 class ExecutorAgent:
-    async def execute_async(self, command):
+    async def execute_async(self, command, dry_run=False):
+        with span("executor.execute") as s:
+            return await self._execute(command, s, dry_run)
+
+    async def _execute(self, command, s, dry_run):
         try:
             obs.log("Executor", "execute_async", command)
+            resolved = resolve_command(command)
+            if resolved is None:
+                return f"[SYSTEM] No tool for: {command}"
+
+            tool, arg = resolved
+            report = await tool_executor.run(tool, arg, dry_run=dry_run)
+            if s:
+                s.set("tool", tool)
+                s.set("status", report["status"])
             obs.metric("tool_call")
-            await asyncio.sleep(0.2)   # simulate parallel call
+            obs.log("Executor", tool, report)
+            if report["status"] != "ok":
+                return f"[SYSTEM ERROR] {tool} {report['status']}: {report.get('error', '')}".rstrip(": ")
+            if report.get("dry_run"):
+                return f"[SYSTEM] Dry run: {command}"
             return f"[SYSTEM] Executed: {command}"
         except Exception as e:
             print(f"Error in Executor.execute_async: {e}")
@@ -52,9 +160,13 @@ class ExecutorAgent:
 
 # ---------- CONVERSATION ----------
 class ConversationAgent:
-    async def ask_async(self, prompt):
+    async def ask_async(self, prompt, session_id=DEFAULT_SESSION, use_cache=True,
+                        use_context=True, use_memory=True):
         """
-        Process conversation with Gemini API
+        Process conversation with Gemini API. Answers are cached per
+        prompt, model and context; use_cache=False bypasses the cache and
+        use_context=False skips history (used for context-free prompts).
+        use_memory=False neither reads nor saves the session (evaluations).
         """
         try:
             obs.log("Gemini", "ask_async", prompt[:100])
@@ -63,40 +175,39 @@ class ConversationAgent:
             print(f"Warning: Observability logging failed: {e}")
 
         # Check if client is initialized
-        if not client:
+        if not get_client():
             error_msg = "Gemini API client not initialized. Check your GOOGLE_API_KEY."
             print(f"[ERROR] {error_msg}")
             return error_msg
 
         try:
-            # Get conversation history
-            history = memory.recent()
-            
-            # Summarize history
-            summary = summarize_history(history)
-
-            final_prompt = f"""
-Conversation Summary:
-{summary}
-
-User Question:
-{prompt}
-"""
+            use_context = use_context and use_memory
+            if use_memory:
+                # A session missing from RAM is fetched off the event loop,
+                # before context building or save() would need it
+                await memory.load_async(session_id)
+            with span("context.build"):
+                context = await self._build_context(prompt, session_id) if use_context else ""
+            key = cache_key(prompt, MODEL_NAME, context)
 
-            # Call Gemini API
-            res = client.models.generate_content(
-                model=MODEL_NAME,
-                contents=final_prompt
-            )
+            response = response_cache.get(key) if use_cache else None
+            if not use_cache:
+                CACHE_REQUESTS.inc(result="bypass")
 
-            # Extract response text
-            if hasattr(res, 'text'):
-                response = res.text
-            else:
-                response = str(res)
+            if response is None:
+                final_prompt = self._final_prompt(context, prompt)
+                if use_cache:
+                    # Identical concurrent questions share one Gemini call
+                    response = await single_flight.do(
+                        key, lambda: self._generate(key, final_prompt)
+                    )
+                else:
+                    response = await self._generate(None, final_prompt)
 
-            # Save to memory
-            memory.save(prompt, response)
+            # Save to memory and fold the turn into the summary off the critical path
+            if use_memory:
+                saved = memory.save(prompt, response, session_id)
+                rolling_summaries.get(session_id).schedule(saved, prompt, response)
 
             return response
         
@@ -112,36 +223,328 @@ User Question:
             obs.log("Gemini", "error", error_msg)
             return f"I apologize, but I encountered an error: {str(e)}"
 
+    async def _generate(self, key, final_prompt):
+        # Call Gemini API off the event loop
+        res = await llm_pool.generate_content(get_client(), MODEL_NAME, final_prompt)
+
+        # Extract response text
+        if hasattr(res, 'text'):
+            response = res.text
+        else:
+            response = str(res)
+
+        if response and key:
+            response_cache.put(key, response)
+        return response
+
+    async def ask_stream(self, prompt, session_id=DEFAULT_SESSION, use_cache=True,
+                         use_context=True, use_memory=True):
+        """
+        Stream the Gemini answer chunk by chunk; memory is saved once the
+        full response has been generated. A cached answer is sent as a
+        single chunk.
+        """
+        try:
+            obs.log("Gemini", "ask_stream", prompt[:100])
+            obs.metric("ai_call")
+        except Exception as e:
+            print(f"Warning: Observability logging failed: {e}")
+
+        if not get_client():
+            error_msg = "Gemini API client not initialized. Check your GOOGLE_API_KEY."
+            print(f"[ERROR] {error_msg}")
+            yield error_msg
+            return
+
+        parts = []
+        try:
+            use_context = use_context and use_memory
+            if use_memory:
+                await memory.load_async(session_id)
+            context = await self._build_context(prompt, session_id) if use_context else ""
+            key = cache_key(prompt, MODEL_NAME, context)
+
+            cached = response_cache.get(key) if use_cache else None
+            if not use_cache:
+                CACHE_REQUESTS.inc(result="bypass")
+
+            if cached is not None:
+                parts.append(cached)
+                yield cached
+            else:
+                final_prompt = self._final_prompt(context, prompt)
+                async for chunk in llm_pool.stream_content(get_client(), MODEL_NAME, final_prompt):
+                    text = getattr(chunk, 'text', None)
+                    if text:
+                        parts.append(text)
+                        yield text
+
+        except Exception as e:
+            error_msg = f"Error in AI agent: {str(e)}"
+            print(f"[ERROR] {error_msg}")
+            obs.log("Gemini", "error", error_msg)
+            yield f"I apologize, but I encountered an error: {str(e)}"
+            return
+
+        response = "".join(parts)
+        if response and use_cache and cached is None:
+            response_cache.put(key, response)
+        if use_memory:
+            saved = memory.save(prompt, response, session_id)
+            rolling_summaries.get(session_id).schedule(saved, prompt, response)
+
+    async def _build_context(self, prompt, session_id):
+        # Read the session's ready-made rolling summary (seeded from history once)
+        rolling_summary = rolling_summaries.get(session_id)
+        if not rolling_summary.loaded:
+            await rolling_summary.load(memory.recent(session_id=session_id))
+        summary = rolling_summary.current()
+        budget = max(0, token_budget(MODEL_NAME) - estimate_tokens(summary))
+
+        context = f"""
+Conversation Summary:
+{summary}
+"""
+
+        # Turns the summary does not cover yet go in verbatim, newest
+        # first, so the next question still sees them while a fold runs
+        recent, used = pack_turns(reversed(rolling_summary.unfolded()), budget)
+        budget -= used
+        if recent:
+            context += f"""
+Recent Conversation:
+{join_turns(reversed(recent))}
+"""
+
+        # Older turns that look relevant to this question, best match
+        # first, as many whole turns as the model's budget leaves room for
+        shown = {(t["query"], t["response"]) for t in recent}
+        candidates = [
+            t for t in memory.relevant(prompt, session_id=session_id)
+            if (t.get("query"), t.get("response")) not in shown
+        ]
+        relevant, _ = pack_turns(candidates, budget)
+        if relevant:
+            context += f"""
+Relevant Past Conversation:
+{join_turns(relevant)}
+"""
+
+        return context
+
+    def _final_prompt(self, context, prompt):
+        return f"""{context}
+User Question:
+{prompt}
+"""
+
 
 planner = PlannerAgent()
 executor = ExecutorAgent()
 ai_agent = ConversationAgent()
 
 
-async def parallel_run(command):
+async def run_plan(steps, session_id=DEFAULT_SESSION, use_cache=True, use_memory=True,
+                   dry_run=False):
+    """
+    Run a task graph, starting every step as soon as its dependencies
+    are done. Yields one result dict per step in completion order, with
+    start offset and duration in seconds.
+    """
+    start = time.perf_counter()
+    results = {}
+    pending = {step.id: step for step in steps}
+    running = {}
+
+    async def run_step(step):
+        started = time.perf_counter()
+        try:
+            if step.kind == "EXECUTOR":
+                result = await executor.execute_async(step.text, dry_run)
+            else:
+                prompt = step.text
+                done = [results[d] for d in step.deps]
+                if done:
+                    prompt += "\n\nResults of the previous steps:\n" + "\n".join(
+                        f"- {r['text']}: {r['result']}" for r in done
+                    )
+                result = await ai_agent.ask_async(
+                    prompt, session_id, use_cache=use_cache, use_memory=use_memory
+                )
+        except Exception as e:
+            print(f"Error in plan step {step.id}: {e}")
+            result = f"[SYSTEM ERROR] Failed to run: {step.text}"
+
+        duration = time.perf_counter() - started
+        PLAN_STEP_LATENCY.observe(duration, kind=step.kind)
+        return {
+            "id": step.id,
+            "kind": step.kind,
+            "text": step.text,
+            "deps": list(step.deps),
+            "result": result,
+            "started": round(started - start, 4),
+            "duration": round(duration, 4),
+        }
+
+    try:
+        while pending or running:
+            for step_id, step in list(pending.items()):
+                if all(d in results for d in step.deps):
+                    running[asyncio.create_task(run_step(step))] = step_id
+                    del pending[step_id]
+
+            if not running:
+                # Remaining steps depend on something that never ran
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                del running[task]
+                step_result = task.result()
+                results[step_result["id"]] = step_result
+                yield step_result
+    finally:
+        for task in running:
+            task.cancel()
+
+
+async def parallel_run(command, session_id=DEFAULT_SESSION, use_cache=True, on_step=None,
+                       use_memory=True, dry_run=False):
     """
-    Execute Executor + AI simultaneously if appropriate
+    Execute Executor + AI simultaneously if appropriate. Compound
+    requests are planned into a task graph; on_step, if given, is called
+    with each step result as soon as it completes. use_memory=False
+    leaves the session untouched and dry_run=True only logs tool calls.
     """
+    start = time.perf_counter()
+    decision = "ERROR"
     try:
-        decision = planner.classify(command)
+        steps = planner.plan(command)
+        if len(steps) > 1:
+            decision = "PLAN"
+            return await _run_plan_collect(
+                command, steps, session_id, use_cache, on_step, use_memory, dry_run
+            )
+
+        decision = steps[0].kind
 
         if decision == "EXECUTOR":
             exec_task = asyncio.create_task(
-                executor.execute_async(command)
+                executor.execute_async(command, dry_run)
             )
             ai_task = asyncio.create_task(
-                ai_agent.ask_async(
-                    f"Acknowledge the system task: {command}"
-                )
+                _acknowledge(command, session_id, use_cache, use_memory)
             )
             exec_result = await exec_task
             ai_msg = await ai_task
             return exec_result, ai_msg
         else:
-            ai_msg = await ai_agent.ask_async(command)
+            ai_msg = await ai_agent.ask_async(
+                command, session_id, use_cache=use_cache, use_memory=use_memory
+            )
             return None, ai_msg
     
     except Exception as e:
         error_msg = f"Error in parallel_run: {str(e)}"
         print(f"[ERROR] {error_msg}")
-        return None, f"System error: {str(e)}"
\ No newline at end of file
+        return None, f"System error: {str(e)}"
+
+    finally:
+        REQUESTS.inc(route=decision)
+        REQUEST_LATENCY.observe(time.perf_counter() - start, route=decision)
+
+
+def _acknowledge(command, session_id, use_cache, use_memory=True):
+    return ai_agent.ask_async(
+        f"Acknowledge the system task: {command}",
+        session_id,
+        use_cache=use_cache,
+        use_context=False,
+        use_memory=use_memory
+    )
+
+
+async def _run_plan_collect(command, steps, session_id, use_cache, on_step, use_memory, dry_run):
+    # Plans without an AI step still get a spoken acknowledgement
+    ack_task = None
+    if not any(step.kind == "AI" for step in steps):
+        ack_task = asyncio.create_task(_acknowledge(command, session_id, use_cache, use_memory))
+
+    step_results = []
+    async for step_result in run_plan(steps, session_id, use_cache, use_memory, dry_run):
+        step_results.append(step_result)
+        if on_step:
+            on_step(step_result)
+
+    obs.log("Planner", "plan", [
+        (r["id"], r["kind"], r["started"], r["duration"]) for r in step_results
+    ])
+
+    step_results.sort(key=lambda r: r["id"])
+    exec_result = "\n".join(r["result"] for r in step_results if r["kind"] == "EXECUTOR")
+    ai_msg = "\n\n".join(r["result"] for r in step_results if r["kind"] == "AI")
+    if ack_task:
+        ai_msg = await ack_task
+    return exec_result or None, ai_msg
+
+
+async def parallel_run_stream(command, session_id=DEFAULT_SESSION, use_cache=True,
+                              use_memory=True, dry_run=False):
+    """
+    Streaming variant of parallel_run. Yields (event, data) pairs:
+    "executor" as soon as the executor finishes, "token" for each chunk
+    of the AI answer, and a final "done". Compound requests yield a
+    "step" event per completed plan step instead.
+    """
+    queue = asyncio.Queue()
+
+    async def run_executor():
+        result = await executor.execute_async(command, dry_run)
+        await queue.put(("executor", result))
+
+    async def run_ai(prompt, use_context=True):
+        async for text in ai_agent.ask_stream(
+            prompt, session_id, use_cache=use_cache, use_context=use_context,
+            use_memory=use_memory
+        ):
+            await queue.put(("token", text))
+
+    async def run_steps(steps):
+        async for step_result in run_plan(steps, session_id, use_cache, use_memory, dry_run):
+            await queue.put(("step", step_result))
+
+    async def run_all():
+        try:
+            steps = planner.plan(command)
+            decision = steps[0].kind
+            if len(steps) > 1:
+                jobs = [run_steps(steps)]
+                if not any(step.kind == "AI" for step in steps):
+                    jobs.append(
+                        run_ai(f"Acknowledge the system task: {command}", use_context=False)
+                    )
+                await asyncio.gather(*jobs)
+            elif decision == "EXECUTOR":
+                await asyncio.gather(
+                    run_executor(),
+                    run_ai(f"Acknowledge the system task: {command}", use_context=False)
+                )
+            else:
+                await run_ai(command)
+        except Exception as e:
+            print(f"[ERROR] Error in parallel_run_stream: {str(e)}")
+            await queue.put(("error", f"System error: {str(e)}"))
+        finally:
+            await queue.put(("done", None))
+
+    task = asyncio.create_task(run_all())
+    try:
+        while True:
+            event, data = await queue.get()
+            yield event, data
+            if event == "done":
+                break
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,89 @@
+"""
+Long-lived asyncio event loop on a background thread for synchronous callers
+"""
+import asyncio
+import threading
+import time
+
+from metrics import registry
+
+VOICE_STAGE_LATENCY = registry.histogram(
+    "jarvis_voice_stage_seconds", "Voice loop latency by stage", ["stage"]
+)
+
+
+class BackgroundLoop:
+    """
+    One event loop kept alive on a daemon thread. Synchronous code (the
+    voice loop) submits coroutines to it instead of calling asyncio.run
+    per command, so loop-bound state (HTTP connections, pools, caches,
+    single-flight tasks) survives between utterances.
+    """
+
+    def __init__(self, name="voice-loop"):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            pending = asyncio.all_tasks(self.loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+
+    def submit(self, coro):
+        """
+        Schedule coro on the loop; returns a concurrent.futures.Future.
+        future.timing["dispatch"] is the delay between submission and
+        the coroutine starting to run.
+        """
+        self.start()
+        submitted = time.perf_counter()
+        timing = {}
+
+        async def timed():
+            timing["dispatch"] = time.perf_counter() - submitted
+            VOICE_STAGE_LATENCY.observe(timing["dispatch"], stage="dispatch")
+            return await coro
+
+        future = asyncio.run_coroutine_threadsafe(timed(), self.loop)
+        future.timing = timing
+        return future
+
+    def run(self, coro, timeout=None):
+        """
+        Run coro on the loop and block until it finishes
+        """
+        return self.submit(coro).result(timeout)
+
+    def stop(self, timeout=5.0):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        thread.join(timeout)
+
+
+voice_loop = BackgroundLoop()
@@ -0,0 +1,517 @@
+"""
+Load test for the /ask API
+Run this with: python bench_api.py [--concurrency 1 4 16] [--requests N]
+                                   [--llm-latency S] [--db-latency S]
+                                   [--save-baseline] [--tolerance F]
+
+Starts main.app under uvicorn against two local stand-ins: a stub Gemini
+HTTP server (reached through GEMINI_BASE_URL, so the real SDK and
+connection pool are exercised) and an in-memory Supabase client. Each
+concurrency level sends a fixed number of /ask requests and reports
+requests/sec, latency percentiles, event-loop lag inside the server and
+upstream calls per request. The stub server and the load generator run
+in their own processes so they do not compete with the app for the GIL.
+
+Results are compared with bench_api_baseline.json; a level that is
+slower, lags more or makes more upstream calls than the baseline allows
+fails the run (exit code 1). --save-baseline records the current run.
+Baselines depend on the machine, so record one before comparing.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics import percentile
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_api_baseline.json")
+LAG_INTERVAL = 0.01
+# Absolute slack on upstream calls per request; they are nearly deterministic
+CALL_SLACK = 0.1
+# Absolute slack on loop lag, which is noisy at the millisecond scale
+LAG_SLACK = 0.05
+
+TOPICS = ["python", "the moon", "machine learning", "photosynthesis", "jazz", "volcanoes", "chess", "tides"]
+
+
+# ---------- STAND-INS ----------
+class StubGemini(ThreadingHTTPServer):
+    """
+    Answers the Gemini REST endpoints the SDK uses: models.get,
+    generateContent and streamGenerateContent (SSE), after a fixed
+    latency. Counts calls by kind.
+    """
+    daemon_threads = True
+
+    def __init__(self, latency):
+        super().__init__(("127.0.0.1", 0), _GeminiHandler)
+        self.latency = latency
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, kind):
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+
+    def total(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+
+class _GeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    @staticmethod
+    def _answer(text, prompt_tokens, output_tokens):
+        return {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+            }],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": output_tokens,
+                "totalTokenCount": prompt_tokens + output_tokens,
+            },
+        }
+
+    def do_GET(self):
+        if self.path == "/_calls":
+            with self.server._lock:
+                return self._send_json(self.server.calls)
+        self.server.count("get")
+        model = self.path.split("?")[0].rsplit("/", 1)[-1]
+        self._send_json({"name": f"models/{model}", "displayName": model})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        prompt_tokens = max(1, len(body) // 4)
+        time.sleep(self.server.latency)
+
+        if ":streamGenerateContent" in self.path:
+            self.server.count("stream")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            parts = ["This is a stubbed answer. ", "It has two sentences."]
+            for n, part in enumerate(parts, 1):
+                event = self._answer(part, prompt_tokens, 6 * n)
+                self._chunk(f"data: {json.dumps(event)}\r\n\r\n".encode())
+            self._chunk(b"")
+        else:
+            self.server.count("generate")
+            self._send_json(self._answer("This is a stubbed answer. It has two sentences.", prompt_tokens, 12))
+
+
+def _serve_gemini(latency, ready):
+    server = StubGemini(latency)
+    ready.put(server.url)
+    server.serve_forever()
+
+
+class GeminiProcess:
+    """
+    StubGemini in a child process; counters are read over HTTP
+    """
+
+    def __init__(self, latency):
+        ctx = multiprocessing.get_context("spawn")
+        ready = ctx.Queue()
+        self._process = ctx.Process(target=_serve_gemini, args=(latency, ready), daemon=True)
+        self._process.start()
+        self.url = ready.get(timeout=30)
+
+    @property
+    def calls(self):
+        with urllib.request.urlopen(f"{self.url}/_calls", timeout=10) as res:
+            return json.load(res)
+
+    def total(self):
+        return sum(self.calls.values())
+
+    def stop(self):
+        self._process.terminate()
+        self._process.join(5)
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.payload = None
+        self.on_conflict = None
+        self.filters = []
+        self.order_by = None
+        self.row_limit = None
+
+    def select(self, columns="*"):
+        self.op = "select"
+        return self
+
+    def insert(self, row):
+        self.op, self.payload = "insert", row
+        return self
+
+    def upsert(self, row, on_conflict=None):
+        self.op, self.payload, self.on_conflict = "upsert", row, on_conflict
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda r: r.get(column) == value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and r.get(column) < value)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, n):
+        self.row_limit = n
+        return self
+
+    def execute(self):
+        return self.db._execute(self)
+
+
+class MemorySupabase:
+    """
+    The slice of the Supabase client the app uses (table, select, eq,
+    lt, order, limit, insert, upsert, execute), held in memory with a
+    fixed latency per execute(). Counts calls by table and operation.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = {}
+        self._tables = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def total(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+    def _execute(self, q):
+        time.sleep(self.latency)
+        with self._lock:
+            key = f"{q.table}.{q.op}"
+            self.calls[key] = self.calls.get(key, 0) + 1
+            rows = self._tables.setdefault(q.table, [])
+
+            if q.op in ("insert", "upsert"):
+                batch = q.payload if isinstance(q.payload, list) else [q.payload]
+                if q.on_conflict:
+                    keys = {row.get(q.on_conflict) for row in batch}
+                    rows[:] = [r for r in rows if r.get(q.on_conflict) not in keys]
+                stored = [dict(row, id=next(self._ids)) for row in batch]
+                rows.extend(stored)
+                return _Result(stored)
+
+            data = [r for r in rows if all(f(r) for f in q.filters)]
+            if q.order_by:
+                column, desc = q.order_by
+                data.sort(key=lambda r: r.get(column) or 0, reverse=desc)
+            if q.row_limit is not None:
+                data = data[:q.row_limit]
+            return _Result([dict(r) for r in data])
+
+
+# ---------- SERVER ----------
+class AppServer:
+    """
+    main.app under uvicorn on its own thread and event loop, with a
+    probe on that loop measuring how late timers fire
+    """
+
+    def __init__(self, app):
+        import uvicorn
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self.sock.getsockname()[1]}"
+        config = uvicorn.Config(app, log_level="warning", lifespan="on", access_log=False)
+        self.server = uvicorn.Server(config)
+        self.loop = asyncio.new_event_loop()
+        self.lag = []
+        self._thread = threading.Thread(target=self._run, name="bench-server", daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.create_task(self._probe())
+        self.loop.run_until_complete(self.server.serve(sockets=[self.sock]))
+
+    async def _probe(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.lag.append(time.perf_counter() - start - LAG_INTERVAL)
+
+    def start(self, timeout=30):
+        self._thread.start()
+        deadline = time.time() + timeout
+        while not self.server.started:
+            if time.time() > deadline or not self._thread.is_alive():
+                raise SystemExit("API server did not start")
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(10)
+
+
+# ---------- LOAD ----------
+async def drive(url, concurrency, requests, level):
+    import httpx
+
+    latencies, errors = [], []
+    counter = itertools.count()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        async def worker():
+            while True:
+                n = next(counter)
+                if n >= requests:
+                    return
+                payload = {
+                    "query": f"what is {TOPICS[n % len(TOPICS)]}? (request {level}-{n})",
+                    # Every other request opens a session that is not in RAM yet,
+                    # so cold history loads are part of the measurement
+                    "session_id": f"bench-{level}-{n // 2}",
+                }
+                start = time.perf_counter()
+                try:
+                    res = await client.post("/ask", json=payload)
+                    body = res.json()
+                    if res.status_code != 200 or "error" in body:
+                        errors.append(body.get("error", res.status_code))
+                        continue
+                except Exception as e:
+                    errors.append(f"{type(e).__name__}: {e}")
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return latencies, errors, elapsed
+
+
+def _drive_sync(url, concurrency, requests, level):
+    return asyncio.run(drive(url, concurrency, requests, level))
+
+
+def settle(*sources, quiet=0.5, timeout=15):
+    """
+    Wait for background work (summaries, write-behind saves, telemetry)
+    to stop calling upstream, so each level is charged for its own calls
+    """
+    deadline = time.time() + timeout
+    last = None
+    while time.time() < deadline:
+        current = [s.total() for s in sources]
+        if current == last:
+            return
+        last = current
+        time.sleep(quiet)
+
+
+def run_level(server, driver, gemini, db, concurrency, requests):
+    llm_before, db_before = gemini.total(), db.total()
+    server.lag.clear()
+    latencies, errors, elapsed = driver.submit(
+        _drive_sync, server.url, concurrency, requests, concurrency
+    ).result()
+    lag = list(server.lag)
+    settle(gemini, db)
+
+    done = max(1, len(latencies))
+    return {
+        "requests": requests,
+        "errors": len(errors),
+        "first_error": str(errors[0]) if errors else None,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50": round(percentile(latencies, 50, default=0.0), 4),
+        "p95": round(percentile(latencies, 95, default=0.0), 4),
+        "p99": round(percentile(latencies, 99, default=0.0), 4),
+        "lag_p99": round(percentile(lag, 99, default=0.0), 4),
+        "lag_max": round(max(lag, default=0.0), 4),
+        "llm_calls": round((gemini.total() - llm_before) / done, 2),
+        "db_calls": round((db.total() - db_before) / done, 2),
+    }
+
+
+# ---------- REPORT ----------
+def print_report(settings, results, gemini_calls, db):
+    print("=" * 96)
+    print("API LOAD TEST")
+    print("=" * 96)
+    print(f"LLM latency: {settings['llm_latency'] * 1000:.0f}ms   DB latency: {settings['db_latency'] * 1000:.0f}ms"
+          f"   Requests per level: {settings['requests']}")
+    print("-" * 96)
+    print(f"{'conc':>5}{'ok':>6}{'err':>5}{'req/s':>9}{'p50':>10}{'p95':>10}{'p99':>10}"
+          f"{'lag p99':>10}{'lag max':>10}{'llm/req':>9}{'db/req':>8}")
+    for level, r in results.items():
+        print(f"{level:>5}{r['requests'] - r['errors']:>6}{r['errors']:>5}{r['rps']:>9.1f}"
+              f"{r['p50'] * 1000:>8.1f}ms{r['p95'] * 1000:>8.1f}ms{r['p99'] * 1000:>8.1f}ms"
+              f"{r['lag_p99'] * 1000:>8.1f}ms{r['lag_max'] * 1000:>8.1f}ms"
+              f"{r['llm_calls']:>9.2f}{r['db_calls']:>8.2f}")
+    print("-" * 96)
+    print(f"Gemini calls: {json.dumps(gemini_calls, sort_keys=True)}")
+    print(f"DB calls:     {json.dumps(db.calls, sort_keys=True)}")
+    for level, r in results.items():
+        if r["first_error"]:
+            print(f"First error at concurrency {level}: {r['first_error']}")
+    print("=" * 96)
+
+
+def compare(settings, results, baseline, tolerance):
+    """
+    Regressions against the baseline, as readable lines
+    """
+    if baseline.get("settings") != settings:
+        print("⚠️  Baseline was recorded with different settings; not comparing")
+        return []
+
+    failures = []
+    for level, r in results.items():
+        base = baseline["levels"].get(str(level))
+        if base is None:
+            continue
+        checks = [
+            ("errors", r["errors"] > base["errors"]),
+            ("req/s", r["rps"] < base["rps"] * (1 - tolerance)),
+            ("p95", r["p95"] > base["p95"] * (1 + tolerance)),
+            ("lag p99", r["lag_p99"] > max(base["lag_p99"] * (1 + tolerance), base["lag_p99"] + LAG_SLACK)),
+            ("llm/req", r["llm_calls"] > base["llm_calls"] + CALL_SLACK),
+            ("db/req", r["db_calls"] > base["db_calls"] + CALL_SLACK),
+        ]
+        for name, regressed in checks:
+            if regressed:
+                key = {"req/s": "rps", "llm/req": "llm_calls", "db/req": "db_calls",
+                       "lag p99": "lag_p99"}.get(name, name)
+                failures.append(f"concurrency {level}: {name} {r[key]} vs baseline {base[key]}")
+    return failures
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Load test /ask against local stand-ins")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="levels to run")
+    parser.add_argument("--requests", type=int, default=200, help="requests per level")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests before the first level")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub Gemini seconds per call")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="stub Supabase seconds per call")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="record this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fractional regression")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own output")
+    args = parser.parse_args()
+
+    gemini = GeminiProcess(args.llm_latency)
+    driver = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+    # Never touch real services, the desktop or the response cache
+    os.environ.update({
+        "GOOGLE_API_KEY": "benchmark",
+        "GEMINI_BASE_URL": gemini.url,
+        "GEMINI_WARMUP": "0",
+        "SUPABASE_URL": "",
+        "SUPABASE_KEY": "",
+        "TOOLS_DRY_RUN": "1",
+        "RESPONSE_CACHE_SIZE": "0",
+        "TRACE_EXPORTER": "none",
+    })
+
+    import contextlib
+    import io
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        import database
+        import main
+
+        db = MemorySupabase(args.db_latency)
+        database.set_db(db)
+        server = AppServer(main.app)
+        server.start()
+        try:
+            # First requests pay for lazy imports and connections; keep them out of the numbers
+            driver.submit(_drive_sync, server.url, 1, args.warmup, "warmup").result()
+            settle(gemini, db)
+            results = {}
+            for level in args.concurrency:
+                results[level] = run_level(server, driver, gemini, db, level, args.requests)
+            gemini_calls = gemini.calls
+        finally:
+            server.stop()
+            driver.shutdown()
+            gemini.stop()
+
+    settings = {"llm_latency": args.llm_latency, "db_latency": args.db_latency, "requests": args.requests}
+    print_report(settings, results, gemini_calls, db)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "levels": results}, f, indent=2)
+            f.write("\n")
+        print(f"✓ Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("ℹ️  No baseline yet; run with --save-baseline to record one")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        failures = compare(settings, results, json.load(f), args.tolerance)
+    if failures:
+        print("✗ Regressions against baseline:")
+        for line in failures:
+            print(f"  {line}")
+        return 1
+    print("✓ Within baseline tolerance")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,80 @@
+"""
+Microbenchmark for intent dispatch
+Run this with: python bench_intent_router.py
+
+Compares the compiled IntentRouter against the old substring if/elif
+scan as the command table grows. Router cost should stay flat; the
+substring scan grows linearly with the number of commands.
+"""
+import random
+import timeit
+
+from intent_router import IntentRouter
+
+TABLE_SIZES = [10, 50, 100, 250, 500, 1000]
+ITERATIONS = 2000
+
+WORDS = [
+    "alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel",
+    "india", "juliet", "kilo", "lima", "mike", "november", "oscar", "papa",
+    "quebec", "romeo", "sierra", "tango", "uniform", "victor", "whiskey",
+]
+
+UTTERANCES = [
+    "open youtube and play some music",
+    "what is the weather like today in london",
+    "google search for the best pizza near me",
+    "please scroll down a little bit more",
+    "tell me a joke about programmers",
+]
+
+
+def build_table(size, seed=42):
+    rng = random.Random(seed)
+    phrases = ["open", "google search", "search for", "scroll down", "play"]
+    while len(phrases) < size:
+        phrase = " ".join(rng.sample(WORDS, rng.randint(1, 3)))
+        if phrase not in phrases:
+            phrases.append(phrase)
+    return phrases
+
+
+def substring_dispatch(phrases, text):
+    # The pre-router pattern: one substring scan per command, in order
+    for phrase in phrases:
+        if phrase in text:
+            return phrase
+    return None
+
+
+def bench(size):
+    phrases = build_table(size)
+    router = IntentRouter()
+    for phrase in phrases:
+        router.add(phrase, phrase)
+    router.compile()
+
+    def run_router():
+        for text in UTTERANCES:
+            router.match(text)
+
+    def run_substring():
+        for text in UTTERANCES:
+            substring_dispatch(phrases, text)
+
+    per_call = ITERATIONS * len(UTTERANCES)
+    router_us = min(timeit.repeat(run_router, number=ITERATIONS, repeat=3)) / per_call * 1e6
+    substring_us = min(timeit.repeat(run_substring, number=ITERATIONS, repeat=3)) / per_call * 1e6
+    return router_us, substring_us
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("INTENT DISPATCH BENCHMARK")
+    print("=" * 60)
+    print(f"{'commands':>10} {'router (us)':>14} {'substring (us)':>16}")
+    print("-" * 60)
+    for size in TABLE_SIZES:
+        router_us, substring_us = bench(size)
+        print(f"{size:>10} {router_us:>14.2f} {substring_us:>16.2f}")
+    print("=" * 60)
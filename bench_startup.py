@@ -0,0 +1,72 @@
+"""
+Cold-start benchmark for the API server
+Run this with: python bench_startup.py [module]
+
+Imports the module (default: main) in fresh interpreters with
+`python -X importtime`, and reports the median wall time, the slowest
+imports and whether voice/client modules leaked into the API import.
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+RUNS = 5
+TOP = 15
+
+# Modules that should only load in voice mode or on first use
+DEFERRED = ["speech_recognition", "pyautogui", "win32com", "supabase", "google.genai", "numpy"]
+
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run_once(module):
+    env = dict(os.environ)
+    # Never touch real services from a benchmark
+    env.update({"GOOGLE_API_KEY": "benchmark", "SUPABASE_URL": "", "SUPABASE_KEY": ""})
+    check = "; ".join([
+        f"import {module}",
+        "import sys",
+        f"print([m for m in {DEFERRED!r} if m in sys.modules])",
+    ])
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        capture_output=True, text=True, env=env
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            imports.append((int(m.group(2)), len(m.group(3)) // 2, m.group(4)))
+    loaded = proc.stdout.strip().splitlines()[-1]
+    return elapsed, imports, loaded
+
+
+if __name__ == "__main__":
+    module = sys.argv[1] if len(sys.argv) > 1 else "main"
+
+    results = [run_once(module) for _ in range(RUNS)]
+    wall = [r[0] for r in results]
+    elapsed, imports, loaded = min(results, key=lambda r: r[0])
+    top_level = {name: us for us, depth, name in imports if depth == 0}
+
+    print("=" * 60)
+    print(f"COLD START: import {module}")
+    print("=" * 60)
+    print(f"Runs:            {RUNS}")
+    print(f"Wall (median):   {statistics.median(wall):.3f}s")
+    print(f"Wall (min):      {min(wall):.3f}s")
+    print(f"Import of {module}: {top_level.get(module, 0) / 1e6:.3f}s")
+    print(f"Deferred loaded: {loaded}")
+    print("-" * 60)
+    print(f"{'cumulative (ms)':>16}  module")
+    for us, depth, name in sorted(imports, reverse=True)[:TOP]:
+        print(f"{us / 1000:>16.1f}  {'  ' * depth}{name}")
+    print("=" * 60)
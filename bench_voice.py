@@ -0,0 +1,274 @@
+"""
+Voice pipeline replay harness
+Run this with: python bench_voice.py [corpus_dir] [--repeat N] [--speed X]
+                                     [--llm-latency S] [--llm-wps W] [--asr-latency S]
+                                     [--tts-wps W] [--verbose]
+
+Plays WAV files through a fake microphone into the real voice path:
+continuous capture, recognize_speech, main_loop dispatch, the streamed
+answer on the voice event loop, and the TTS queue. Speech recognition,
+Gemini (the synthetic LLM backend) and the TTS backend are replaced by
+stubs with configurable latency, so the numbers measure the pipeline itself and no network or
+audio hardware is needed.
+
+Corpus: 16 kHz mono 16-bit WAV files, one phrase each, played in name
+order. The transcript is the file name without a leading number, e.g.
+01_what_is_python.wav -> "what is python". Without a corpus a small
+synthetic one is generated. A wake phrase is played first and "exit"
+last.
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import threading
+import time
+
+# Never touch real services, the desktop or the response cache
+os.environ.update({
+    "GOOGLE_API_KEY": "replay",
+    "SUPABASE_URL": "",
+    "SUPABASE_KEY": "",
+    "TOOLS_DRY_RUN": "1",
+    "RESPONSE_CACHE_SIZE": "0",
+    "GEMINI_WARMUP": "0",
+    "TRACE_EXPORTER": "none",
+    "WAKE_TEMPLATES_DIR": os.path.join(os.path.dirname(os.path.abspath(__file__)), ".no-wake-templates"),
+})
+
+import numpy as np
+import speech_recognition as sr
+
+import llm_client
+import main
+from background_loop import VOICE_STAGE_LATENCY
+from llm_backends import SyntheticBackend
+from metrics import percentile
+from tts import TTSQueue, NullBackend
+from wake_word import SAMPLE_RATE, SAMPLE_WIDTH, read_wav
+
+CHUNK = 1024
+GAP_SECONDS = 1.5
+LEAD_SECONDS = 1.5
+
+SYNTHETIC_CORPUS = [
+    "what is python",
+    "tell me a joke",
+    "search for python tutorials",
+    "how far away is the moon",
+    "open notepad",
+    "explain machine learning in one sentence",
+]
+
+# Report order: harness stage name -> voice loop stage label
+STAGES = [
+    ("capture", None),
+    ("recognition", "recognize"),
+    ("dispatch", "dispatch"),
+    ("first_token", "first_token"),
+    ("llm", "respond"),
+    ("tts_start", "tts_first"),
+]
+
+_NAME_RE = re.compile(r"^\d+[_-]")
+
+
+# ---------- STUBS ----------
+class ReplayStream:
+    """
+    Microphone stream over a list of PCM clips separated by low noise,
+    paced at `speed` x real time. Records when each clip starts playing.
+    """
+
+    def __init__(self, clips, speed=1.0, seed=7):
+        rng = np.random.default_rng(seed)
+
+        def noise(seconds):
+            return rng.normal(0, 60, int(seconds * SAMPLE_RATE)).astype(np.int16).tobytes()
+
+        self._pcm = bytearray(noise(LEAD_SECONDS))
+        self._starts = []
+        for clip in clips:
+            self._starts.append(len(self._pcm))
+            self._pcm += clip + noise(GAP_SECONDS)
+        self._tail = noise(CHUNK / SAMPLE_RATE)
+        self.speed = speed
+        self.clip_started = [None] * len(clips)
+        self._pos = 0
+        self._next_clip = 0
+        self._t0 = None
+
+    def read(self, size):
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+        nbytes = size * SAMPLE_WIDTH
+        while self._next_clip < len(self._starts) and self._pos >= self._starts[self._next_clip]:
+            self.clip_started[self._next_clip] = time.perf_counter()
+            self._next_clip += 1
+
+        chunk = bytes(self._pcm[self._pos:self._pos + nbytes]) or self._tail[:nbytes]
+        self._pos += nbytes
+        if self.speed > 0:
+            # Deliver audio no faster than it would be spoken
+            due = self._t0 + self._pos / SAMPLE_WIDTH / SAMPLE_RATE / self.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return chunk
+
+
+class ReplayMicrophone(sr.AudioSource):
+    def __init__(self, stream):
+        self.stream = stream
+        self.SAMPLE_RATE = SAMPLE_RATE
+        self.SAMPLE_WIDTH = SAMPLE_WIDTH
+        self.CHUNK = CHUNK
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class StubRecognizer:
+    """
+    Returns the transcripts in order, after a fixed latency, and records
+    how long after its clip started each phrase reached recognition.
+    Before the final "exit" it lets earlier answers finish, since exit
+    cancels answers still in flight.
+    """
+
+    def __init__(self, transcripts, stream, latency):
+        self.transcripts = transcripts
+        self.stream = stream
+        self.latency = latency
+        self.capture = []
+        self._index = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, audio):
+        reached = time.perf_counter()
+        with self._lock:
+            index = self._index
+            self._index += 1
+        if index >= len(self.transcripts):
+            raise sr.UnknownValueError()
+        started = self.stream.clip_started[index]
+        if started is not None:
+            self.capture.append(reached - started)
+        time.sleep(self.latency)
+        if index == len(self.transcripts) - 1:
+            for future in list(main.pending_responses):
+                future.result()
+        return self.transcripts[index]
+
+
+# ---------- CORPUS ----------
+def synthetic_clip(text, seed):
+    """
+    Speech-like tone bursts, one per word, roughly 0.4 s each
+    """
+    rng = np.random.default_rng(seed)
+    parts = []
+    for _ in text.split():
+        seconds = rng.uniform(0.35, 0.45)
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        f1, f2 = rng.uniform(250, 800), rng.uniform(900, 2500)
+        envelope = np.sin(np.pi * t / seconds)
+        parts.append(envelope * (np.sin(2 * np.pi * f1 * t) + 0.6 * np.sin(2 * np.pi * f2 * t)))
+        parts.append(np.zeros(int(0.05 * SAMPLE_RATE)))
+    signal = np.concatenate(parts) * 7000
+    return np.clip(signal, -32768, 32767).astype(np.int16).tobytes()
+
+
+def load_corpus(path):
+    if path is None:
+        return [(text, synthetic_clip(text, i)) for i, text in enumerate(SYNTHETIC_CORPUS)]
+    corpus = []
+    for name in sorted(os.listdir(path)):
+        if name.lower().endswith(".wav"):
+            text = _NAME_RE.sub("", name[:-4]).replace("_", " ").lower()
+            corpus.append((text, read_wav(os.path.join(path, name))))
+    if not corpus:
+        raise SystemExit(f"No WAV files in {path}")
+    return corpus
+
+
+# ---------- REPORT ----------
+def record_stages():
+    """
+    Collect every raw voice-stage observation while the replay runs
+    """
+    samples = {}
+    observe = VOICE_STAGE_LATENCY.observe
+
+    def recording_observe(value, **labels):
+        samples.setdefault(labels.get("stage"), []).append(value)
+        observe(value, **labels)
+
+    VOICE_STAGE_LATENCY.observe = recording_observe
+    return samples
+
+
+def print_report(results, elapsed, utterances, llm_calls):
+    print("=" * 72)
+    print("VOICE PIPELINE REPLAY")
+    print("=" * 72)
+    print(f"Utterances:  {utterances}")
+    print(f"LLM calls:   {llm_calls}")
+    print(f"Wall time:   {elapsed:.2f}s")
+    print("-" * 72)
+    print(f"{'stage':<14}{'n':>5}{'mean':>10}{'p50':>10}{'p90':>10}{'p95':>10}{'max':>10}")
+    for stage, values in results:
+        if not values:
+            print(f"{stage:<14}{0:>5}")
+            continue
+        mean = sum(values) / len(values)
+        print(f"{stage:<14}{len(values):>5}"
+              f"{mean * 1000:>9.1f}ms{percentile(values, 50) * 1000:>8.1f}ms"
+              f"{percentile(values, 90) * 1000:>8.1f}ms{percentile(values, 95) * 1000:>8.1f}ms"
+              f"{max(values) * 1000:>8.1f}ms")
+    print("=" * 72)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Replay WAV files through the voice pipeline")
+    parser.add_argument("corpus", nargs="?", help="directory of WAV files (default: synthetic)")
+    parser.add_argument("--repeat", type=int, default=1, help="play the corpus N times")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed, 0 = unpaced")
+    parser.add_argument("--asr-latency", type=float, default=0.3, help="stub recognition seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stub Gemini seconds")
+    parser.add_argument("--llm-words", type=int, default=20, help="words per stub answer")
+    parser.add_argument("--llm-wps", type=float, default=0.0, help="stub Gemini streaming words/second, 0 = one chunk")
+    parser.add_argument("--tts-wps", type=float, default=0.0, help="stub TTS words/second, 0 = instant")
+    parser.add_argument("--verbose", action="store_true", help="show the assistant's own output")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) * args.repeat
+    clips = [synthetic_clip("hey jarvis", 1000)] + [pcm for _, pcm in corpus] + [synthetic_clip("exit", 1001)]
+    transcripts = ["hey jarvis"] + [text for text, _ in corpus] + ["exit"]
+
+    stream = ReplayStream(clips, speed=args.speed)
+    recognizer = StubRecognizer(transcripts, stream, args.asr_latency)
+    client = SyntheticBackend(latency=args.llm_latency, words=args.llm_words, words_per_second=args.llm_wps)
+    llm_client.set_client(client)
+    main.tts = TTSQueue(NullBackend(args.tts_wps))
+    samples = record_stages()
+
+    start = time.perf_counter()
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        main.main_loop(mic=ReplayMicrophone(stream), recognize=recognizer)
+    elapsed = time.perf_counter() - start
+
+    results = [
+        (stage, recognizer.capture if label is None else samples.get(label, []))
+        for stage, label in STAGES
+    ]
+    print_report(results, elapsed, len(transcripts), client.models.calls)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,49 @@
+"""
+Shared pytest setup. Tests never reach Gemini or Supabase: the
+environment is fixed before any app module reads .env, and the db and
+llm fixtures install in-memory stand-ins.
+"""
+import os
+
+import pytest
+
+# test_agents.py is a live debugging script: python test_agents.py
+collect_ignore = ["test_agents.py"]
+
+os.environ.update({
+    "GOOGLE_API_KEY": "test",
+    "SUPABASE_URL": "",
+    "SUPABASE_KEY": "",
+    "LLM_BACKEND": "synthetic",
+    "GEMINI_WARMUP": "0",
+    "TRACE_EXPORTER": "none",
+    "TOOLS_DRY_RUN": "1",
+})
+
+
+@pytest.fixture
+def db():
+    """
+    In-memory Supabase with no latency, installed for the test
+    """
+    from bench_api import MemorySupabase
+    from database import set_db
+
+    fake = MemorySupabase(0)
+    set_db(fake)
+    yield fake
+    set_db(None)
+
+
+@pytest.fixture
+def llm():
+    """
+    Instant synthetic LLM backend, installed for the test
+    """
+    from llm_backends import SyntheticBackend
+    from llm_client import set_client
+
+    backend = SyntheticBackend(latency=0, words=12, words_per_second=0)
+    set_client(backend)
+    yield backend
+    set_client(None)
@@ -1,50 +1,214 @@
 """
 Context engineering for conversation summarization
 """
-from google import genai
-import os
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
 
-# Use consistent model name
-MODEL_NAME = "gemini-2.5-flash"  # Or "gemini-2.5-flash" if available
+from database import get_db
+from llm_pool import llm_pool
+from llm_client import get_client, MODEL_NAME
+from memory import DEFAULT_SESSION, MEMORY_MAX_SESSIONS
+from token_budget import (
+    token_budget, summary_budget, estimate_tokens, truncate_tokens, pack_turns, join_turns
+)
+from tracing import span
 
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+NO_HISTORY = "No previous conversation history."
 
 
-def summarize_history(messages):
+class RollingSummary:
     """
-    Summarize conversation history for context
+    Persisted conversation summary that is folded forward one turn at a
+    time in the background, so requests read it instead of summarizing
+    the history on the critical path.
     """
-    if not messages:
-        return "No previous conversation history."
 
-    text_block = ""
-    for m in messages:
-        query = m.get('query', '')
-        response = m.get('response', '')
-        text_block += f"User: {query}\nAssistant: {response}\n\n"
+    def __init__(self, session_id=DEFAULT_SESSION):
+        self.session_id = session_id
+        self.summary = None
+        self.last_message_id = None
+        self.loaded = False
+        self._loading = None
+        self._pending = []
+        self._folding = []
+        self._task = None
 
-    # Limit history length to avoid token issues
-    if len(text_block) > 2000:
-        text_block = text_block[-2000:]
+    async def load(self, seed_messages=None):
+        """
+        Load the persisted summary; if none exists yet, build one from
+        seed_messages in the background. The select runs on a worker
+        thread so the event loop keeps serving other requests, and
+        concurrent callers wait on the same load.
+        """
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load(seed_messages))
+        await asyncio.shield(self._loading)
 
-    prompt = f"""
-Summarize the following conversation history into important facts,
-preferences, or unresolved questions to help an assistant continue:
+    async def _load(self, seed_messages):
+        with span("summary.load"):
+            row = await asyncio.to_thread(self._fetch)
+        self.loaded = True
+        if row:
+            self.summary = row["summary"]
+            self.last_message_id = row["last_message_id"]
+            return
 
+        if seed_messages:
+            # Oldest first so the newest turn is folded last, ahead of any
+            # turn scheduled while the select was running
+            self._pending[:0] = [
+                {"id": m.get("id"), "query": m.get("query", ""), "response": m.get("response", "")}
+                for m in reversed(seed_messages)
+            ]
+            self._ensure_task()
+
+    def _fetch(self):
+        db = get_db()
+        if not db:
+            return None
+
+        try:
+            res = db.table("conversation_summary") \
+                    .select("summary,last_message_id") \
+                    .eq("session_id", self.session_id) \
+                    .limit(1) \
+                    .execute()
+            return res.data[0] if res.data else None
+        except Exception as e:
+            print(f"Error loading rolling summary: {e}")
+            return None
+
+    def current(self):
+        """
+        Return the ready-made summary without calling the model, cut to
+        the model's summary budget
+        """
+        return truncate_tokens(self.summary or NO_HISTORY, summary_budget(MODEL_NAME))
+
+    def unfolded(self):
+        """
+        Turns not yet reflected in current(), oldest first: the batch
+        being folded now and the ones waiting behind it
+        """
+        return self._folding + self._pending
+
+    def schedule(self, message_id, query, response):
+        """
+        Queue a saved turn to be folded into the summary. message_id may
+        be a Future from MemoryAgent.save that resolves once persisted.
+        """
+        self._pending.append({"id": message_id, "query": query, "response": response})
+        self._ensure_task()
+
+    def _ensure_task(self):
+        if self._task and not self._task.done():
+            return
+        try:
+            self._task = asyncio.get_running_loop().create_task(self._drain())
+        except RuntimeError:
+            # No running loop; the turn is folded on the next schedule()
+            self._task = None
+
+    async def _drain(self):
+        if self._loading is not None:
+            # Seed turns from load() are older than anything scheduled
+            await asyncio.shield(self._loading)
+        while self._pending:
+            # Oldest turns that fit next to the summary; the rest wait for
+            # the next round. A single oversized turn is folded truncated.
+            turns, _ = pack_turns(self._pending, self._fold_budget())
+            turns = turns or self._pending[:1]
+            self._pending = self._pending[len(turns):]
+            self._folding = turns
+            try:
+                summary = await self._fold(turns)
+            except asyncio.CancelledError:
+                self._pending = turns + self._pending
+                raise
+            finally:
+                self._folding = []
+            if summary is None:
+                continue
+
+            self.summary = summary
+            ids = []
+            for turn in turns:
+                message_id = turn["id"]
+                if isinstance(message_id, Future):
+                    message_id = await asyncio.wrap_future(message_id)
+                if message_id is not None:
+                    ids.append(message_id)
+            if ids:
+                self.last_message_id = max(ids)
+            await asyncio.to_thread(self._persist)
+
+    def _fold_budget(self):
+        return max(1, token_budget(MODEL_NAME) - estimate_tokens(self.current()))
+
+    async def _fold(self, turns):
+        text_block = truncate_tokens(join_turns(turns), self._fold_budget())
+
+        prompt = f"""
+Current summary of the conversation so far:
+{self.current()}
+
+New exchange:
 {text_block}
 
-Provide a short bullet-point summary:
+Update the summary with any new facts, preferences, or unresolved
+questions from the new exchange. Keep it a short bullet-point summary:
 """
 
-    try:
-        res = client.models.generate_content(
-            model=MODEL_NAME,
-            contents=prompt
-        )
-        
-        summary = res.text if hasattr(res, 'text') else str(res)
-        return summary.strip()
-    
-    except Exception as e:
-        print(f"Error summarizing history: {e}")
-        return "Unable to summarize conversation history."
\ No newline at end of file
+        try:
+            with span("summary.fold", turns=len(turns)):
+                res = await llm_pool.generate_content(
+                    get_client(), MODEL_NAME, prompt, agent="rolling_summary"
+                )
+            summary = res.text if hasattr(res, 'text') else str(res)
+            return summary.strip()
+        except Exception as e:
+            print(f"Error updating rolling summary: {e}")
+            return None
+
+    def _persist(self):
+        db = get_db()
+        if not db or self.last_message_id is None:
+            return
+
+        try:
+            db.table("conversation_summary").upsert({
+                "session_id": self.session_id,
+                "last_message_id": self.last_message_id,
+                "summary": self.summary,
+                "timestamp": datetime.utcnow().isoformat()
+            }, on_conflict="session_id").execute()
+        except Exception as e:
+            print(f"Error saving rolling summary: {e}")
+
+
+class SummaryStore:
+    """
+    LRU map of per-session rolling summaries
+    """
+
+    def __init__(self, max_sessions=MEMORY_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id=DEFAULT_SESSION):
+        with self._lock:
+            summary = self._summaries.get(session_id)
+            if summary is None:
+                summary = self._summaries[session_id] = RollingSummary(session_id)
+                while len(self._summaries) > self.max_sessions:
+                    self._summaries.popitem(last=False)
+            else:
+                self._summaries.move_to_end(session_id)
+            return summary
+
+
+rolling_summaries = SummaryStore()
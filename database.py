@@ -1,31 +1,71 @@
 """
 Database configuration - Central database connection
-This file should be imported by all other modules that need DB access
+This file should be imported by all other modules that need DB access.
+The Supabase client is created on first use through get_db().
 """
 import os
+import threading
 from dotenv import load_dotenv
 
-try:
-    from supabase import create_client
-    SUPABASE_AVAILABLE = True
-except ImportError:
-    SUPABASE_AVAILABLE = False
-    print("⚠️  Warning: Supabase not available. Memory features will be limited.")
-
 load_dotenv()
 
 url = os.getenv("SUPABASE_URL")
 key = os.getenv("SUPABASE_KEY")
 
-# Initialize database connection
-db = None
-if SUPABASE_AVAILABLE and url and key:
+_db = None
+_connected = False
+_lock = threading.Lock()
+
+
+def _connect():
+    if not url or not key:
+        print("ℹ️  Supabase credentials not found - running without database")
+        return None
+
+    try:
+        from supabase import create_client
+    except ImportError:
+        print("⚠️  Warning: Supabase not available. Memory features will be limited.")
+        return None
+
     try:
-        db = create_client(url, key)
+        client = create_client(url, key)
         print("✓ Supabase connected successfully")
+        return client
     except Exception as e:
         print(f"✗ Supabase connection error: {e}")
-        db = None
-else:
-    if not url or not key:
-        print("ℹ️  Supabase credentials not found - running without database")
\ No newline at end of file
+        return None
+
+
+def get_db():
+    """
+    The shared Supabase client, connected on first call.
+    Returns None when running without a database.
+    """
+    global _db, _connected
+    if _connected:
+        return _db
+
+    with _lock:
+        if not _connected:
+            _db = _connect()
+            _connected = True
+    return _db
+
+
+def set_db(client):
+    """
+    Replace the shared client (tests, local stand-ins);
+    None drops it so the next get_db() connects again
+    """
+    global _db, _connected
+    with _lock:
+        _db = client
+        _connected = client is not None
+
+
+def __getattr__(name):
+    # Keep `database.db` working for callers that read it directly
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,13 +1,32 @@
 """
 Evaluation system for testing agent responses
+Run this with: python evaluation.py [tests.jsonl] [--concurrency N] [--backend NAME]
+
+Test sets are JSONL, one item per line:
+    {"question": "What is Python?", "keyword": "programming"}
+"keyword" may also be a list; an answer passes if it contains any of
+them. Items run concurrently through the same parallel_run pipeline
+the API uses, without conversation memory and with tool calls only
+logged, so an evaluation leaves no trace in real sessions.
 """
-from google import genai
+import asyncio
+import json
 import os
+import time
+import uuid
+from collections import OrderedDict
 
-# Use consistent model name
-MODEL_NAME = "gemini-2.0-flash-exp"  # Or "gemini-2.5-flash" if available
+from llm_pool import track_usage
+from metrics import percentile
 
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+# Items evaluated at the same time
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "16"))
+# Highest concurrency an API caller may ask for
+EVAL_MAX_CONCURRENCY = int(os.getenv("EVAL_MAX_CONCURRENCY", "64"))
+# Finished jobs kept for the status endpoint
+EVAL_MAX_JOBS = int(os.getenv("EVAL_MAX_JOBS", "20"))
+# Directory the API may load named datasets from
+EVAL_DATA_DIR = os.getenv("EVAL_DATA_DIR", "evals")
 
 TEST_SET = [
     ("What is Python?", "programming"),
@@ -15,42 +34,202 @@ TEST_SET = [
     ("Define machine learning", "learning"),
 ]
 
-def run_evaluation():
+
+def load_test_set(path):
     """
-    Run evaluation tests on the AI agent
+    Read a JSONL test set into a list of (question, keywords) pairs
+    """
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+                items.append((row["question"], row["keyword"]))
+            except (ValueError, KeyError) as e:
+                raise ValueError(f"{path}:{number}: expected question and keyword ({e})")
+    return items
+
+
+def dataset_path(name):
+    """
+    Resolve a dataset name inside EVAL_DATA_DIR; None if it does not exist
     """
-    results = []
-    score = 0
+    base = os.path.realpath(EVAL_DATA_DIR)
+    path = os.path.realpath(os.path.join(base, f"{name}.jsonl"))
+    if os.path.dirname(path) != base or not os.path.isfile(path):
+        return None
+    return path
+
 
-    for q, keyword in TEST_SET:
+def _passed(response, keywords):
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    text = response.lower()
+    return any(k.lower() in text for k in keywords)
+
+
+class EvalJob:
+    """
+    One evaluation run: progress while running, summary when done
+    """
+
+    def __init__(self, items, concurrency=EVAL_CONCURRENCY, use_cache=False, name=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.items = items
+        self.concurrency = max(1, concurrency)
+        self.use_cache = use_cache
+        self.status = "queued"
+        self.error = None
+        self.results = [None] * len(items)
+        self.completed = 0
+        self.started = None
+        self.finished = None
+        self.task = None
+
+    async def _run_item(self, index, semaphore):
+        from agents import parallel_run
+
+        question, keywords = self.items[index]
+        async with semaphore:
+            start = time.perf_counter()
+            with track_usage() as usage:
+                try:
+                    _, response = await parallel_run(
+                        question, f"eval-{self.id}-{index}", use_cache=self.use_cache,
+                        use_memory=False, dry_run=True
+                    )
+                    response = response or ""
+                    ok = _passed(response, keywords)
+                except Exception as e:
+                    response, ok = f"Error: {str(e)}", False
+                tokens = dict(usage)
+            latency = time.perf_counter() - start
+
+        self.results[index] = {
+            "question": question,
+            "passed": ok,
+            "response": response[:140],
+            "latency": round(latency, 4),
+            "tokens": tokens["total_tokens"],
+            "llm_calls": tokens["calls"],
+        }
+        self.completed += 1
+
+    async def run(self):
+        self.status = "running"
+        self.started = time.time()
+        semaphore = asyncio.Semaphore(self.concurrency)
         try:
-            res = client.models.generate_content(
-                model=MODEL_NAME,
-                contents=q
-            )
-
-            response_text = res.text if hasattr(res, 'text') else str(res)
-            ok = keyword.lower() in response_text.lower()
-
-            if ok:
-                score += 1
-
-            results.append({
-                "question": q,
-                "passed": ok,
-                "response": response_text[:140]
-            })
-        
+            await asyncio.gather(*(self._run_item(i, semaphore) for i in range(len(self.items))))
+            self.status = "done"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            raise
         except Exception as e:
-            results.append({
-                "question": q,
-                "passed": False,
-                "response": f"Error: {str(e)}"
-            })
-
-    accuracy = (score / len(TEST_SET) * 100) if TEST_SET else 0
-
-    return {
-        "accuracy": accuracy,
-        "results": results
-    }
\ No newline at end of file
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            self.finished = time.time()
+        return self
+
+    def summary(self, include_results=False):
+        done = [r for r in self.results if r is not None]
+        latencies = [r["latency"] for r in done]
+        passed = sum(1 for r in done if r["passed"])
+        elapsed = (self.finished or time.time()) - self.started if self.started else 0.0
+
+        report = {
+            "job_id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "total": len(self.items),
+            "completed": self.completed,
+            "concurrency": self.concurrency,
+            "accuracy": (passed / len(done) * 100) if done else 0,
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "tokens_per_item": (sum(r["tokens"] for r in done) / len(done)) if done else 0,
+            "elapsed": round(elapsed, 3),
+            "items_per_second": round(len(done) / elapsed, 2) if elapsed > 0 else 0,
+        }
+        if self.error:
+            report["error"] = self.error
+        if include_results:
+            report["results"] = done
+        return report
+
+
+class EvalJobs:
+    """
+    Background evaluation jobs, newest kept, oldest finished dropped
+    """
+
+    def __init__(self, max_jobs=EVAL_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+
+    def start(self, items, concurrency=EVAL_CONCURRENCY, use_cache=False, name=None):
+        """
+        Start a job on the running event loop and return it immediately
+        """
+        job = EvalJob(items, concurrency, use_cache, name)
+        job.task = asyncio.get_running_loop().create_task(job.run())
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            oldest = next((j for j in self._jobs.values() if j.status not in ("queued", "running")), None)
+            if oldest is None:
+                break
+            del self._jobs[oldest.id]
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list(self):
+        return [job.summary() for job in reversed(self._jobs.values())]
+
+
+eval_jobs = EvalJobs()
+
+
+async def run_evaluation_async(items=None, concurrency=EVAL_CONCURRENCY, use_cache=False):
+    """
+    Evaluate items (default: TEST_SET) and return the job summary with
+    per-item results
+    """
+    job = EvalJob(TEST_SET if items is None else items, concurrency, use_cache)
+    await job.run()
+    return job.summary(include_results=True)
+
+
+def run_evaluation():
+    """
+    Run evaluation tests on the AI agent
+    """
+    return asyncio.run(run_evaluation_async())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate the agent on a JSONL test set")
+    parser.add_argument("path", nargs="?", help="JSONL test set (default: built-in TEST_SET)")
+    parser.add_argument("--concurrency", type=int, default=EVAL_CONCURRENCY)
+    parser.add_argument("--cache", action="store_true", help="allow response cache hits")
+    parser.add_argument("--results", action="store_true", help="print per-item results")
+    parser.add_argument("--backend", help="LLM backend: gemini, record, replay or synthetic")
+    args = parser.parse_args()
+
+    if args.backend:
+        from llm_client import use_backend
+        use_backend(args.backend)
+
+    items = load_test_set(args.path) if args.path else None
+    report = asyncio.run(run_evaluation_async(items, args.concurrency, args.cache))
+    if not args.results:
+        report.pop("results")
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,152 @@
+"""
+Compiled single-pass intent dispatcher for voice and planner commands
+"""
+import re
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text):
+    """
+    Lower-cased word tokens with their character spans
+    """
+    return [(m.group(), m.start(), m.end()) for m in _TOKEN_RE.finditer(text.lower())]
+
+
+class IntentMatch:
+    """
+    Result of routing an utterance: the winning intent and its arguments
+    """
+    __slots__ = ("name", "handler", "data", "phrase", "args")
+
+    def __init__(self, name, handler, data, phrase, args):
+        self.name = name
+        self.handler = handler
+        self.data = data
+        self.phrase = phrase
+        self.args = args
+
+    def __repr__(self):
+        return f"IntentMatch({self.name!r}, phrase={self.phrase!r}, args={self.args!r})"
+
+
+class IntentRouter:
+    """
+    Command table compiled into one Aho-Corasick automaton over word
+    tokens. match() scans the utterance once, whatever the table size,
+    and only whole words match ("back" does not fire on "feedback").
+
+    When several intents match, the one registered first wins, which
+    mirrors the order of the old if/elif chains. The arguments are the
+    utterance with every phrase of the winning intent removed.
+    """
+
+    def __init__(self):
+        self._intents = []
+        self._goto = None
+        self._fail = None
+        self._out = None
+
+    def __len__(self):
+        return len(self._intents)
+
+    def add(self, name, phrases, handler=None, data=None):
+        """
+        Register an intent triggered by any of phrases
+        """
+        if isinstance(phrases, str):
+            phrases = [phrases]
+        self._intents.append((name, tuple(phrases), handler, data))
+        self._goto = None
+        return self
+
+    def compile(self):
+        """
+        Build the automaton; called lazily by match()
+        """
+        goto = [{}]
+        out = [[]]
+        for index, (_, phrases, _, _) in enumerate(self._intents):
+            for phrase in phrases:
+                words = [t for t, _, _ in tokenize(phrase)]
+                if not words:
+                    continue
+                node = 0
+                for word in words:
+                    nxt = goto[node].get(word)
+                    if nxt is None:
+                        nxt = goto[node][word] = len(goto)
+                        goto.append({})
+                        out.append([])
+                    node = nxt
+                out[node].append((index, len(words), phrase))
+
+        # Breadth-first failure links
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for node in queue:
+            for word, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and word not in goto[f]:
+                    f = fail[f]
+                fallback = goto[f].get(word, 0)
+                fail[nxt] = fallback if fallback != nxt else 0
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._goto, self._fail, self._out = goto, fail, out
+
+    def _scan(self, tokens):
+        if self._goto is None:
+            self.compile()
+        goto, fail, out = self._goto, self._fail, self._out
+
+        node = 0
+        for i, (word, _, _) in enumerate(tokens):
+            while node and word not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(word, 0)
+            for index, length, phrase in out[node]:
+                yield index, i - length + 1, i, phrase
+
+    def match(self, text):
+        """
+        Resolve text to the highest-priority IntentMatch, or None
+        """
+        tokens = tokenize(text)
+        best = None
+        spans = []
+        for index, first, last, phrase in self._scan(tokens):
+            if best is None or index < best[0]:
+                best = (index, phrase)
+                spans = [(first, last)]
+            elif index == best[0]:
+                if last - first > spans[0][1] - spans[0][0]:
+                    best = (index, phrase)
+                spans.append((first, last))
+
+        if best is None:
+            return None
+
+        # Merge overlapping phrase spans, then cut them out of the text
+        merged = []
+        for first, last in sorted(spans):
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], last)
+            else:
+                merged.append([first, last])
+        args = text
+        for first, last in reversed(merged):
+            args = args[:tokens[first][1]] + " " + args[tokens[last][2]:]
+        args = " ".join(args.split())
+
+        name, _, handler, data = self._intents[best[0]]
+        return IntentMatch(name, handler, data, best[1], args)
+
+    def matches(self, text):
+        """
+        True if any intent matches text
+        """
+        for _ in self._scan(tokenize(text)):
+            return True
+        return False
@@ -0,0 +1,300 @@
+"""
+LLM backends - interchangeable stand-ins for the Gemini client
+
+Every backend has the client shape the agents already use:
+client.models.generate_content(model=, contents=),
+client.models.generate_content_stream(model=, contents=) and
+client.models.get(model=). Responses carry .text and .usage_metadata.
+llm_client picks one from LLM_BACKEND:
+
+    gemini     the real Gemini API (default)
+    record     the real Gemini API, appending every answer to LLM_CASSETTE
+    replay     answers served from LLM_CASSETTE, no network or key
+    synthetic  generated answers with configurable latency and streaming
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+# JSONL file written by the record backend and read by the replay backend
+LLM_CASSETTE = os.getenv("LLM_CASSETTE", "cassettes/llm.jsonl")
+# Replay with the latency that was recorded instead of instantly
+LLM_REPLAY_TIMING = os.getenv("LLM_REPLAY_TIMING", "0").lower() in ("1", "true", "yes")
+# Synthetic backend: seconds to the first chunk, +/- jitter
+LLM_SYNTHETIC_LATENCY = float(os.getenv("LLM_SYNTHETIC_LATENCY", "0.5"))
+LLM_SYNTHETIC_JITTER = float(os.getenv("LLM_SYNTHETIC_JITTER", "0"))
+# Synthetic backend: answer length and streaming speed (0 = all at once)
+LLM_SYNTHETIC_WORDS = int(os.getenv("LLM_SYNTHETIC_WORDS", "40"))
+LLM_SYNTHETIC_WPS = float(os.getenv("LLM_SYNTHETIC_WPS", "60"))
+LLM_SYNTHETIC_CHUNK_WORDS = int(os.getenv("LLM_SYNTHETIC_CHUNK_WORDS", "8"))
+
+BACKENDS = ("gemini", "record", "replay", "synthetic")
+
+_FILLER = (
+    "This is a synthetic answer generated for offline testing. It has the "
+    "length and pacing of a real reply but none of the content. Every word "
+    "here stands in for a token that a real model would have produced."
+).split()
+
+
+class CassetteMiss(LookupError):
+    """
+    The replay cassette has no answer for a prompt
+    """
+
+
+class Usage:
+    __slots__ = ("prompt_token_count", "candidates_token_count", "total_token_count")
+
+    def __init__(self, prompt_token_count=0, candidates_token_count=0, total_token_count=None):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = (
+            total_token_count if total_token_count is not None
+            else prompt_token_count + candidates_token_count
+        )
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Response:
+    """
+    The parts of a Gemini response the agents read
+    """
+    __slots__ = ("text", "usage_metadata")
+
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class ModelInfo:
+    def __init__(self, name):
+        self.name = f"models/{name}"
+
+
+def prompt_key(model, contents):
+    """
+    Stable cassette key for one request
+    """
+    if not isinstance(contents, str):
+        contents = json.dumps(contents, sort_keys=True, default=str)
+    return hashlib.sha256(f"{model}\0{contents}".encode("utf-8")).hexdigest()
+
+
+def _usage_dict(response):
+    meta = getattr(response, "usage_metadata", None)
+    if meta is None:
+        return None
+    return {name: getattr(meta, name, None) or 0 for name in Usage.__slots__}
+
+
+class Backend:
+    """
+    Base class: a backend is its own `models` namespace
+    """
+    name = "backend"
+
+    @property
+    def models(self):
+        return self
+
+    def get(self, model, **kwargs):
+        return ModelInfo(model)
+
+
+class RecordingBackend(Backend):
+    """
+    Passes calls through to a real client and appends each answer, its
+    usage and its timings to a JSONL cassette. Streams are recorded
+    chunk by chunk once they finish.
+    """
+    name = "record"
+
+    def __init__(self, inner, path=LLM_CASSETTE):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, model, **kwargs):
+        return self.inner.models.get(model=model, **kwargs)
+
+    def _write(self, entry):
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def generate_content(self, model, contents, **kwargs):
+        start = time.perf_counter()
+        res = self.inner.models.generate_content(model=model, contents=contents, **kwargs)
+        latency = time.perf_counter() - start
+        self._write({
+            "key": prompt_key(model, contents),
+            "model": model,
+            "prompt": contents if isinstance(contents, str) else None,
+            "chunks": [res.text or ""],
+            "usage": _usage_dict(res),
+            "first_chunk": round(latency, 4),
+            "latency": round(latency, 4),
+        })
+        return res
+
+    def generate_content_stream(self, model, contents, **kwargs):
+        start = time.perf_counter()
+        first = None
+        chunks = []
+        last = None
+        for chunk in self.inner.models.generate_content_stream(model=model, contents=contents, **kwargs):
+            if first is None:
+                first = time.perf_counter() - start
+            chunks.append(getattr(chunk, "text", None) or "")
+            last = chunk
+            yield chunk
+        latency = time.perf_counter() - start
+        self._write({
+            "key": prompt_key(model, contents),
+            "model": model,
+            "prompt": contents if isinstance(contents, str) else None,
+            "chunks": chunks,
+            "usage": _usage_dict(last),
+            "first_chunk": round(first if first is not None else latency, 4),
+            "latency": round(latency, 4),
+        })
+
+
+class ReplayBackend(Backend):
+    """
+    Serves answers from a cassette. Repeated prompts get their recorded
+    answers in order, cycling when they run out, so a replay is
+    deterministic. With timing=True the recorded latency is reproduced.
+    """
+    name = "replay"
+
+    def __init__(self, path=LLM_CASSETTE, timing=LLM_REPLAY_TIMING):
+        self.path = path
+        self.timing = timing
+        self.calls = 0
+        self._entries = {}
+        self._served = {}
+        self._lock = threading.Lock()
+
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["key"], []).append(entry)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def _entry(self, model, contents):
+        key = prompt_key(model, contents)
+        with self._lock:
+            self.calls += 1
+            entries = self._entries.get(key)
+            if not entries:
+                preview = contents[:60] if isinstance(contents, str) else key[:12]
+                raise CassetteMiss(f"No recorded answer for {preview!r} in {self.path}")
+            n = self._served.get(key, 0)
+            self._served[key] = n + 1
+        return entries[n % len(entries)]
+
+    @staticmethod
+    def _usage(entry):
+        return Usage(**entry["usage"]) if entry.get("usage") else None
+
+    def generate_content(self, model, contents, **kwargs):
+        entry = self._entry(model, contents)
+        if self.timing:
+            time.sleep(entry.get("latency", 0))
+        return Response("".join(entry["chunks"]), self._usage(entry))
+
+    def generate_content_stream(self, model, contents, **kwargs):
+        entry = self._entry(model, contents)
+        chunks = entry["chunks"] or [""]
+        if self.timing:
+            time.sleep(entry.get("first_chunk", 0))
+            gap = max(0.0, entry.get("latency", 0) - entry.get("first_chunk", 0)) / max(1, len(chunks) - 1)
+        for n, text in enumerate(chunks):
+            if self.timing and n:
+                time.sleep(gap)
+            last = n == len(chunks) - 1
+            yield Response(text, self._usage(entry) if last else None)
+
+
+class SyntheticBackend(Backend):
+    """
+    Makes up answers: latency (+/- jitter) to the first chunk, then
+    chunk_words words at a time at words_per_second. Answers and jitter
+    are seeded from the prompt, so runs are repeatable.
+    """
+    name = "synthetic"
+
+    def __init__(self, latency=LLM_SYNTHETIC_LATENCY, jitter=LLM_SYNTHETIC_JITTER,
+                 words=LLM_SYNTHETIC_WORDS, words_per_second=LLM_SYNTHETIC_WPS,
+                 chunk_words=LLM_SYNTHETIC_CHUNK_WORDS):
+        self.latency = latency
+        self.jitter = jitter
+        self.words = words
+        self.words_per_second = words_per_second
+        self.chunk_words = max(1, chunk_words)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _plan(self, model, contents):
+        with self._lock:
+            self.calls += 1
+        rng = random.Random(prompt_key(model, contents))
+        delay = max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+        start = rng.randrange(len(_FILLER))
+        words = [_FILLER[(start + i) % len(_FILLER)] for i in range(self.words)]
+        prompt_tokens = len(contents if isinstance(contents, str) else str(contents)) // 4
+        return delay, words, prompt_tokens
+
+    def _usage(self, prompt_tokens, words):
+        # Roughly four tokens for every three English words
+        return Usage(prompt_tokens, (len(words) * 4 + 2) // 3)
+
+    def generate_content(self, model, contents, **kwargs):
+        delay, words, prompt_tokens = self._plan(model, contents)
+        if self.words_per_second > 0:
+            delay += len(words) / self.words_per_second
+        time.sleep(delay)
+        return Response(" ".join(words), self._usage(prompt_tokens, words))
+
+    def generate_content_stream(self, model, contents, **kwargs):
+        delay, words, prompt_tokens = self._plan(model, contents)
+        time.sleep(delay)
+        if self.words_per_second <= 0:
+            yield Response(" ".join(words), self._usage(prompt_tokens, words))
+            return
+        for i in range(0, len(words), self.chunk_words):
+            chunk = words[i:i + self.chunk_words]
+            time.sleep(len(chunk) / self.words_per_second)
+            last = i + self.chunk_words >= len(words)
+            text = " ".join(chunk) + ("" if last else " ")
+            yield Response(text, self._usage(prompt_tokens, words) if last else None)
+
+
+def create_backend(name, gemini=None):
+    """
+    Build a non-Gemini backend by name; `gemini` creates the real client
+    for the record backend
+    """
+    if name == "record":
+        if gemini is None:
+            raise ValueError("The record backend needs a Gemini client")
+        return RecordingBackend(gemini())
+    if name == "replay":
+        return ReplayBackend()
+    if name == "synthetic":
+        return SyntheticBackend()
+    raise ValueError(f"Unknown LLM backend: {name!r} (choose from {', '.join(BACKENDS)})")
@@ -0,0 +1,129 @@
+"""
+Shared Gemini client - one pooled client per process
+LLM_BACKEND swaps it for an offline backend (see llm_backends.py).
+"""
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from llm_pool import LLM_MAX_CONCURRENCY
+
+load_dotenv()
+
+# Central model configuration used by every agent
+MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+# gemini, record, replay or synthetic
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+
+# Keep-alive connections held open to the Gemini API; defaults to one per
+# pool worker so concurrent calls never wait on a fresh TLS handshake
+GEMINI_POOL_SIZE = int(os.getenv("GEMINI_POOL_SIZE", str(LLM_MAX_CONCURRENCY)))
+GEMINI_KEEPALIVE_EXPIRY = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY", "60"))
+# Open a connection at API startup so the first request does not pay for it.
+# Off by default: it calls the real API as soon as the server starts.
+GEMINI_WARMUP = os.getenv("GEMINI_WARMUP", "0").lower() in ("1", "true", "yes")
+# Alternative API endpoint, e.g. a proxy or a local stub server
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+
+_client = None
+_client_failed = False
+_lock = threading.Lock()
+
+
+def _create_gemini():
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        print("ERROR: GOOGLE_API_KEY not found in environment variables!")
+        print("Please add GOOGLE_API_KEY to your .env file")
+
+    # Deferred: the SDK is slow to import and only needed once a call is made
+    import httpx
+    from google import genai
+    from google.genai import types
+
+    limits = httpx.Limits(
+        max_connections=GEMINI_POOL_SIZE,
+        max_keepalive_connections=GEMINI_POOL_SIZE,
+        keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY,
+    )
+    http_options = types.HttpOptions(
+        client_args={"limits": limits},
+        async_client_args={"limits": limits},
+        base_url=GEMINI_BASE_URL,
+    )
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+def _create_client(backend=None):
+    backend = backend or LLM_BACKEND
+    if backend == "gemini":
+        return _create_gemini()
+
+    from llm_backends import create_backend
+    return create_backend(backend, gemini=_create_gemini)
+
+
+def get_client():
+    """
+    The process-wide Gemini client, created on first use.
+    Returns None if the client could not be created.
+    """
+    global _client, _client_failed
+    if _client is not None or _client_failed:
+        return _client
+
+    with _lock:
+        if _client is None and not _client_failed:
+            try:
+                _client = _create_client()
+                if LLM_BACKEND == "gemini":
+                    print("✓ Gemini API client initialized")
+                else:
+                    print(f"✓ LLM backend: {LLM_BACKEND}")
+            except Exception as e:
+                print(f"✗ Failed to initialize Gemini client: {e}")
+                _client_failed = True
+    return _client
+
+
+def set_client(client):
+    """
+    Replace the shared client (tests, alternative backends);
+    None drops it so the next get_client() creates a fresh one
+    """
+    global _client, _client_failed
+    with _lock:
+        _client = client
+        _client_failed = False
+
+
+def use_backend(name):
+    """
+    Switch every agent to the named backend (gemini, record, replay,
+    synthetic); raises ValueError for an unknown name
+    """
+    client = _create_client(name)
+    set_client(client)
+    return client
+
+
+def warm_up():
+    """
+    Create the client and open a pooled connection with a cheap model
+    lookup. Returns the time taken, or None if it failed.
+    """
+    client = get_client()
+    if client is None:
+        return None
+
+    start = time.perf_counter()
+    try:
+        client.models.get(model=MODEL_NAME)
+    except Exception as e:
+        print(f"⚠️  Gemini warm-up failed: {e}")
+        return None
+    elapsed = time.perf_counter() - start
+    print(f"✓ Gemini connection warmed up in {elapsed:.2f}s")
+    return elapsed
@@ -0,0 +1,247 @@
+"""
+Bounded async execution pool for LLM calls
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from metrics import registry, LLM_CALLS, LLM_LATENCY, LLM_PROMPT_TOKENS, LLM_QUEUE_WAIT, LLM_IN_FLIGHT, LLM_QUEUED
+from token_budget import estimate_tokens
+from tracing import span, start_span
+
+# Maximum number of Gemini calls in flight per process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+
+_STREAM_END = object()
+
+# Token accounting for the calls made within one unit of work (see track_usage)
+_usage = contextvars.ContextVar("llm_usage", default=None)
+
+
+@contextmanager
+def track_usage():
+    """
+    Count Gemini tokens for every call made inside the with-block,
+    including calls from tasks it starts. Yields the running totals.
+    """
+    usage = {"calls": 0, "prompt_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+
+def _record_usage(usage, response):
+    if usage is None:
+        return
+    usage["calls"] += 1
+    meta = getattr(response, "usage_metadata", None)
+    if meta is None:
+        return
+    usage["prompt_tokens"] += getattr(meta, "prompt_token_count", None) or 0
+    usage["output_tokens"] += getattr(meta, "candidates_token_count", None) or 0
+    usage["total_tokens"] += getattr(meta, "total_token_count", None) or 0
+
+
+def _set_usage(s, response):
+    meta = getattr(response, "usage_metadata", None)
+    if meta is not None:
+        s.set("prompt_tokens", getattr(meta, "prompt_token_count", None) or 0)
+        s.set("output_tokens", getattr(meta, "candidates_token_count", None) or 0)
+
+
+def _observe_prompt(contents, agent, model):
+    if isinstance(contents, str):
+        LLM_PROMPT_TOKENS.observe(estimate_tokens(contents), agent=agent, model=model)
+
+
+class LLMPool:
+    """
+    Runs blocking Gemini SDK calls on a managed thread pool so the
+    event loop stays free while a request waits on the network.
+    Calls beyond the concurrency cap queue up inside the pool.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY):
+        self.max_concurrency = max(1, max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="llm"
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._peak_queued = 0
+        self._completed = 0
+        self._failed = 0
+
+    def _run(self, enqueued, fn, args, kwargs):
+        LLM_QUEUE_WAIT.observe(time.perf_counter() - enqueued)
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        else:
+            with self._lock:
+                self._completed += 1
+            return result
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Await a blocking callable on the pool
+        """
+        with self._lock:
+            self._queued += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(
+                self._executor, self._run, time.perf_counter(), fn, args, kwargs
+            )
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            raise
+        return await future
+
+    async def generate_content(self, client, model, contents, agent="conversation"):
+        """
+        Awaitable wrapper around client.models.generate_content
+        """
+        _observe_prompt(contents, agent, model)
+        start = time.perf_counter()
+        status = "error"
+        try:
+            with span("llm.generate", agent=agent, model=model) as s:
+                res = await self.run(
+                    client.models.generate_content,
+                    model=model,
+                    contents=contents
+                )
+                if s:
+                    _set_usage(s, res)
+            status = "ok"
+            _record_usage(_usage.get(), res)
+            return res
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            LLM_LATENCY.observe(time.perf_counter() - start, agent=agent, model=model)
+            LLM_CALLS.inc(agent=agent, model=model, status=status)
+
+    async def stream_content(self, client, model, contents, agent="conversation"):
+        """
+        Async iterator over client.models.generate_content_stream chunks.
+        The blocking stream is consumed on the pool and each chunk is
+        handed back to the event loop as soon as it arrives.
+        """
+        _observe_prompt(contents, agent, model)
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # Event loop already closed; nobody is listening
+                stop.set()
+
+        def produce():
+            try:
+                for chunk in client.models.generate_content_stream(
+                    model=model,
+                    contents=contents
+                ):
+                    if stop.is_set():
+                        break
+                    put((chunk, None))
+            except Exception as e:
+                put((None, e))
+                raise
+            finally:
+                put((_STREAM_END, None))
+
+        start = time.perf_counter()
+        status = "error"
+        last = None
+        # Not made current: an async generator's context is its caller's
+        s = start_span("llm.stream", agent=agent, model=model)
+        error = None
+        producer = asyncio.ensure_future(self.run(produce))
+        # Errors reach the consumer through the queue
+        producer.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            while True:
+                chunk, error = await queue.get()
+                if error is not None:
+                    raise error
+                if chunk is _STREAM_END:
+                    status = "ok"
+                    # The final chunk carries the usage for the whole stream
+                    _record_usage(_usage.get(), last)
+                    if s:
+                        _set_usage(s, last)
+                    break
+                last = chunk
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit) as e:
+            status = "cancelled"
+            error = e
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            stop.set()
+            if s:
+                s.end(error)
+            LLM_LATENCY.observe(time.perf_counter() - start, agent=agent, model=model)
+            LLM_CALLS.inc(agent=agent, model=model, status=status)
+
+    def stats(self):
+        """
+        Snapshot of pool utilisation and queue depth
+        """
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "peak_queued": self._peak_queued,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+
+    def shutdown(self):
+        """
+        Stop accepting work and release worker threads
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+llm_pool = LLMPool()
+
+
+def _collect_pool_metrics():
+    stats = llm_pool.stats()
+    LLM_IN_FLIGHT.set(stats["in_flight"])
+    LLM_QUEUED.set(stats["queued"])
+
+
+registry.add_collector(_collect_pool_metrics)
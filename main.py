@@ -3,21 +3,33 @@ JARVIS ELITE - Multi-Agent Voice Assistant
 Fixed version with proper error handling and async support
 """
 
-import speech_recognition as sr
 import os
-import webbrowser
+import json
 import subprocess
 import sys
 import time
 import asyncio
+import threading
 import platform
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, Field
 
 # Import agents
-from agents import planner, executor, ai_agent, parallel_run
-from evaluation import run_evaluation
+from agents import planner, executor, ai_agent, memory, parallel_run, parallel_run_stream
+from memory import DEFAULT_SESSION
+from llm_pool import llm_pool
+from llm_client import warm_up, GEMINI_WARMUP
+from observability import obs
+from response_cache import response_cache
+from intent_router import IntentRouter
+from metrics import registry
+from evaluation import eval_jobs, run_evaluation_async, load_test_set, dataset_path, EVAL_CONCURRENCY, EVAL_MAX_CONCURRENCY
+from background_loop import voice_loop, VOICE_STAGE_LATENCY
+from tracing import trace, new_trace_id, traces, exporter, TRACE_SLOW_MS
+from tools import ALLOWED_APPS, ALLOWED_WEBSITES, FOLDERS, tool_executor, API_TOOLS_DRY_RUN
 
 # ================= PLATFORM DETECTION =================
 
@@ -25,32 +37,71 @@ IS_WINDOWS = platform.system() == "Windows"
 IS_MAC = platform.system() == "Darwin"
 IS_LINUX = platform.system() == "Linux"
  
-# Windows-specific imports
+# Voice and automation modules are loaded by load_voice_modules() so the
+# API server never imports them
+sr = None
 WINDOWS_FEATURES = False
-if IS_WINDOWS:
-    try:
-        import win32com.client
-        import pyautogui
-        pyautogui.FAILSAFE = False
-        WINDOWS_FEATURES = True
-        print("✓ Windows automation features enabled")
-    except ImportError:
-        print("⚠️  Windows automation unavailable (install: pip install pywin32 pyautogui)")
+tts = None
+
+def load_voice_modules():
+    """Import speech recognition, Windows automation and TTS for voice mode"""
+    global sr, WINDOWS_FEATURES, tts
+    if sr is not None:
+        return
+
+    import speech_recognition
+    sr = speech_recognition
+
+    if IS_WINDOWS:
+        try:
+            import win32com.client
+            import pyautogui
+            pyautogui.FAILSAFE = False
+            WINDOWS_FEATURES = True
+            print("✓ Windows automation features enabled")
+        except ImportError:
+            print("⚠️  Windows automation unavailable (install: pip install pywin32 pyautogui)")
+
+    if tts is None:
+        from tts import TTSQueue
+        tts = TTSQueue()
+        print(f"✓ TTS engine initialized ({type(tts.backend).__name__})")
 
 load_dotenv()
 
 # ================= FASTAPI SERVER =================
 
-app = FastAPI(title="Jarvis Elite Multi-Agent Assistant")
+@asynccontextmanager
+async def lifespan(app):
+    # Serve conversation history from RAM from the first request
+    await asyncio.to_thread(memory.warm)
+    # Embedding older history can take a while; let requests start meanwhile
+    threading.Thread(target=memory.warm_index, name="vector-warm", daemon=True).start()
+    if GEMINI_WARMUP:
+        threading.Thread(target=warm_up, name="gemini-warm", daemon=True).start()
+    yield
+    # Flush write-behind memory and telemetry before the worker exits
+    memory.close()
+    obs.shutdown()
+    exporter.close()
+
+app = FastAPI(title="Jarvis Elite Multi-Agent Assistant", lifespan=lifespan)
 
 class Query(BaseModel):
     query: str
+    session_id: str = DEFAULT_SESSION
+    no_cache: bool = False
 
 @app.post("/ask")
-async def ask(data: Query):
+async def ask(data: Query, response: Response):
     """Handle API requests"""
     try:
-        exec_output, ai_text = await parallel_run(data.query)
+        with trace("ask", session_id=data.session_id) as root:
+            response.headers["X-Trace-Id"] = root.trace_id
+            exec_output, ai_text = await parallel_run(
+                data.query, data.session_id, use_cache=not data.no_cache,
+                dry_run=API_TOOLS_DRY_RUN
+            )
         result = {"response": ai_text}
         if exec_output:
             result["executor"] = exec_output
@@ -58,13 +109,73 @@ async def ask(data: Query):
     except Exception as e:
         return {"error": str(e)}
 
+@app.post("/ask/stream")
+async def ask_stream(data: Query):
+    """Stream the executor result and AI tokens as server-sent events"""
+    trace_id = new_trace_id()
+
+    async def events():
+        with trace("ask.stream", trace_id=trace_id, session_id=data.session_id):
+            async for event, payload in parallel_run_stream(
+                data.query, data.session_id, use_cache=not data.no_cache,
+                dry_run=API_TOOLS_DRY_RUN
+            ):
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Trace-Id": trace_id}
+    )
+
 @app.get("/")
 def home():
     return {"status": "Jarvis Elite is running", "platform": platform.system()}
 
+class EvalRequest(BaseModel):
+    dataset: str | None = None
+    items: list[dict] | None = Field(None, min_length=1)
+    concurrency: int = Field(EVAL_CONCURRENCY, ge=1, le=EVAL_MAX_CONCURRENCY)
+    use_cache: bool = False
+
 @app.get("/evaluate")
-def evaluate():
-    return run_evaluation()
+async def evaluate():
+    """Run the built-in test set and wait for the report"""
+    return await run_evaluation_async()
+
+@app.post("/evaluate")
+async def start_evaluation(data: EvalRequest):
+    """Start a background evaluation over a named dataset or inline items"""
+    try:
+        if data.items is not None:
+            items = [(row["question"], row["keyword"]) for row in data.items]
+        elif data.dataset:
+            path = dataset_path(data.dataset)
+            if path is None:
+                return {"error": f"Unknown dataset: {data.dataset}"}
+            items = load_test_set(path)
+            if not items:
+                return {"error": f"Empty dataset: {data.dataset}"}
+        else:
+            return {"error": "Provide a dataset name or items"}
+    except (KeyError, TypeError, ValueError) as e:
+        return {"error": f"Invalid test set: {e}"}
+
+    job = eval_jobs.start(items, data.concurrency, data.use_cache, name=data.dataset)
+    return job.summary()
+
+@app.get("/evaluate/jobs")
+def evaluation_jobs():
+    """Recent evaluation jobs, newest first"""
+    return {"jobs": eval_jobs.list()}
+
+@app.get("/evaluate/{job_id}")
+def evaluation_status(job_id: str, results: bool = False):
+    """Progress of a running job, or its report once done"""
+    job = eval_jobs.get(job_id)
+    if job is None:
+        return {"error": f"Unknown job: {job_id}"}
+    return job.summary(include_results=results)
 
 @app.get("/health")
 def health():
@@ -72,7 +183,29 @@ def health():
     return {
         "status": "healthy",
         "platform": platform.system(),
-        "windows_features": WINDOWS_FEATURES
+        "windows_features": WINDOWS_FEATURES,
+        "llm_pool": llm_pool.stats(),
+        "telemetry": obs.stats(),
+        "memory": memory.stats(),
+        "response_cache": response_cache.stats()
+    }
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/traces")
+def debug_traces(min_ms: float = TRACE_SLOW_MS, limit: int = 20, trace_id: str | None = None):
+    """Recent traces of at least min_ms, slowest first, or one trace by id"""
+    if trace_id:
+        found = traces.get(trace_id)
+        return found.to_dict() if found else {"error": f"Unknown trace: {trace_id}"}
+    return {
+        "min_ms": min_ms,
+        "kept": len(traces),
+        "exporter": exporter.stats(),
+        "traces": [t.to_dict() for t in traces.slow(min_ms, limit)],
     }
 
 # ================= CONFIGURATION =================
@@ -81,124 +214,84 @@ WAKE_WORDS = ["hey jarvis", "ok jarvis", "wake up", "jarvis"]
 EXIT_WORDS = ["exit", "goodbye", "shut down"]
 GREETING = "Hello sir, how can I assist you?"
 
-# Cross-platform application paths
-ALLOWED_APPS = {
-    "notepad": r"C:\Windows\System32\notepad.exe" if IS_WINDOWS else "open -a TextEdit" if IS_MAC else "gedit",
-    "calculator": r"C:\Windows\System32\calc.exe" if IS_WINDOWS else "open -a Calculator" if IS_MAC else "gnome-calculator"
-}
-
-ALLOWED_WEBSITES = {
-    "google": "https://www.google.com",
-    "youtube": "https://www.youtube.com",
-    "facebook": "https://www.facebook.com",
-    "twitter": "https://www.twitter.com",
-    "instagram": "https://www.instagram.com",
-    "github": "https://www.github.com",
-    "linkedin": "https://www.linkedin.com",
-    "gmail": "https://mail.google.com",
-    "amazon": "https://www.amazon.com",
-    "netflix": "https://www.netflix.com",
-    "stackoverflow": "https://stackoverflow.com",
-    "chatgpt": "https://chat.openai.com",
-    "reddit": "https://www.reddit.com"
-}
-
-# Cross-platform folders
-FOLDERS = {
-    "documents": os.path.expanduser("~/Documents"),
-    "downloads": os.path.expanduser("~/Downloads"),
-    "desktop": os.path.expanduser("~/Desktop"),
-    "home": os.path.expanduser("~")
-}
+WAKE_COMMANDS = IntentRouter().add("wake", WAKE_WORDS)
+EXIT_COMMANDS = IntentRouter().add("exit", EXIT_WORDS)
 
 # ================= TEXT TO SPEECH =================
 
-tts_engine = None
-if WINDOWS_FEATURES:
-    try:
-        tts_engine = win32com.client.Dispatch("SAPI.SpVoice")
-        print("✓ TTS engine initialized")
-    except Exception as e:
-        print(f"⚠️  TTS initialization failed: {e}")
-        WINDOWS_FEATURES = False
-
 # Global TTS control flags
 GEMINI_MUTED = False
-STOP_READING = False
 
 def speak(text, is_gemini=False):
     """
-    Text-to-speech with interrupt support
+    Queue text for speaking; returns immediately so listening continues
+    while it plays
     """
-    global GEMINI_MUTED, STOP_READING
-
     if not text or text.strip() == "":
         return
 
     print(f"\n🤖 Assistant: {text}")
 
-    if not WINDOWS_FEATURES or not tts_engine:
-        return
-
     if is_gemini and GEMINI_MUTED:
         print("🔇 (Gemini muted)")
         return
 
-    STOP_READING = False
+    if tts:
+        tts.say(text)
 
-    try:
-        sentences = text.split(". ")
-        for sentence in sentences:
-            if STOP_READING:
-                tts_engine.Skip("Sentence", 999999)
-                print("⏹️  Speech interrupted")
-                break
-            
-            if sentence.strip():
-                tts_engine.Speak(sentence + ".")
-    
-    except Exception as e:
-        print(f"TTS Error: {e}")
+def stop_speaking():
+    """Cut off the current sentence and everything queued behind it"""
+    if tts:
+        tts.stop()
 
 # ================= SPEECH RECOGNITION =================
 
+# Started by main_loop: calibrated once, then captures continuously
+voice_input = None
+
 def recognize_speech(recognizer, mic, timeout=6):
     """
-    Recognize speech with error handling
+    Next recognized phrase from the background listener, or "" if
+    nothing was heard within timeout seconds
     """
     try:
-        with mic as source:
-            recognizer.adjust_for_ambient_noise(source, duration=0.4)
-            print("🎤 Listening...")
-            audio = recognizer.listen(source, timeout=timeout, phrase_time_limit=8)
-        
-        text = recognizer.recognize_google(audio).lower()
-        print(f"👤 You: {text}")
-        return text
-    
-    except sr.WaitTimeoutError:
-        print("⏱️  No speech detected")
-        return ""
-    
-    except sr.UnknownValueError:
-        print("❓ Could not understand audio")
-        return ""
-    
-    except sr.RequestError as e:
-        print(f"❌ Speech recognition error: {e}")
-        return ""
-    
+        utterance = voice_input.next_utterance(timeout)
+        if utterance is None:
+            print("⏱️  No speech detected")
+            return ""
+
+        if not utterance.text and not utterance.error:
+            # Checked locally for a wake word and none was found
+            return ""
+
+        if utterance.error == "unknown":
+            print("❓ Could not understand audio")
+            return ""
+        if utterance.error:
+            print(f"❌ Speech recognition error: {utterance.error}")
+            return ""
+
+        print(f"👤 You: {utterance.text}")
+        print(f"⏱️  speech {utterance.audio_seconds:.1f}s | recognize {utterance.recognize_seconds:.2f}s | "
+              f"waited {time.perf_counter() - utterance.captured:.2f}s")
+        return utterance.text
+
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
         return ""
 
+def timed_recognize(recognizer, mic, timeout=6):
+    """recognize_speech, recording how long the listen stage took"""
+    with VOICE_STAGE_LATENCY.time(stage="listen"):
+        return recognize_speech(recognizer, mic, timeout)
+
 def detect_wake_word(text):
     """Check if wake word is present"""
-    return any(word in text for word in WAKE_WORDS)
+    return WAKE_COMMANDS.matches(text)
 
 def detect_exit_word(text):
     """Check if exit word is present"""
-    return any(word in text for word in EXIT_WORDS)
+    return EXIT_COMMANDS.matches(text)
 
 # ================= MEMORY =================
 
@@ -254,13 +347,24 @@ def safe_click(x, y):
     except Exception as e:
         print(f"Click error: {e}")
 
+# ================= TOOLS =================
+
+def run_tool(name, *args):
+    """
+    Run a tool through tool_executor on the voice loop (timeout,
+    concurrency limit, metrics) and return its result
+    """
+    report = voice_loop.run(tool_executor.run(name, *args))
+    if report["status"] != "ok":
+        raise RuntimeError(report.get("error") or report["status"])
+    return report["result"]
+
 # ================= GOOGLE SEARCH =================
 
 def perform_google_search(query):
     """Perform Google search"""
     try:
-        search_url = f"https://www.google.com/search?q={query.replace(' ', '+')}"
-        webbrowser.open(search_url)
+        run_tool("google_search", query)
         add_recent_search(query)
         speak(f"Searching for {query}")
     except Exception as e:
@@ -269,129 +373,111 @@ def perform_google_search(query):
 
 # ================= CONTROL MODES =================
 
-def google_control_mode(recognizer, mic):
-    """Google search voice control mode"""
-    speak("Google mode activated. You can search multiple times. Say 'exit google' to leave.")
-
-    while True:
-        cmd = recognize_speech(recognizer, mic)
-
-        if not cmd:
-            continue
-
-        if "exit google" in cmd or "stop google" in cmd:
-            speak("Exiting Google mode.")
-            break
-
-        elif "search" in cmd or "search for" in cmd:
-            query = cmd.replace("search for", "").replace("search", "").strip()
-            if query:
-                perform_google_search(query)
-            else:
-                speak("What would you like to search for?")
-
-        elif "scroll down" in cmd:
-            if WINDOWS_FEATURES:
-                import pyautogui
-                pyautogui.scroll(-700)
-            speak("Scrolling down")
-
-        elif "scroll up" in cmd:
-            if WINDOWS_FEATURES:
-                import pyautogui
-                pyautogui.scroll(700)
-            speak("Scrolling up")
-
-        elif "go back" in cmd or "back" in cmd:
-            safe_hotkey("alt", "left")
-            speak("Going back")
-
-        elif "forward" in cmd:
-            safe_hotkey("alt", "right")
-            speak("Going forward")
-
-        elif "refresh" in cmd or "reload" in cmd:
-            safe_hotkey("f5")
-            speak("Refreshing page")
-
-        elif "new tab" in cmd:
-            safe_hotkey("ctrl", "t")
-            speak("Opening new tab")
-
-        elif "close tab" in cmd:
-            safe_hotkey("ctrl", "w")
-            speak("Closing tab")
-
-def youtube_control_mode(recognizer, mic):
-    """YouTube voice control mode"""
-    speak("YouTube control mode activated. Say 'exit youtube' to leave.")
+EXIT_MODE = "exit_mode"
 
+def scroll(amount):
+    """Scroll the active window"""
+    if WINDOWS_FEATURES:
+        import pyautogui
+        pyautogui.scroll(amount)
+
+def hotkey_action(*keys, message=None):
+    """Build a command handler that presses a hotkey"""
+    def handler(match):
+        safe_hotkey(*keys)
+        if message:
+            speak(message)
+    return handler
+
+def scroll_action(amount, message):
+    """Build a command handler that scrolls"""
+    def handler(match):
+        scroll(amount)
+        speak(message)
+    return handler
+
+def exit_mode_action(message):
+    """Build a command handler that leaves a control mode"""
+    def handler(match):
+        speak(message)
+        return EXIT_MODE
+    return handler
+
+def run_control_mode(commands, recognizer, mic):
+    """Dispatch utterances through commands until a handler leaves the mode"""
     while True:
         cmd = recognize_speech(recognizer, mic)
 
         if not cmd:
             continue
 
-        if "exit youtube" in cmd or "stop youtube" in cmd:
-            speak("Exiting YouTube mode.")
+        match = commands.match(cmd)
+        if match and match.handler(match) == EXIT_MODE:
             break
 
-        elif "pause" in cmd or "resume" in cmd or "play" in cmd:
-            safe_hotkey("k")
-
-        elif "next video" in cmd or "skip" in cmd:
-            safe_hotkey("shift", "n")
+def google_search_action(match):
+    if match.args:
+        perform_google_search(match.args)
+    else:
+        speak("What would you like to search for?")
+
+GOOGLE_COMMANDS = IntentRouter() \
+    .add("exit", ["exit google", "stop google"], exit_mode_action("Exiting Google mode.")) \
+    .add("search", ["search for", "search"], google_search_action) \
+    .add("scroll_down", "scroll down", scroll_action(-700, "Scrolling down")) \
+    .add("scroll_up", "scroll up", scroll_action(700, "Scrolling up")) \
+    .add("back", ["go back", "back"], hotkey_action("alt", "left", message="Going back")) \
+    .add("forward", "forward", hotkey_action("alt", "right", message="Going forward")) \
+    .add("refresh", ["refresh", "reload"], hotkey_action("f5", message="Refreshing page")) \
+    .add("new_tab", "new tab", hotkey_action("ctrl", "t", message="Opening new tab")) \
+    .add("close_tab", "close tab", hotkey_action("ctrl", "w", message="Closing tab"))
+
+YOUTUBE_COMMANDS = IntentRouter() \
+    .add("exit", ["exit youtube", "stop youtube"], exit_mode_action("Exiting YouTube mode.")) \
+    .add("play_pause", ["pause", "resume", "play"], hotkey_action("k")) \
+    .add("next", ["next video", "skip"], hotkey_action("shift", "n")) \
+    .add("previous", "previous video", hotkey_action("shift", "p")) \
+    .add("scroll_down", "scroll down", scroll_action(-700, "Scrolling down")) \
+    .add("scroll_up", "scroll up", scroll_action(700, "Scrolling up")) \
+    .add("full_screen", "full screen", hotkey_action("f"))
+
+def whatsapp_search_action(match):
+    name = match.args
+    speak(f"Searching for {name}")
+    safe_hotkey("ctrl", "f")
+    time.sleep(0.3)
+    safe_type(name)
+    time.sleep(0.5)
+    if WINDOWS_FEATURES:
+        import pyautogui
+        pyautogui.press("enter")
 
-        elif "previous video" in cmd:
-            safe_hotkey("shift", "p")
+def whatsapp_message_action(match):
+    speak("Sending message.")
+    safe_type(match.args)
+    if WINDOWS_FEATURES:
+        import pyautogui
+        pyautogui.press("enter")
 
-        elif "scroll down" in cmd:
-            if WINDOWS_FEATURES:
-                import pyautogui
-                pyautogui.scroll(-700)
-            speak("Scrolling down")
+WHATSAPP_COMMANDS = IntentRouter() \
+    .add("exit", ["exit whatsapp", "stop whatsapp"], exit_mode_action("Leaving WhatsApp mode.")) \
+    .add("search", "search", whatsapp_search_action) \
+    .add("message", ["message", "send"], whatsapp_message_action)
 
-        elif "scroll up" in cmd:
-            if WINDOWS_FEATURES:
-                import pyautogui
-                pyautogui.scroll(700)
-            speak("Scrolling up")
+def google_control_mode(recognizer, mic):
+    """Google search voice control mode"""
+    speak("Google mode activated. You can search multiple times. Say 'exit google' to leave.")
+    run_control_mode(GOOGLE_COMMANDS, recognizer, mic)
 
-        elif "full screen" in cmd:
-            safe_hotkey("f")
+def youtube_control_mode(recognizer, mic):
+    """YouTube voice control mode"""
+    speak("YouTube control mode activated. Say 'exit youtube' to leave.")
+    run_control_mode(YOUTUBE_COMMANDS, recognizer, mic)
 
 def whatsapp_control_mode(recognizer, mic):
     """WhatsApp voice control mode"""
     speak("WhatsApp mode activated. Say 'exit whatsapp' to leave.")
-
-    while True:
-        cmd = recognize_speech(recognizer, mic)
-
-        if not cmd:
-            continue
-
-        if "exit whatsapp" in cmd or "stop whatsapp" in cmd:
-            speak("Leaving WhatsApp mode.")
-            break
-
-        elif "search" in cmd:
-            name = cmd.replace("search", "").strip()
-            speak(f"Searching for {name}")
-            safe_hotkey("ctrl", "f")
-            time.sleep(0.3)
-            safe_type(name)
-            time.sleep(0.5)
-            if WINDOWS_FEATURES:
-                import pyautogui
-                pyautogui.press("enter")
-
-        elif "message" in cmd or "send" in cmd:
-            msg = cmd.replace("message", "").replace("send", "").strip()
-            speak("Sending message.")
-            safe_type(msg)
-            if WINDOWS_FEATURES:
-                import pyautogui
-                pyautogui.press("enter")
+    run_control_mode(WHATSAPP_COMMANDS, recognizer, mic)
 
 # ================= APPLICATION LAUNCH =================
 
@@ -418,86 +504,193 @@ def open_whatsapp():
         speak("Unable to open WhatsApp.")
         return False
 
+def open_whatsapp_target(match, recognizer, mic):
+    if open_whatsapp():
+        time.sleep(5)
+        if recognizer and mic:
+            whatsapp_control_mode(recognizer, mic)
+
+def open_app_target(match, recognizer, mic):
+    app, path = match.name, match.data
+    try:
+        run_tool("open_app", path)
+        speak(f"Opening {app}")
+    except Exception as e:
+        print(f"App open error: {e}")
+        speak(f"Sorry, I couldn't open {app}")
+
+def open_website_target(match, recognizer, mic):
+    site, url = match.name, match.data
+    try:
+        run_tool("open_url", url)
+        speak(f"Opening {site}")
+        time.sleep(3)
+
+        # Special control modes
+        if site == "youtube" and recognizer and mic:
+            youtube_control_mode(recognizer, mic)
+        elif site == "google" and recognizer and mic:
+            google_control_mode(recognizer, mic)
+        
+    except Exception as e:
+        print(f"Website open error: {e}")
+        speak(f"Sorry, I couldn't open {site}")
+
+def open_folder_target(match, recognizer, mic):
+    name, path = match.name, match.data
+    if not os.path.exists(path):
+        return
+    try:
+        run_tool("open_folder", path)
+        speak(f"Opening {name} folder.")
+    except Exception as e:
+        print(f"Folder open error: {e}")
+
+# WhatsApp first, then desktop apps, websites and folders
+OPEN_TARGETS = IntentRouter().add("whatsapp", "whatsapp", open_whatsapp_target)
+for _app, _path in ALLOWED_APPS.items():
+    OPEN_TARGETS.add(_app, _app, open_app_target, _path)
+for _site, _url in ALLOWED_WEBSITES.items():
+    OPEN_TARGETS.add(_site, _site, open_website_target, _url)
+for _name, _path in FOLDERS.items():
+    OPEN_TARGETS.add(_name, _name, open_folder_target, _path)
+
 def open_application(cmd, recognizer=None, mic=None):
     """Open applications or websites"""
-    
-    # WhatsApp
-    if "whatsapp" in cmd:
-        if open_whatsapp():
-            time.sleep(5)
-            if recognizer and mic:
-                whatsapp_control_mode(recognizer, mic)
-        return
+    match = OPEN_TARGETS.match(cmd)
+    if match:
+        match.handler(match, recognizer, mic)
 
-    # Desktop applications
-    for app, path in ALLOWED_APPS.items():
-        if app in cmd:
-            try:
-                if IS_WINDOWS:
-                    subprocess.Popen(path)
-                else:
-                    os.system(path)
-                speak(f"Opening {app}")
-            except Exception as e:
-                print(f"App open error: {e}")
-                speak(f"Sorry, I couldn't open {app}")
-            return
+# ================= AI RESPONSE =================
 
-    # Websites
-    for site, url in ALLOWED_WEBSITES.items():
-        if site in cmd:
-            try:
-                webbrowser.open(url)
-                speak(f"Opening {site}")
-                time.sleep(3)
-
-                # Special control modes
-                if site == "youtube" and recognizer and mic:
-                    youtube_control_mode(recognizer, mic)
-                elif site == "google" and recognizer and mic:
-                    google_control_mode(recognizer, mic)
-                
-            except Exception as e:
-                print(f"Website open error: {e}")
-                speak(f"Sorry, I couldn't open {site}")
-            return
+# Answers still being generated; cancelled on exit
+pending_responses = set()
 
-    # Folders
-    for name, path in FOLDERS.items():
-        if name in cmd and os.path.exists(path):
-            try:
-                if IS_WINDOWS:
-                    os.startfile(path)
-                elif IS_MAC:
-                    os.system(f"open '{path}'")
-                else:
-                    os.system(f"xdg-open '{path}'")
-                speak(f"Opening {name} folder.")
-            except Exception as e:
-                print(f"Folder open error: {e}")
-            return
+async def stream_response(cmd, asked):
+    """
+    Stream the answer into the TTS queue sentence by sentence, so speech
+    starts while the rest of the answer is still being generated
+    """
+    with trace("voice", dispatch_ms=round((time.perf_counter() - asked) * 1000, 3)):
+        await _stream_response(cmd, asked)
 
-# ================= AI RESPONSE =================
+async def _stream_response(cmd, asked):
+    stream = tts.open() if tts else None
+    first_token = None
+    printed = False
+    try:
+        async for event, data in parallel_run_stream(cmd):
+            if event == "done":
+                break
+            if event == "token":
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    VOICE_STAGE_LATENCY.observe(first_token - asked, stage="first_token")
+                if not printed:
+                    print("\n🤖 Assistant: ", end="")
+                    printed = True
+                print(data, end="", flush=True)
+                if stream and not GEMINI_MUTED:
+                    stream.write(data)
+                continue
+
+            text = data["result"] if event == "step" else data
+            if text:
+                print(f"\n🤖 Assistant: {text}")
+                if stream and not GEMINI_MUTED:
+                    stream.write(f"{text}\n")
+    finally:
+        if stream:
+            stream.close()
+        if printed:
+            print()
+
+    answered = time.perf_counter()
+    VOICE_STAGE_LATENCY.observe(answered - asked, stage="respond")
+    first = f"{first_token - asked:.2f}s" if first_token else "-"
+    print(f"⏱️  first token {first} | respond {answered - asked:.2f}s")
 
 def respond_to_conversation(cmd):
-    """Get AI response with async support"""
-    try:
-        exec_result, ai_text = asyncio.run(parallel_run(cmd))
-        
-        if exec_result:
-            speak(exec_result)
-        
-        speak(ai_text, is_gemini=True)
-    
-    except Exception as e:
+    """Send the command to the voice event loop without waiting for the answer"""
+    asked = time.perf_counter()
+    future = voice_loop.submit(stream_response(cmd, asked))
+    pending_responses.add(future)
+    future.add_done_callback(pending_responses.discard)
+    future.add_done_callback(report_response_error)
+    return future
+
+def report_response_error(future):
+    if future.cancelled():
+        return
+    e = future.exception()
+    if e is not None:
         print(f"AI response error: {e}")
         speak("Sorry, I encountered an error processing your request.")
 
+def cancel_responses():
+    """Stop answers that are still being generated"""
+    for future in list(pending_responses):
+        future.cancel()
+
+# ================= MAIN COMMANDS =================
+
+SLEEP = "sleep"
+SHUTDOWN = "shutdown"
+
+def exit_command(match, recognizer, mic):
+    cancel_responses()
+    stop_speaking()
+    speak("Goodbye sir. Shutting down.")
+    return SHUTDOWN
+
+def stop_reading_command(match, recognizer, mic):
+    stop_speaking()
+    print("⏹️  Stopped reading")
+
+def mute_command(match, recognizer, mic):
+    global GEMINI_MUTED
+    GEMINI_MUTED = True
+    speak("Gemini responses muted.")
+
+def unmute_command(match, recognizer, mic):
+    global GEMINI_MUTED
+    GEMINI_MUTED = False
+    speak("Gemini responses unmuted.")
+
+def recent_searches_command(match, recognizer, mic):
+    show_recent_searches()
+
+def google_search_command(match, recognizer, mic):
+    if match.args:
+        perform_google_search(match.args)
+
+def open_command(match, recognizer, mic):
+    open_application(match.args, recognizer, mic)
+
+def sleep_command(match, recognizer, mic):
+    speak("Going to sleep. Say a wake word to wake me up.")
+    return SLEEP
+
+# Registration order is priority order
+MAIN_COMMANDS = IntentRouter() \
+    .add("exit", EXIT_WORDS, exit_command) \
+    .add("stop_reading", ["stop reading", "stop talking"], stop_reading_command) \
+    .add("mute", ["mute gemini", "mute ai"], mute_command) \
+    .add("unmute", ["unmute gemini", "unmute ai"], unmute_command) \
+    .add("recent_searches", ["recent searches", "search history"], recent_searches_command) \
+    .add("google_search", ["google search", "search for"], google_search_command) \
+    .add("open", "open", open_command) \
+    .add("sleep", ["sleep", "go to sleep"], sleep_command)
+
 # ================= MAIN LOOP =================
 
-def main_loop():
-    """Main voice assistant loop"""
-    global GEMINI_MUTED, STOP_READING
+def main_loop(mic=None, recognize=None):
+    """
+    Main voice assistant loop. mic and recognize replace the microphone
+    and Google recognition (replay harness, tests).
+    """
+    global voice_input
+    load_voice_modules()
 
     print("\n" + "="*60)
     print("🤖 JARVIS ELITE - Multi-Agent Voice Assistant")
@@ -509,21 +702,36 @@ def main_loop():
     recognizer = sr.Recognizer()
     
     # Try to get microphone
-    try:
-        mic = sr.Microphone()
-        print("✓ Microphone initialized")
-    except Exception as e:
-        print(f"❌ Microphone error: {e}")
-        print("Please check your microphone connection.")
-        return
+    if mic is None:
+        try:
+            mic = sr.Microphone()
+            print("✓ Microphone initialized")
+        except Exception as e:
+            print(f"❌ Microphone error: {e}")
+            print("Please check your microphone connection.")
+            return
+
+    memory.warm()
+    threading.Thread(target=memory.warm_index, name="vector-warm", daemon=True).start()
+    voice_loop.start()
+
+    from voice_input import VoiceInput
+    from wake_word import WakeWordDetector, WAKE_TEMPLATES_DIR
+    wake_detector = WakeWordDetector.from_directory()
+    if wake_detector:
+        print(f"✓ Offline wake-word detection ({len(wake_detector.templates)} templates)")
+    else:
+        print(f"ℹ️  No wake-word templates in {WAKE_TEMPLATES_DIR}/ - using online recognition for wake words")
+    voice_input = VoiceInput(recognizer, mic, recognize=recognize, wake_detector=wake_detector).start()
 
     speak("Jarvis Elite activated.")
     speak("Say a wake word to begin.")
 
     try:
         while True:
-            # Wait for wake word
-            wake = recognize_speech(recognizer, mic, timeout=10)
+            # Wait for wake word; spotted offline when templates exist
+            voice_input.awaiting_wake = True
+            wake = timed_recognize(recognizer, mic, timeout=10)
             
             if not wake:
                 continue
@@ -531,64 +739,28 @@ def main_loop():
             if not detect_wake_word(wake):
                 continue
 
+            voice_input.awaiting_wake = False
             speak(GREETING)
 
             # Active listening mode
             while True:
-                cmd = recognize_speech(recognizer, mic)
+                cmd = timed_recognize(recognizer, mic)
 
                 if not cmd:
                     continue
 
-                # ========== GLOBAL CONTROLS ==========
+                # One pass over the command table; no match goes to the AI
+                match = MAIN_COMMANDS.match(cmd)
+                if not match:
+                    respond_to_conversation(cmd)
+                    continue
 
-                if detect_exit_word(cmd):
-                    STOP_READING = True
-                    if tts_engine:
-                        tts_engine.Skip("Sentence", 999999)
-                    speak("Goodbye sir. Shutting down.")
+                signal = match.handler(match, recognizer, mic)
+                if signal == SHUTDOWN:
                     return
-
-                elif "stop reading" in cmd or "stop talking" in cmd:
-                    STOP_READING = True
-                    if tts_engine:
-                        tts_engine.Skip("Sentence", 999999)
-                    print("⏹️  Stopped reading")
-
-                elif "mute gemini" in cmd or "mute ai" in cmd:
-                    GEMINI_MUTED = True
-                    speak("Gemini responses muted.")
-
-                elif "unmute gemini" in cmd or "unmute ai" in cmd:
-                    GEMINI_MUTED = False
-                    speak("Gemini responses unmuted.")
-
-                # ========== SEARCH ==========
-
-                elif "recent searches" in cmd or "search history" in cmd:
-                    show_recent_searches()
-
-                elif "google search" in cmd or "search for" in cmd:
-                    query = cmd.replace("google search", "").replace("search for", "").strip()
-                    if query:
-                        perform_google_search(query)
-
-                # ========== APPLICATION CONTROL ==========
-
-                elif "open" in cmd:
-                    open_application(cmd, recognizer, mic)
-
-                # ========== SLEEP MODE ==========
-
-                elif "sleep" in cmd or "go to sleep" in cmd:
-                    speak("Going to sleep. Say a wake word to wake me up.")
+                if signal == SLEEP:
                     break
 
-                # ========== DEFAULT AI ==========
-
-                else:
-                    respond_to_conversation(cmd)
-
     except KeyboardInterrupt:
         print("\n\n⚠️  Interrupted by user")
         speak("Shutting down.")
@@ -599,6 +771,13 @@ def main_loop():
         traceback.print_exc()
         speak("A critical error occurred. Shutting down.")
 
+    finally:
+        voice_input.stop()
+        cancel_responses()
+        if tts:
+            tts.close()
+        voice_loop.stop()
+
 # ================= START =================
 
 if __name__ == "__main__":
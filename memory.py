@@ -1,47 +1,271 @@
 """
 Memory management for conversation history
 """
+import asyncio
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from database import db  # Import from database.py, not define here
+from database import get_db
+from metrics import registry, MEMORY_LATENCY
+from token_budget import turn_tokens
+from tracing import span, start_span
+from vector_index import VectorIndex, NUMPY_AVAILABLE
+
+DEFAULT_SESSION = "default"
+
+# Turns kept in RAM for each session
+MEMORY_SESSION_HISTORY = int(os.getenv("MEMORY_SESSION_HISTORY", "20"))
+# Sessions kept in RAM before the least recently used one is evicted
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "5000"))
+# Rows loaded across all sessions when the process starts
+MEMORY_WARM_ROWS = int(os.getenv("MEMORY_WARM_ROWS", "1000"))
+# Relevance recall: past turns pulled into the prompt and the index size
+MEMORY_RELEVANT_K = int(os.getenv("MEMORY_RELEVANT_K", "3"))
+MEMORY_RELEVANT_MIN_SCORE = float(os.getenv("MEMORY_RELEVANT_MIN_SCORE", "0.25"))
+VECTOR_WARM_ROWS = int(os.getenv("VECTOR_WARM_ROWS", "200000"))
+VECTOR_WARM_BATCH = 5000
+
+MEMORY_SESSIONS = registry.gauge(
+    "jarvis_memory_sessions", "Sessions held in the in-process memory tier"
+)
+MEMORY_EVICTIONS = registry.counter(
+    "jarvis_memory_evictions_total", "Sessions evicted from the in-process memory tier"
+)
 
 
 class MemoryAgent:
     """
-    Agent for managing conversation memory
+    Agent for managing conversation memory.
+
+    Recent turns are kept per session in bounded ring buffers, with the
+    sessions themselves held in an LRU map. recent() is served from RAM;
+    save() updates the buffer immediately and writes through to Supabase
+    on a background thread. When NumPy is available every turn is also
+    embedded into a local vector index for relevant().
     """
-    
-    def save(self, query, response):
+
+    def __init__(self, history_limit=MEMORY_SESSION_HISTORY, max_sessions=MEMORY_MAX_SESSIONS):
+        self.history_limit = history_limit
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.RLock()
+        self._warmed = False
+        self.index = VectorIndex() if NUMPY_AVAILABLE else None
+        # Single writer keeps inserts in conversation order
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-writer")
+
+    def warm(self, rows=MEMORY_WARM_ROWS):
         """
-        Save conversation to database
+        Load the newest turns across all sessions into RAM
         """
+        with self._lock:
+            if self._warmed:
+                return
+            self._warmed = True
+
+        db = get_db()
         if not db:
             return
-        
+
         try:
-            db.table("conversation_log").insert({
-                "query": query,
-                "response": response,
-                "timestamp": datetime.utcnow().isoformat()
-            }).execute()
+            with MEMORY_LATENCY.time(operation="warm"):
+                res = db.table("conversation_log") \
+                        .select("id,session_id,query,response") \
+                        .order("id", desc=True) \
+                        .limit(rows) \
+                        .execute()
         except Exception as e:
-            print(f"Error saving to memory: {e}")
+            print(f"Error warming memory: {e}")
+            return
+
+        grouped = OrderedDict()
+        for row in res.data or []:
+            grouped.setdefault(row.get("session_id") or DEFAULT_SESSION, []).append(row)
+
+        with self._lock:
+            # Least recently active sessions first so the LRU order is right
+            for session_id, session_rows in reversed(grouped.items()):
+                if session_id not in self._sessions:
+                    self._store(session_id, session_rows)
 
-    def recent(self, limit=4):
+    def warm_index(self, max_rows=VECTOR_WARM_ROWS, batch_size=VECTOR_WARM_BATCH):
         """
-        Retrieve recent conversations
+        Embed stored history into the vector index, newest first, in
+        batches. Meant to run on a background thread at startup, after
+        warm(). Only sessions held in RAM are indexed, so the index is
+        bounded by the same LRU and evicted sessions leave no shard.
         """
+        if self.index:
+            self.index.preload()
+        db = get_db()
+        if not self.index or not db:
+            return
+
+        cursor = None
+        loaded = 0
+        indexed = self.index.size
+        while loaded < max_rows:
+            try:
+                query = db.table("conversation_log") \
+                          .select("id,session_id,query,response") \
+                          .order("id", desc=True) \
+                          .limit(min(batch_size, max_rows - loaded))
+                if cursor is not None:
+                    query = query.lt("id", cursor)
+                rows = query.execute().data or []
+            except Exception as e:
+                print(f"Error warming vector index: {e}")
+                return
+
+            if not rows:
+                break
+            for row in rows:
+                row["session_id"] = row.get("session_id") or DEFAULT_SESSION
+                turn_tokens(row)
+            self.index.add(rows, sessions=self._sessions)
+            loaded += len(rows)
+            cursor = rows[-1]["id"]
+
+        print(f"✓ Vector index warmed with {self.index.size - indexed} turns")
+
+    def _store(self, session_id, rows):
+        for row in rows:
+            turn_tokens(row)
+        turns = deque(reversed(rows), maxlen=self.history_limit)
+        self._sessions[session_id] = turns
+        while len(self._sessions) > self.max_sessions:
+            evicted, _ = self._sessions.popitem(last=False)
+            if self.index:
+                self.index.drop(evicted)
+            MEMORY_EVICTIONS.inc()
+        MEMORY_SESSIONS.set(len(self._sessions))
+        return turns
+
+    def _load(self, session_id):
+        db = get_db()
         if not db:
             return []
-        
+
+        try:
+            with MEMORY_LATENCY.time(operation="load"):
+                res = db.table("conversation_log") \
+                        .select("id,session_id,query,response") \
+                        .eq("session_id", session_id) \
+                        .order("id", desc=True) \
+                        .limit(self.history_limit) \
+                        .execute()
+            return res.data or []
+        except Exception as e:
+            print(f"Error loading session memory: {e}")
+            return []
+
+    def _session(self, session_id):
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is not None:
+                self._sessions.move_to_end(session_id)
+                return turns
+
+        # Cache miss: fetch this session's history outside the lock
+        rows = self._load(session_id)
+
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is None:
+                turns = self._store(session_id, rows)
+                # Re-index a session whose vectors went with its eviction
+                if self.index and rows and session_id not in self.index:
+                    self.index.add(rows)
+            return turns
+
+    async def load_async(self, session_id=DEFAULT_SESSION):
+        """
+        Make sure the session is in RAM. A cache miss is loaded on a
+        worker thread so the event loop never waits on Supabase.
+        """
+        with self._lock:
+            if session_id in self._sessions:
+                return
+        await asyncio.to_thread(self._session, session_id)
+
+    def save(self, query, response, session_id=DEFAULT_SESSION):
+        """
+        Save conversation to memory and persist it asynchronously.
+        Returns a Future that resolves to the new row id.
+        """
+        with span("memory.save"):
+            turn = {"id": None, "session_id": session_id, "query": query, "response": response}
+            turn_tokens(turn)
+            turns = self._session(session_id)
+            with self._lock:
+                turns.append(turn)
+            if self.index:
+                self.index.add([turn])
+        # The write-behind insert shows up in the trace once it lands
+        return self._writer.submit(self._persist, turn, start_span("memory.persist"))
+
+    def _persist(self, turn, trace_span=None):
         try:
-            res = db.table("conversation_log") \
-                    .select("query,response") \
-                    .order("id", desc=True) \
-                    .limit(limit) \
-                    .execute()
-            
-            return res.data if res.data else []
+            return self._insert(turn)
+        finally:
+            if trace_span:
+                trace_span.end()
+
+    def _insert(self, turn):
+        db = get_db()
+        if not db:
+            return None
         
+        try:
+            with MEMORY_LATENCY.time(operation="save"):
+                res = db.table("conversation_log").insert({
+                    "session_id": turn["session_id"],
+                    "query": turn["query"],
+                    "response": turn["response"],
+                    "timestamp": datetime.utcnow().isoformat()
+                }).execute()
+            turn["id"] = res.data[0].get("id") if res.data else None
+            return turn["id"]
         except Exception as e:
-            print(f"Error retrieving memory: {e}")
-            return []
\ No newline at end of file
+            print(f"Error saving to memory: {e}")
+            return None
+
+    def recent(self, limit=4, session_id=DEFAULT_SESSION):
+        """
+        Retrieve recent conversations for a session, newest first
+        """
+        with MEMORY_LATENCY.time(operation="recent"), span("memory.recent"):
+            turns = self._session(session_id)
+            with self._lock:
+                turns = list(turns)[-limit:] if limit > 0 else []
+            return [dict(t) for t in reversed(turns)]
+
+    def relevant(self, query, limit=MEMORY_RELEVANT_K, session_id=DEFAULT_SESSION,
+                 min_score=MEMORY_RELEVANT_MIN_SCORE):
+        """
+        Retrieve the past turns most similar to query, best match first
+        """
+        if not self.index or limit <= 0:
+            return []
+
+        with MEMORY_LATENCY.time(operation="relevant"), span("memory.relevant"):
+            matches = self.index.search([query], session_id, k=limit, min_score=min_score)[0]
+            return [dict(row) for _, row in matches]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "history_limit": self.history_limit,
+                "indexed_turns": self.index.size if self.index else 0,
+                "indexed_sessions": self.index.sessions() if self.index else 0,
+            }
+
+    def close(self):
+        """
+        Wait for pending writes to reach the database
+        """
+        self._writer.shutdown(wait=True)
@@ -0,0 +1,264 @@
+"""
+In-process metrics registry with Prometheus text exposition
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, sized for Gemini and Supabase round trips
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Prompt size buckets in estimated tokens
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+def percentile(values, q, default=None):
+    """
+    Nearest-rank q-th percentile of values; default when there are none
+    """
+    if not values:
+        return default
+    ordered = sorted(values)
+    # Nearest rank: the smallest value with at least q% of values at or below it
+    index = max(0, min(len(ordered) - 1, math.ceil(q * len(ordered) / 100.0) - 1))
+    return ordered[index]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, None, value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for name, key, extra, value in self.samples():
+            lines.append(
+                f"{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}"
+            )
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count
+    """
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down
+    """
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket distribution, used for latencies
+    """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the wall-clock duration of the with-block
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q, **labels):
+        """
+        Approximate quantile (bucket upper bound) for one label set
+        """
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if not state or not state[2]:
+                return None
+            target = q * state[2]
+            seen = 0
+            for bound, count in zip(self.buckets, state[0]):
+                seen += count
+                if seen >= target:
+                    return bound
+            return self.buckets[-1]
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    out.append((f"{self.name}_bucket", key, f'le="{_format_value(bound)}"', cumulative))
+                out.append((f"{self.name}_sum", key, None, total))
+                out.append((f"{self.name}_count", key, None, count))
+        return out
+
+
+class MetricsRegistry:
+    """
+    Holds every metric in the process and renders them for /metrics
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def add_collector(self, fn):
+        """
+        Register a callable run before each render, used to refresh
+        gauges that mirror state owned by other components
+        """
+        self._collectors.append(fn)
+
+    def render(self):
+        """
+        Prometheus text exposition format
+        """
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+registry = MetricsRegistry()
+
+# ---------- SHARED METRICS ----------
+REQUESTS = registry.counter(
+    "jarvis_requests_total", "Requests handled by parallel_run", ["route"]
+)
+REQUEST_LATENCY = registry.histogram(
+    "jarvis_request_seconds", "End-to-end parallel_run latency", ["route"]
+)
+LLM_CALLS = registry.counter(
+    "jarvis_llm_calls_total", "Gemini calls by outcome", ["agent", "model", "status"]
+)
+LLM_LATENCY = registry.histogram(
+    "jarvis_llm_seconds", "Gemini call latency", ["agent", "model"]
+)
+LLM_PROMPT_TOKENS = registry.histogram(
+    "jarvis_llm_prompt_tokens", "Estimated prompt tokens per Gemini call", ["agent", "model"],
+    buckets=TOKEN_BUCKETS
+)
+LLM_QUEUE_WAIT = registry.histogram(
+    "jarvis_llm_queue_seconds", "Time a Gemini call waited for a pool slot"
+)
+LLM_IN_FLIGHT = registry.gauge(
+    "jarvis_llm_in_flight", "Gemini calls currently running"
+)
+LLM_QUEUED = registry.gauge(
+    "jarvis_llm_queued", "Gemini calls waiting for a pool slot"
+)
+MEMORY_LATENCY = registry.histogram(
+    "jarvis_memory_seconds", "MemoryAgent operation latency", ["operation"]
+)
+EVENTS = registry.counter(
+    "jarvis_events_total", "Events recorded through Observability.metric", ["event"]
+)
+TELEMETRY_BUFFERED = registry.gauge(
+    "jarvis_telemetry_buffered", "Telemetry rows waiting to be flushed"
+)
+TELEMETRY_DROPPED = registry.counter(
+    "jarvis_telemetry_dropped_total", "Telemetry rows dropped because the buffer was full"
+)
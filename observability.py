@@ -1,8 +1,132 @@
 """
 Observability and logging system
 """
+import atexit
+import os
+import threading
+from collections import deque
 from datetime import datetime
-from database import db  # FIXED: Import from database.py, not memory.py
+from database import get_db
+from metrics import registry, EVENTS, TELEMETRY_BUFFERED, TELEMETRY_DROPPED
+from tracing import current_trace_id
+
+# Write-behind buffer settings
+TELEMETRY_BUFFER_SIZE = int(os.getenv("TELEMETRY_BUFFER_SIZE", "5000"))
+TELEMETRY_BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "200"))
+TELEMETRY_FLUSH_INTERVAL = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "2.0"))
+
+
+class TelemetrySink:
+    """
+    Bounded write-behind buffer for telemetry rows. Callers only append
+    to memory; a background thread does multi-row inserts once the batch
+    size or flush interval is reached. Rows are dropped (and counted)
+    when the buffer is full.
+    """
+
+    def __init__(self, max_size=TELEMETRY_BUFFER_SIZE,
+                 batch_size=TELEMETRY_BATCH_SIZE,
+                 flush_interval=TELEMETRY_FLUSH_INTERVAL):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._rows = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    def put(self, table, row):
+        """
+        Enqueue a row without blocking; returns False if it was dropped
+        """
+        with self._cond:
+            if self._closed or len(self._rows) >= self.max_size:
+                self.dropped += 1
+                TELEMETRY_DROPPED.inc()
+                if self.dropped == 1 or self.dropped % 1000 == 0:
+                    print(f"Telemetry buffer full: {self.dropped} rows dropped")
+                return False
+
+            self._rows.append((table, row))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._worker, name="telemetry-flusher", daemon=True
+                )
+                self._thread.start()
+            if len(self._rows) >= self.batch_size:
+                self._cond.notify()
+            return True
+
+    def _take(self):
+        rows = list(self._rows)
+        self._rows.clear()
+        return rows
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or len(self._rows) >= self.batch_size,
+                    timeout=self.flush_interval
+                )
+                rows = self._take()
+                closed = self._closed
+            self._write(rows)
+            if closed:
+                return
+
+    def _write(self, rows):
+        if not rows:
+            return
+        db = get_db()
+        if not db:
+            # The database went away after the rows were buffered
+            self.failed += len(rows)
+            return
+
+        by_table = {}
+        for table, row in rows:
+            by_table.setdefault(table, []).append(row)
+
+        for table, batch in by_table.items():
+            try:
+                db.table(table).insert(batch).execute()
+                self.written += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"Telemetry flush error ({table}): {e}")
+
+    def flush(self):
+        """
+        Write everything currently buffered on the calling thread
+        """
+        with self._cond:
+            rows = self._take()
+        self._write(rows)
+
+    def close(self):
+        """
+        Stop the flusher after draining the buffer
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread:
+            thread.join(timeout=10)
+        self.flush()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "buffered": len(self._rows),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
 
 
 class Observability:
@@ -10,39 +134,53 @@ class Observability:
     Observability and logging system
     """
 
+    def __init__(self):
+        self.sink = TelemetrySink()
+
     def log(self, agent, action, payload):
         """
         Log agent actions
         """
-        if not db:
+        if not get_db():
             print(f"[LOG] {agent}.{action}: {str(payload)[:100]}")
             return
         
-        try:
-            db.table("agent_logs").insert({
-                "agent": agent,
-                "action": action,
-                "payload": str(payload),
-                "timestamp": datetime.utcnow().isoformat()
-            }).execute()
-        except Exception as e:
-            print(f"Logging error: {e}")
+        self.sink.put("agent_logs", {
+            "agent": agent,
+            "action": action,
+            "payload": str(payload),
+            "trace_id": current_trace_id(),
+            "timestamp": datetime.utcnow().isoformat()
+        })
 
     def metric(self, name):
         """
         Record metrics
         """
-        if not db:
+        EVENTS.inc(event=name)
+
+        if not get_db():
             print(f"[METRIC] {name}")
             return
         
-        try:
-            db.table("metrics").insert({
-                "metric": name,
-                "timestamp": datetime.utcnow().isoformat()
-            }).execute()
-        except Exception as e:
-            print(f"Metrics error: {e}")
+        self.sink.put("metrics", {
+            "metric": name,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+
+    def stats(self):
+        """
+        Telemetry buffer counters
+        """
+        return self.sink.stats()
+
+    def shutdown(self):
+        """
+        Flush buffered telemetry before the process exits
+        """
+        self.sink.close()
 
 
-obs = Observability()
\ No newline at end of file
+obs = Observability()
+atexit.register(obs.shutdown)
+registry.add_collector(lambda: TELEMETRY_BUFFERED.set(obs.stats()["buffered"]))
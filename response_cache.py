@@ -0,0 +1,99 @@
+"""
+Response cache for ConversationAgent answers
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import registry
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+
+CACHE_REQUESTS = registry.counter(
+    "jarvis_response_cache_total", "Response cache lookups by result", ["result"]
+)
+CACHE_ENTRIES = registry.gauge(
+    "jarvis_response_cache_entries", "Entries held in the response cache"
+)
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(text):
+    """
+    Case- and whitespace-insensitive form of a prompt, ignoring
+    trailing punctuation ("What is AI?" == "what is ai")
+    """
+    return _SPACE_RE.sub(" ", text.lower()).strip().rstrip("?!. ")
+
+
+def cache_key(prompt, model, context=""):
+    """
+    Key on the normalized prompt, the model and a hash of the context
+    """
+    context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()
+    raw = f"{model}\0{normalize_prompt(prompt)}\0{context_hash}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache whose entries expire after a TTL
+    """
+
+    def __init__(self, max_size=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Return the cached value, or None on a miss or expiry
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.inc(result="hit")
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            CACHE_REQUESTS.inc(result="miss")
+            return None
+
+    def put(self, key, value):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+response_cache = ResponseCache()
+registry.add_collector(lambda: CACHE_ENTRIES.set(response_cache.stats()["entries"]))
@@ -0,0 +1,59 @@
+-- Supabase schema for JARVIS ELITE
+-- Run in the Supabase SQL editor before starting the assistant.
+
+create table if not exists conversation_log (
+    id bigint generated by default as identity primary key,
+    session_id text not null default 'default',
+    query text,
+    response text,
+    timestamp timestamptz default now()
+);
+
+create table if not exists agent_logs (
+    id bigint generated by default as identity primary key,
+    agent text,
+    action text,
+    payload text,
+    trace_id text,
+    timestamp timestamptz default now()
+);
+
+create table if not exists metrics (
+    id bigint generated by default as identity primary key,
+    metric text,
+    timestamp timestamptz default now()
+);
+
+-- Rolling conversation summary, one row per session, upserted on every
+-- fold; last_message_id is the newest conversation_log id it covers
+create table if not exists conversation_summary (
+    session_id text primary key default 'default',
+    last_message_id bigint,
+    summary text,
+    timestamp timestamptz default now()
+);
+
+-- Session scoping (also upgrades tables created before sessions existed)
+alter table conversation_log add column if not exists session_id text not null default 'default';
+alter table conversation_summary add column if not exists session_id text not null default 'default';
+-- Summary tables keyed on last_message_id grew a row per fold: keep each
+-- session's newest row and key the table on session_id
+do $$
+begin
+    if exists (
+        select 1 from information_schema.key_column_usage
+        where table_name = 'conversation_summary'
+          and constraint_name = 'conversation_summary_pkey'
+          and column_name = 'last_message_id'
+    ) then
+        delete from conversation_summary s using conversation_summary newer
+         where newer.session_id = s.session_id
+           and newer.last_message_id > s.last_message_id;
+        alter table conversation_summary drop constraint conversation_summary_pkey;
+        alter table conversation_summary add primary key (session_id);
+    end if;
+end $$;
+drop index if exists conversation_summary_session_id_idx;
+-- Request tracing: agent log rows carry the trace id of the request that wrote them
+alter table agent_logs add column if not exists trace_id text;
+create index if not exists conversation_log_session_id_idx on conversation_log (session_id, id desc);
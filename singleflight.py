@@ -0,0 +1,67 @@
+"""
+Single-flight coalescing of identical in-flight async calls
+"""
+import asyncio
+
+from metrics import registry
+
+SINGLEFLIGHT_CALLS = registry.counter(
+    "jarvis_singleflight_total", "Coalesced calls by role", ["role"]
+)
+
+
+class SingleFlight:
+    """
+    Concurrent callers with the same key share one task and all receive
+    its result or exception. A caller being cancelled only detaches that
+    caller; the shared task is cancelled once nobody is waiting for it.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    def in_flight(self):
+        return len(self._calls)
+
+    async def do(self, key, fn):
+        """
+        Await fn() unless a call with the same key is already running,
+        in which case await that call instead
+        """
+        loop = asyncio.get_running_loop()
+        # Tasks belong to one loop; the voice loop and API may differ
+        slot = (id(loop), key)
+
+        entry = self._calls.get(slot)
+        if entry is None:
+            task = loop.create_task(fn())
+            entry = self._calls[slot] = [task, 0]
+            task.add_done_callback(lambda t: self._forget(slot, t))
+            SINGLEFLIGHT_CALLS.inc(role="leader")
+        else:
+            SINGLEFLIGHT_CALLS.inc(role="shared")
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                # Last waiter went away (cancelled); stop the upstream call.
+                # Forget it first so a new caller starts a fresh call
+                # instead of joining the cancelled one.
+                if self._calls.get(slot) is entry:
+                    del self._calls[slot]
+                task.cancel()
+
+    def _forget(self, slot, task):
+        entry = self._calls.get(slot)
+        if entry is not None and entry[0] is task:
+            del self._calls[slot]
+        if not task.cancelled():
+            # Exceptions are delivered to the waiters through shield()
+            task.exception()
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,108 @@
+"""
+Tests for the rolling conversation summary
+Run this with: python -m pytest test_context_engineering.py
+"""
+import asyncio
+
+from context_engineering import NO_HISTORY, RollingSummary, SummaryStore
+from llm_client import MODEL_NAME
+from token_budget import estimate_tokens, summary_budget
+
+
+def stored(db):
+    return db.table("conversation_summary").select().execute().data
+
+
+def test_folds_turns_and_keeps_one_row_per_session(db, llm):
+    summary = RollingSummary("s")
+
+    async def main():
+        summary.schedule(1, "my name is ada", "hello ada")
+        assert [t["query"] for t in summary.unfolded()] == ["my name is ada"]
+        await summary._task
+        first = summary.current()
+        summary.schedule(2, "i like jazz", "noted")
+        await summary._task
+        return first
+
+    first = asyncio.run(main())
+    assert first != NO_HISTORY
+    assert summary.unfolded() == []
+    assert summary.last_message_id == 2
+    rows = stored(db)
+    assert len(rows) == 1
+    assert rows[0]["session_id"] == "s"
+    assert rows[0]["last_message_id"] == 2
+    assert rows[0]["summary"] == summary.summary
+
+
+def test_load_restores_persisted_summary(db, llm):
+    db.table("conversation_summary").upsert(
+        {"session_id": "s", "last_message_id": 9, "summary": "- likes jazz"},
+        on_conflict="session_id",
+    ).execute()
+    summary = RollingSummary("s")
+
+    asyncio.run(summary.load([{"id": 1, "query": "ignored", "response": "ignored"}]))
+    assert summary.loaded
+    assert summary.current() == "- likes jazz"
+    assert summary.last_message_id == 9
+    assert summary.unfolded() == []
+
+
+def test_concurrent_loads_share_one_fetch(db, llm):
+    db.latency = 0.05
+    summary = RollingSummary("s")
+
+    async def main():
+        first = asyncio.create_task(summary.load())
+        await asyncio.sleep(0)
+        # Not loaded until the select has returned
+        assert not summary.loaded
+        await asyncio.gather(first, summary.load(), summary.load())
+
+    asyncio.run(main())
+    assert summary.loaded
+    assert db.calls["conversation_summary.select"] == 1
+
+
+def test_seed_turns_fold_ahead_of_newer_turns(db, llm):
+    db.latency = 0.02
+    summary = RollingSummary("s")
+    # Newest first, as memory.recent() returns them
+    seed = [
+        {"id": 2, "query": "second", "response": "b"},
+        {"id": 1, "query": "first", "response": "a"},
+    ]
+
+    async def main():
+        loading = asyncio.create_task(summary.load(seed))
+        await asyncio.sleep(0)
+        summary.schedule(3, "third", "c")
+        await loading
+        order = [t["query"] for t in summary.unfolded()]
+        await summary._task
+        return order
+
+    assert asyncio.run(main()) == ["first", "second", "third"]
+    assert summary.last_message_id == 3
+
+
+def test_current_is_cut_to_summary_budget():
+    summary = RollingSummary("s")
+    assert summary.current() == NO_HISTORY
+    summary.summary = "word " * 10000
+    # Plus the " ..." marking the cut
+    assert estimate_tokens(summary.current()) <= summary_budget(MODEL_NAME) + 1
+
+
+def test_store_keeps_one_summary_per_session_in_lru_order():
+    store = SummaryStore(max_sessions=2)
+    a = store.get("a")
+    store.get("b")
+    assert store.get("a") is a
+    store.get("c")
+    # "b" was least recently used
+    assert store.get("a") is a
+    assert store.get("b").session_id == "b"
+    assert len(store._summaries) == 2
@@ -0,0 +1,140 @@
+"""
+Tests for the evaluation runner
+Run this with: python -m pytest test_evaluation.py
+"""
+import asyncio
+import json
+
+import pytest
+
+import agents
+import evaluation
+from evaluation import EvalJob, EvalJobs, dataset_path, load_test_set, run_evaluation_async
+
+
+def write_jsonl(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_load_test_set_reads_jsonl(tmp_path):
+    path = write_jsonl(tmp_path / "set.jsonl", [
+        json.dumps({"question": "What is Python?", "keyword": "programming"}),
+        "",
+        json.dumps({"question": "What is AI?", "keyword": ["intelligence", "machines"]}),
+    ])
+    assert load_test_set(path) == [
+        ("What is Python?", "programming"),
+        ("What is AI?", ["intelligence", "machines"]),
+    ]
+
+
+def test_load_test_set_names_the_bad_line(tmp_path):
+    path = write_jsonl(tmp_path / "set.jsonl", [
+        json.dumps({"question": "What is Python?", "keyword": "programming"}),
+        json.dumps({"question": "no keyword"}),
+    ])
+    with pytest.raises(ValueError, match=r"set\.jsonl:2:"):
+        load_test_set(path)
+
+
+def test_dataset_path_stays_inside_data_dir(tmp_path, monkeypatch):
+    (tmp_path / "data").mkdir()
+    write_jsonl(tmp_path / "data" / "basic.jsonl", ["{}"])
+    write_jsonl(tmp_path / "secret.jsonl", ["{}"])
+    monkeypatch.setattr(evaluation, "EVAL_DATA_DIR", str(tmp_path / "data"))
+
+    assert dataset_path("basic") == str((tmp_path / "data" / "basic.jsonl").resolve())
+    assert dataset_path("../secret") is None
+    assert dataset_path("missing") is None
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    """
+    parallel_run stand-in that echoes the question, fails on "crash"
+    and records how many items run at once
+    """
+    state = {"running": 0, "peak": 0, "calls": []}
+
+    async def parallel_run(command, session_id, use_cache=True, use_memory=True, dry_run=False):
+        state["calls"].append((use_memory, dry_run))
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        try:
+            await asyncio.sleep(0.01)
+            if "crash" in command:
+                raise RuntimeError("boom")
+            return None, f"An answer about {command}"
+        finally:
+            state["running"] -= 1
+
+    monkeypatch.setattr(agents, "parallel_run", parallel_run)
+    return state
+
+
+def test_job_scores_items_in_order(fake_pipeline):
+    items = [("python", "PYTHON"), ("crash now", "crash"), ("ai", ["nope", "about"])]
+    job = asyncio.run(EvalJob(items, concurrency=2).run())
+
+    report = job.summary(include_results=True)
+    assert report["status"] == "done"
+    assert report["completed"] == 3
+    assert [r["passed"] for r in report["results"]] == [True, False, True]
+    assert report["results"][1]["response"] == "Error: boom"
+    assert report["accuracy"] == pytest.approx(200 / 3)
+    assert fake_pipeline["peak"] == 2
+    # Evaluations never touch sessions or the desktop
+    assert set(fake_pipeline["calls"]) == {(False, True)}
+
+
+def test_empty_items_are_not_replaced_by_the_default_set(fake_pipeline):
+    report = asyncio.run(run_evaluation_async([]))
+    assert report["total"] == 0
+    assert fake_pipeline["calls"] == []
+
+    report = asyncio.run(run_evaluation_async())
+    assert report["total"] == len(evaluation.TEST_SET)
+
+
+def test_jobs_run_in_background_and_drop_oldest_finished(fake_pipeline):
+    jobs = EvalJobs(max_jobs=2)
+
+    async def main():
+        first = jobs.start([("a", "a")])
+        assert first.summary()["status"] in ("queued", "running")
+        await first.task
+        second = jobs.start([("b", "b")])
+        third = jobs.start([("c", "c")])
+        await asyncio.gather(second.task, third.task)
+        return first, second, third
+
+    first, second, third = asyncio.run(main())
+    assert jobs.get(first.id) is None
+    assert [j["job_id"] for j in jobs.list()] == [third.id, second.id]
+    assert all(j["status"] == "done" for j in jobs.list())
+
+
+def test_running_jobs_are_never_dropped(fake_pipeline):
+    jobs = EvalJobs(max_jobs=1)
+
+    async def main():
+        started = [jobs.start([("q", "q")]) for _ in range(3)]
+        kept = len(jobs.list())
+        await asyncio.gather(*(job.task for job in started))
+        return kept
+
+    assert asyncio.run(main()) == 3
+
+
+@pytest.mark.parametrize("body", [
+    {"dataset": "basic", "concurrency": 0},
+    {"dataset": "basic", "concurrency": 100000},
+    {"items": []},
+])
+def test_api_rejects_bad_requests(body):
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    from main import app
+
+    assert TestClient(app).post("/evaluate", json=body).status_code == 422
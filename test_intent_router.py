@@ -0,0 +1,73 @@
+"""
+Tests for the compiled intent router
+Run this with: python -m pytest test_intent_router.py
+"""
+from intent_router import IntentRouter, tokenize
+
+
+def router():
+    return IntentRouter() \
+        .add("exit", ["exit", "goodbye"]) \
+        .add("search", ["google search", "search for", "search"], data="web") \
+        .add("open", "open") \
+        .add("back", ["go back", "back"])
+
+
+def test_tokenize_lowercases_and_keeps_spans():
+    assert tokenize("Open Notepad!") == [("open", 0, 4), ("notepad", 5, 12)]
+
+
+def test_no_match():
+    assert router().match("what is the weather") is None
+    assert not router().matches("what is the weather")
+
+
+def test_match_returns_name_data_and_args():
+    match = router().match("search for python decorators")
+    assert match.name == "search"
+    assert match.data == "web"
+    assert match.phrase == "search for"
+    assert match.args == "python decorators"
+
+
+def test_whole_words_only():
+    assert router().match("give me feedback") is None
+    assert router().match("please go back").name == "back"
+
+
+def test_first_registered_intent_wins():
+    # "exit" is registered before "search" and "open"
+    assert router().match("search for the exit").name == "exit"
+    assert router().match("open google search").name == "search"
+
+
+def test_longest_phrase_of_the_winner_is_reported():
+    match = router().match("google search cats")
+    assert match.phrase == "google search"
+    assert match.args == "cats"
+
+
+def test_every_phrase_of_the_winner_is_removed_from_args():
+    match = router().match("search for search results")
+    assert match.name == "search"
+    assert match.args == "results"
+
+
+def test_args_keep_original_case_and_punctuation():
+    match = router().match("Open Visual Studio, please")
+    assert match.name == "open"
+    assert match.args == "Visual Studio, please"
+
+
+def test_overlapping_phrases_share_a_prefix():
+    r = IntentRouter().add("a", "new tab").add("b", "tab")
+    assert r.match("open a new tab").name == "a"
+    assert r.match("close this tab").name == "b"
+
+
+def test_adding_an_intent_recompiles():
+    r = IntentRouter().add("a", "alpha")
+    assert r.match("beta") is None
+    r.add("b", "beta")
+    assert r.match("beta").name == "b"
+    assert len(r) == 2
@@ -0,0 +1,132 @@
+"""
+Tests for the offline LLM backends
+Run this with: python -m pytest test_llm_backends.py
+"""
+import pytest
+
+from llm_backends import (
+    CassetteMiss, RecordingBackend, ReplayBackend, Response, SyntheticBackend, Usage,
+    create_backend,
+)
+
+MODEL = "gemini-test"
+
+
+class CountingModel:
+    """
+    Stand-in for the real client: numbered answers with usage
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    @property
+    def models(self):
+        return self
+
+    def generate_content(self, model, contents):
+        self.calls += 1
+        return Response(f"answer {self.calls} to {contents}", Usage(5, 3))
+
+    def generate_content_stream(self, model, contents):
+        self.calls += 1
+        yield Response("streamed ")
+        yield Response(f"answer {self.calls}", Usage(5, 2))
+
+
+@pytest.fixture
+def cassette(tmp_path):
+    return str(tmp_path / "cassettes" / "llm.jsonl")
+
+
+def test_replay_returns_what_was_recorded(cassette):
+    recorder = RecordingBackend(CountingModel(), cassette)
+    recorded = recorder.models.generate_content(model=MODEL, contents="hello")
+    streamed = [c.text for c in recorder.models.generate_content_stream(model=MODEL, contents="stream me")]
+
+    replay = ReplayBackend(cassette)
+    assert len(replay) == 2
+    res = replay.models.generate_content(model=MODEL, contents="hello")
+    assert res.text == recorded.text == "answer 1 to hello"
+    assert res.usage_metadata.to_dict() == Usage(5, 3).to_dict()
+
+    chunks = list(replay.models.generate_content_stream(model=MODEL, contents="stream me"))
+    assert [c.text for c in chunks] == streamed == ["streamed ", "answer 2"]
+    # Usage only arrives with the last chunk, as with Gemini
+    assert chunks[0].usage_metadata is None
+    assert chunks[-1].usage_metadata.total_token_count == 7
+
+
+def test_repeated_prompts_replay_in_order_and_cycle(cassette):
+    recorder = RecordingBackend(CountingModel(), cassette)
+    for _ in range(2):
+        recorder.models.generate_content(model=MODEL, contents="again")
+
+    replay = ReplayBackend(cassette)
+    answers = [replay.models.generate_content(model=MODEL, contents="again").text for _ in range(3)]
+    assert answers == ["answer 1 to again", "answer 2 to again", "answer 1 to again"]
+    assert replay.calls == 3
+
+
+def test_replay_keys_on_model_and_prompt(cassette):
+    recorder = RecordingBackend(CountingModel(), cassette)
+    recorder.models.generate_content(model=MODEL, contents=["structured", {"role": "user"}])
+
+    replay = ReplayBackend(cassette)
+    assert replay.models.generate_content(
+        model=MODEL, contents=["structured", {"role": "user"}]
+    ).text.startswith("answer 1")
+    with pytest.raises(CassetteMiss):
+        replay.models.generate_content(model="other-model", contents=["structured", {"role": "user"}])
+
+
+def test_unknown_prompt_is_a_cassette_miss(cassette):
+    RecordingBackend(CountingModel(), cassette).models.generate_content(model=MODEL, contents="known")
+
+    replay = ReplayBackend(cassette)
+    with pytest.raises(CassetteMiss, match="never asked"):
+        replay.models.generate_content(model=MODEL, contents="never asked")
+    with pytest.raises(LookupError):
+        list(replay.models.generate_content_stream(model=MODEL, contents="never asked"))
+
+
+def test_synthetic_answers_are_deterministic():
+    backend = SyntheticBackend(latency=0, words=20, words_per_second=0)
+    first = backend.models.generate_content(model=MODEL, contents="what is python")
+    again = SyntheticBackend(latency=0, words=20, words_per_second=0) \
+        .models.generate_content(model=MODEL, contents="what is python")
+    other = backend.models.generate_content(model=MODEL, contents="what is rust, really")
+
+    assert first.text == again.text
+    assert len(first.text.split()) == 20
+    assert first.text != other.text
+    assert first.usage_metadata.candidates_token_count == 27
+    assert backend.calls == 2
+
+
+def test_synthetic_stream_matches_the_whole_answer():
+    backend = SyntheticBackend(latency=0, words=20, words_per_second=10000, chunk_words=8)
+    whole = backend.models.generate_content(model=MODEL, contents="stream this")
+    chunks = list(backend.models.generate_content_stream(model=MODEL, contents="stream this"))
+
+    assert len(chunks) == 3
+    assert "".join(c.text for c in chunks) == whole.text
+    assert [c.usage_metadata is not None for c in chunks] == [False, False, True]
+
+
+def test_synthetic_jitter_is_seeded_by_prompt():
+    backend = SyntheticBackend(latency=1.0, jitter=0.5)
+    first = backend._plan(MODEL, "same prompt")[0]
+    assert backend._plan(MODEL, "same prompt")[0] == first
+    assert 0.5 <= first <= 1.5
+
+
+def test_create_backend_by_name(tmp_path, monkeypatch):
+    # The record backend creates its default cassette directory
+    monkeypatch.chdir(tmp_path)
+    assert isinstance(create_backend("synthetic"), SyntheticBackend)
+    assert isinstance(create_backend("record", gemini=CountingModel), RecordingBackend)
+    with pytest.raises(ValueError):
+        create_backend("record")
+    with pytest.raises(ValueError, match="Unknown LLM backend"):
+        create_backend("telepathy")
@@ -0,0 +1,102 @@
+"""
+Tests for the shared LLM client
+Run this with: python -m pytest test_llm_client.py
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+import llm_client
+from llm_backends import SyntheticBackend
+from llm_client import get_client, set_client, use_backend, warm_up
+
+
+@pytest.fixture(autouse=True)
+def fresh_client():
+    set_client(None)
+    yield
+    set_client(None)
+
+
+def test_get_client_creates_one_shared_client():
+    client = get_client()
+    assert isinstance(client, SyntheticBackend)
+    assert get_client() is client
+
+
+def test_set_client_replaces_and_none_recreates():
+    fake = object()
+    set_client(fake)
+    assert get_client() is fake
+    set_client(None)
+    assert get_client() not in (None, fake)
+
+
+def test_failed_creation_is_not_retried_until_reset(monkeypatch):
+    calls = []
+
+    def broken(backend=None):
+        calls.append(backend)
+        raise RuntimeError("no network")
+
+    monkeypatch.setattr(llm_client, "_create_client", broken)
+    assert get_client() is None
+    assert get_client() is None
+    assert len(calls) == 1
+
+    set_client(None)
+    assert get_client() is None
+    assert len(calls) == 2
+
+
+def test_use_backend_switches_every_caller():
+    client = use_backend("synthetic")
+    assert isinstance(client, SyntheticBackend)
+    assert get_client() is client
+
+
+def test_use_backend_rejects_unknown_names():
+    current = get_client()
+    with pytest.raises(ValueError, match="Unknown LLM backend"):
+        use_backend("carrier-pigeon")
+    assert get_client() is current
+
+
+class FakeModels:
+    def __init__(self, error=None):
+        self.error = error
+        self.looked_up = []
+
+    def get(self, model):
+        self.looked_up.append(model)
+        if self.error:
+            raise self.error
+
+
+class FakeGemini:
+    def __init__(self, error=None):
+        self.models = FakeModels(error)
+
+
+def test_warm_up_looks_up_the_model():
+    client = FakeGemini()
+    set_client(client)
+    assert warm_up() >= 0
+    assert client.models.looked_up == [llm_client.MODEL_NAME]
+
+
+def test_warm_up_failure_returns_none():
+    set_client(FakeGemini(ConnectionError("offline")))
+    assert warm_up() is None
+
+
+def test_warm_up_is_off_by_default():
+    env = {k: v for k, v in os.environ.items() if k != "GEMINI_WARMUP"}
+    out = subprocess.run(
+        [sys.executable, "-c", "import llm_client; print(llm_client.GEMINI_WARMUP)"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        capture_output=True, text=True, check=True,
+    )
+    assert out.stdout.strip().splitlines()[-1] == "False"
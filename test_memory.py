@@ -0,0 +1,215 @@
+"""
+Tests for conversation memory
+Run this with: python -m pytest test_memory.py
+"""
+import asyncio
+import time
+
+import pytest
+
+
+async def max_loop_lag(coro, interval=0.005):
+    """
+    Run coro while measuring how late a timer on the same loop fires
+    """
+    lag = [0.0]
+
+    async def probe():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag[0] = max(lag[0], time.perf_counter() - start - interval)
+
+    task = asyncio.create_task(probe())
+    try:
+        await coro
+    finally:
+        task.cancel()
+    return lag[0]
+
+
+def test_cold_sessions_load_off_the_event_loop(db, llm):
+    import agents
+
+    # The server imports NumPy on a startup thread (warm_index)
+    agents.memory.index.preload()
+    db.latency = 0.1
+    sessions = [f"cold-ack-{i}" for i in range(3)]
+
+    async def main():
+        # Acknowledgements skip context but still save the turn
+        return await max_loop_lag(asyncio.gather(*(
+            agents._acknowledge("open notepad", session_id, use_cache=False)
+            for session_id in sessions
+        )))
+
+    lag = asyncio.run(main())
+    assert lag < 0.08
+    for session_id in sessions:
+        assert [t["query"] for t in agents.memory.recent(session_id=session_id)] == \
+            ["Acknowledge the system task: open notepad"]
+
+
+def seed(db, rows):
+    """
+    Store (session_id, query, response) rows in order, oldest first
+    """
+    for session_id, query, response in rows:
+        db.table("conversation_log").insert(
+            {"session_id": session_id, "query": query, "response": response}
+        ).execute()
+
+
+def test_relevant_returns_best_match_first(db):
+    pytest.importorskip("numpy")
+    from memory import MemoryAgent
+
+    memory = MemoryAgent()
+    try:
+        for query, response in [
+            ("what is the weather in paris", "sunny"),
+            ("play some jazz", "playing jazz"),
+            ("set a timer for ten minutes", "timer set"),
+        ]:
+            memory.save(query, response, session_id="r").result()
+        matches = memory.relevant("what is the weather in paris today", limit=2, session_id="r")
+        assert [m["query"] for m in matches] == ["what is the weather in paris"]
+        assert memory.relevant("paris", session_id="other") == []
+        assert memory.relevant("paris", limit=0, session_id="r") == []
+    finally:
+        memory.close()
+
+
+def test_warm_index_only_indexes_sessions_in_memory(db):
+    pytest.importorskip("numpy")
+    from memory import MemoryAgent
+
+    seed(db, [
+        ("old", "play jazz", "playing"),
+        ("kept", "weather in paris", "sunny"),
+        ("kept", "set a timer", "timer set"),
+    ])
+    memory = MemoryAgent(max_sessions=1)
+    try:
+        memory.warm()
+        memory.warm_index(batch_size=1)
+        assert "kept" in memory.index and "old" not in memory.index
+        assert memory.index.size == 2
+
+        # Running it again indexes nothing twice; a dropped shard is rebuilt once
+        memory.warm_index()
+        memory.index.drop("kept")
+        memory.warm_index()
+        assert memory.index.size == 2
+    finally:
+        memory.close()
+
+
+def test_warm_index_skips_turns_saved_meanwhile(db):
+    pytest.importorskip("numpy")
+    from memory import MemoryAgent
+
+    memory = MemoryAgent()
+    try:
+        memory.save("play jazz", "playing", session_id="w").result()
+        memory.warm_index()
+        assert memory.index.size == 1
+        assert len(memory.relevant("play jazz", session_id="w")) == 1
+    finally:
+        memory.close()
+
+
+def selects(db):
+    return db.calls.get("conversation_log.select", 0)
+
+
+def test_recent_is_newest_first_and_bounded(db):
+    from memory import MemoryAgent
+
+    memory = MemoryAgent(history_limit=3)
+    try:
+        for i in range(5):
+            memory.save(f"q{i}", f"r{i}", session_id="s")
+        assert [t["query"] for t in memory.recent(limit=2, session_id="s")] == ["q4", "q3"]
+        # The ring buffer keeps only history_limit turns
+        assert [t["query"] for t in memory.recent(limit=10, session_id="s")] == ["q4", "q3", "q2"]
+        assert memory.recent(limit=0, session_id="s") == []
+
+        # Callers get copies
+        memory.recent(session_id="s")[0]["query"] = "changed"
+        assert memory.recent(session_id="s")[0]["query"] == "q4"
+    finally:
+        memory.close()
+
+
+def test_cold_session_loads_from_the_database_once(db):
+    from memory import MemoryAgent
+
+    seed(db, [("s", f"q{i}", f"r{i}") for i in range(3)] + [("other", "x", "y")])
+    memory = MemoryAgent()
+    try:
+        assert [t["query"] for t in memory.recent(session_id="s")] == ["q2", "q1", "q0"]
+        assert [t["query"] for t in memory.recent(session_id="s")] == ["q2", "q1", "q0"]
+        assert selects(db) == 1
+    finally:
+        memory.close()
+
+
+def test_writes_land_in_save_order(db):
+    from memory import MemoryAgent
+
+    db.latency = 0.002
+    memory = MemoryAgent()
+    futures = [memory.save(f"q{i}", f"r{i}", session_id="s") for i in range(10)]
+    memory.close()
+
+    ids = [f.result() for f in futures]
+    assert ids == sorted(ids)
+    stored = db.table("conversation_log").select().order("id").execute().data
+    assert [r["query"] for r in stored] == [f"q{i}" for i in range(10)]
+    # Saved turns learn their row id once persisted
+    assert [t["id"] for t in memory.recent(limit=10, session_id="s")] == ids[::-1]
+
+
+def test_least_recently_used_session_is_evicted(db):
+    from memory import MemoryAgent
+
+    memory = MemoryAgent(max_sessions=2)
+    try:
+        memory.save("qa", "ra", session_id="a").result()
+        memory.save("qb", "rb", session_id="b").result()
+        memory.recent(session_id="a")
+        memory.save("qc", "rc", session_id="c").result()
+
+        assert memory.stats()["sessions"] == 2
+        if memory.index:
+            assert "b" not in memory.index and "a" in memory.index
+
+        # "b" comes back from the database and pushes out "a"
+        before = selects(db)
+        assert [t["query"] for t in memory.recent(session_id="b")] == ["qb"]
+        assert selects(db) == before + 1
+        memory.recent(session_id="c")
+        assert selects(db) == before + 1
+        memory.recent(session_id="a")
+        assert selects(db) == before + 2
+    finally:
+        memory.close()
+
+
+def test_warm_loads_recent_sessions_in_activity_order(db):
+    from memory import MemoryAgent
+
+    seed(db, [("old", "q0", "r0"), ("mid", "q1", "r1"), ("new", "q2", "r2"), ("mid", "q3", "r3")])
+    memory = MemoryAgent(max_sessions=2)
+    try:
+        memory.warm()
+        memory.warm()
+        before = selects(db)
+        # "mid" spoke last, so "old" went first
+        assert [t["query"] for t in memory.recent(session_id="mid")] == ["q3", "q1"]
+        assert [t["query"] for t in memory.recent(session_id="new")] == ["q2"]
+        assert selects(db) == before
+        assert memory.stats()["sessions"] == 2
+    finally:
+        memory.close()
@@ -0,0 +1,126 @@
+"""
+Tests for the metrics registry and percentile helper
+Run this with: python -m pytest test_metrics.py
+"""
+import pytest
+
+from metrics import MetricsRegistry, percentile
+
+
+@pytest.mark.parametrize("n, q, expected", [
+    (100, 50, 50),
+    (100, 7, 7),
+    (100, 95, 95),
+    (100, 99, 99),
+    (100, 100, 100),
+    (20, 95, 19),
+    (20, 50, 10),
+    (10, 50, 5),
+    (10, 90, 9),
+    (10, 1, 1),
+    (1, 99, 1),
+])
+def test_percentile_nearest_rank(n, q, expected):
+    values = list(range(n, 0, -1))  # order must not matter
+    assert percentile(values, q) == expected
+
+
+def test_percentile_of_nothing():
+    assert percentile([], 50) is None
+    assert percentile([], 95, default=0.0) == 0.0
+
+
+def test_counter_keeps_one_value_per_label_set():
+    counter = MetricsRegistry().counter("calls_total", "Calls", ["route", "status"])
+    counter.inc(route="AI", status="ok")
+    counter.inc(2, route="AI", status="ok")
+    counter.inc(route="EXECUTOR", status="error")
+    assert counter.value(route="AI", status="ok") == 3
+    assert counter.value(route="EXECUTOR", status="error") == 1
+    assert counter.value(route="EXECUTOR", status="ok") == 0
+
+
+def test_missing_labels_are_empty_and_unknown_ones_ignored():
+    counter = MetricsRegistry().counter("calls_total", "Calls", ["route"])
+    counter.inc()
+    counter.inc(route="", extra="ignored")
+    assert counter.value(route="") == 2
+
+
+def test_gauge_goes_up_and_down():
+    gauge = MetricsRegistry().gauge("in_flight", "In flight", ["pool"])
+    gauge.inc(pool="a")
+    gauge.inc(3, pool="a")
+    gauge.dec(pool="a")
+    gauge.set(7, pool="b")
+    assert gauge.value(pool="a") == 3
+    assert gauge.value(pool="b") == 7
+
+
+def test_histogram_buckets_sum_and_quantile():
+    histogram = MetricsRegistry().histogram("latency_seconds", "Latency", ["op"], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        histogram.observe(value, op="load")
+
+    samples = {(name, extra): value for name, key, extra, value in histogram.samples()}
+    assert samples[("latency_seconds_bucket", 'le="0.1"')] == 1
+    assert samples[("latency_seconds_bucket", 'le="1"')] == 3
+    assert samples[("latency_seconds_bucket", 'le="+Inf"')] == 4
+    assert samples[("latency_seconds_sum", None)] == pytest.approx(6.05)
+    assert samples[("latency_seconds_count", None)] == 4
+    assert histogram.quantile(0.5, op="load") == 1
+    assert histogram.quantile(0.5, op="save") is None
+
+
+def test_histogram_times_a_block():
+    histogram = MetricsRegistry().histogram("block_seconds", "Block")
+    with histogram.time():
+        pass
+    assert histogram.quantile(1.0) == 0.005
+
+
+def test_registry_returns_the_same_metric_for_a_name():
+    registry = MetricsRegistry()
+    first = registry.counter("events_total", "Events", ["event"])
+    assert registry.counter("events_total", "Events", ["event"]) is first
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests", ["route"]).inc(route='say "hi"\n')
+    registry.histogram("wait_seconds", "Wait", buckets=(0.5,)).observe(0.25)
+    queued = registry.gauge("queued", "Queued")
+    registry.add_collector(lambda: queued.set(4))
+
+    def broken():
+        raise RuntimeError("collector failed")
+    registry.add_collector(broken)
+
+    assert registry.render() == """\
+# HELP requests_total Requests
+# TYPE requests_total counter
+requests_total{route="say \\"hi\\"\\n"} 1
+# HELP wait_seconds Wait
+# TYPE wait_seconds histogram
+wait_seconds_bucket{le="0.5"} 1
+wait_seconds_bucket{le="+Inf"} 1
+wait_seconds_sum 0.25
+wait_seconds_count 1
+# HELP queued Queued
+# TYPE queued gauge
+queued 4
+"""
+
+
+def test_metrics_endpoint_serves_the_registry():
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    from main import app
+    from metrics import REQUESTS
+
+    REQUESTS.inc(route="AI")
+    res = TestClient(app).get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE jarvis_requests_total counter" in res.text
+    assert 'jarvis_requests_total{route="AI"}' in res.text
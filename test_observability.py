@@ -0,0 +1,94 @@
+"""
+Tests for the telemetry write-behind buffer
+Run this with: python -m pytest test_observability.py
+"""
+import time
+
+from database import set_db
+from observability import TelemetrySink
+
+
+def wait_for(condition, timeout=1.0):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def rows(db, table):
+    return db.table(table).select().execute().data
+
+
+def test_full_batch_is_written_in_one_insert(db):
+    sink = TelemetrySink(batch_size=3, flush_interval=10)
+    try:
+        for i in range(3):
+            assert sink.put("metrics", {"metric": f"m{i}"})
+        assert wait_for(lambda: sink.written == 3)
+        assert db.calls["metrics.insert"] == 1
+        assert [r["metric"] for r in rows(db, "metrics")] == ["m0", "m1", "m2"]
+    finally:
+        sink.close()
+
+
+def test_partial_batch_is_written_after_the_interval(db):
+    sink = TelemetrySink(batch_size=100, flush_interval=0.05)
+    try:
+        sink.put("metrics", {"metric": "lonely"})
+        assert sink.stats()["buffered"] == 1
+        assert wait_for(lambda: sink.written == 1)
+        assert sink.stats()["buffered"] == 0
+    finally:
+        sink.close()
+
+
+def test_rows_are_grouped_by_table(db):
+    sink = TelemetrySink(batch_size=100, flush_interval=10)
+    sink.put("metrics", {"metric": "a"})
+    sink.put("agent_logs", {"agent": "Planner"})
+    sink.put("metrics", {"metric": "b"})
+    sink.flush()
+    assert db.calls == {"metrics.insert": 1, "agent_logs.insert": 1}
+    assert [r["metric"] for r in rows(db, "metrics")] == ["a", "b"]
+    sink.close()
+
+
+def test_rows_are_dropped_and_counted_when_full(db):
+    sink = TelemetrySink(max_size=2, batch_size=100, flush_interval=10)
+    try:
+        assert sink.put("metrics", {"metric": "a"})
+        assert sink.put("metrics", {"metric": "b"})
+        assert not sink.put("metrics", {"metric": "c"})
+        assert sink.stats() == {"buffered": 2, "written": 0, "dropped": 1, "failed": 0}
+    finally:
+        sink.close()
+    assert sink.written == 2
+
+
+def test_close_drains_the_buffer(db):
+    sink = TelemetrySink(batch_size=100, flush_interval=10)
+    for i in range(5):
+        sink.put("agent_logs", {"agent": f"a{i}"})
+    sink.close()
+    assert sink.written == 5
+    assert len(rows(db, "agent_logs")) == 5
+    # Nothing is accepted once closed
+    assert not sink.put("agent_logs", {"agent": "late"})
+    assert sink.dropped == 1
+
+
+def test_failed_writes_are_counted(db):
+    sink = TelemetrySink(batch_size=100, flush_interval=10)
+    sink.put("metrics", {"metric": "a"})
+    set_db(None)
+    sink.flush()
+    assert sink.stats()["failed"] == 1
+
+    class Broken:
+        def table(self, name):
+            raise ConnectionError("offline")
+
+    set_db(Broken())
+    sink.put("metrics", {"metric": "b"})
+    sink.close()
+    assert sink.failed == 2 and sink.written == 0
@@ -0,0 +1,155 @@
+"""
+Tests for the planner and the task-graph scheduler
+Run this with: python -m pytest test_planner.py
+"""
+import asyncio
+
+import pytest
+
+import agents
+from agents import PlannerAgent, PlanStep, run_plan
+
+
+def shape(steps):
+    return [(s.kind, s.text, s.deps) for s in steps]
+
+
+@pytest.mark.parametrize("text", [
+    "what is the weather today",
+    "what did Napoleon do after that war",
+    "if x is 5 then what is y",
+    "tell me a joke and explain it",
+])
+def test_requests_that_are_not_all_actions_stay_one_step(text):
+    assert shape(PlannerAgent().plan(text)) == [("AI", text, ())]
+
+
+def test_and_inside_a_clause_does_not_split():
+    assert shape(PlannerAgent().plan("play rock and roll")) == \
+        [("EXECUTOR", "play rock and roll", ())]
+
+
+def test_and_splits_parallel_steps():
+    assert shape(PlannerAgent().plan("open notepad and search python, play jazz")) == [
+        ("EXECUTOR", "open notepad", ()),
+        ("EXECUTOR", "search python", ()),
+        ("EXECUTOR", "play jazz", ()),
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "open notepad then explain recursion",
+    "open notepad and then explain recursion",
+    "open notepad, after that explain recursion",
+])
+def test_then_and_after_that_start_a_new_stage(text):
+    assert shape(PlannerAgent().plan(text)) == [
+        ("EXECUTOR", "open notepad", ()),
+        ("AI", "explain recursion", (0,)),
+    ]
+
+
+def test_parallel_ai_clauses_stay_one_step():
+    assert shape(PlannerAgent().plan("open notepad and tell me a joke and explain it")) == [
+        ("EXECUTOR", "open notepad", ()),
+        ("AI", "tell me a joke and explain it", ()),
+    ]
+
+
+def test_plan_logs_one_classification(monkeypatch):
+    logged = []
+    monkeypatch.setattr(agents.obs, "log", lambda agent, action, payload: logged.append(action))
+    PlannerAgent().plan("open notepad and search python then play jazz")
+    assert logged == ["classify"]
+
+
+@pytest.fixture
+def fake_agents(monkeypatch):
+    """
+    Executor and conversation agents that sleep for the seconds given
+    after "@" in the step text and record the prompts they get, keyed by
+    their first line
+    """
+    prompts = {}
+
+    def delay(text):
+        first = text.split("\n")[0]
+        return float(first.split("@")[1].split()[0]) if "@" in first else 0
+
+    async def execute_async(command, dry_run=False):
+        await asyncio.sleep(delay(command))
+        if "broken" in command:
+            raise RuntimeError("tool crashed")
+        return f"[SYSTEM] Executed: {command}"
+
+    async def ask_async(prompt, session_id=None, use_cache=True, use_memory=True, **kwargs):
+        await asyncio.sleep(delay(prompt))
+        first = prompt.split("\n")[0]
+        prompts[first] = prompt
+        return f"answer to {first}"
+
+    monkeypatch.setattr(agents.executor, "execute_async", execute_async)
+    monkeypatch.setattr(agents.ai_agent, "ask_async", ask_async)
+    return prompts
+
+
+def collect(steps):
+    async def main():
+        return [r async for r in run_plan(steps)]
+    return asyncio.run(main())
+
+
+def test_steps_start_after_their_dependencies(fake_agents):
+    steps = [
+        PlanStep(0, "EXECUTOR", "open slow @0.05"),
+        PlanStep(1, "EXECUTOR", "open fast @0.01"),
+        PlanStep(2, "AI", "summarize", deps=(0, 1)),
+    ]
+    results = collect(steps)
+
+    # Yielded in completion order
+    assert [r["id"] for r in results] == [1, 0, 2]
+    by_id = {r["id"]: r for r in results}
+    assert by_id[0]["started"] < 0.01 and by_id[1]["started"] < 0.01
+    assert by_id[2]["started"] >= by_id[0]["started"] + by_id[0]["duration"]
+    assert "- open slow @0.05: [SYSTEM] Executed: open slow @0.05" in fake_agents["summarize"]
+    assert "- open fast @0.01: [SYSTEM] Executed: open fast @0.01" in fake_agents["summarize"]
+
+
+def test_failed_step_result_reaches_its_dependents(fake_agents):
+    steps = [
+        PlanStep(0, "EXECUTOR", "open broken"),
+        PlanStep(1, "AI", "explain what happened", deps=(0,)),
+    ]
+    results = collect(steps)
+
+    assert results[0]["result"] == "[SYSTEM ERROR] Failed to run: open broken"
+    assert results[1]["result"] == "answer to explain what happened"
+    assert "[SYSTEM ERROR] Failed to run: open broken" in fake_agents["explain what happened"]
+
+
+def test_steps_with_unmet_dependencies_never_run(fake_agents):
+    steps = [
+        PlanStep(0, "EXECUTOR", "open notepad"),
+        PlanStep(1, "AI", "explain", deps=(7,)),
+    ]
+    assert [r["id"] for r in collect(steps)] == [0]
+    assert fake_agents == {}
+
+
+def test_parallel_run_reports_steps_as_they_finish(fake_agents):
+    seen = []
+
+    async def main():
+        return await agents.parallel_run(
+            "open slow @0.05 and open fast @0.01", on_step=lambda r: seen.append(r["id"])
+        )
+
+    exec_result, ai_msg = asyncio.run(main())
+    assert seen == [1, 0]
+    # The combined result is back in plan order
+    assert exec_result.splitlines() == [
+        "[SYSTEM] Executed: open slow @0.05",
+        "[SYSTEM] Executed: open fast @0.01",
+    ]
+    assert ai_msg == "answer to Acknowledge the system task: open slow @0.05 and open fast @0.01"
@@ -0,0 +1,80 @@
+"""
+Tests for the response cache
+Run this with: python -m pytest test_response_cache.py
+"""
+import pytest
+
+from response_cache import ResponseCache, cache_key, normalize_prompt
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("response_cache.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_normalize_prompt():
+    assert normalize_prompt("  What   is AI?") == "what is ai"
+    assert normalize_prompt("what is ai") == normalize_prompt("What is AI!")
+
+
+def test_cache_key_depends_on_model_and_context():
+    key = cache_key("What is AI?", "model-a", "ctx")
+    assert key == cache_key("what is ai", "model-a", "ctx")
+    assert key != cache_key("what is ai", "model-b", "ctx")
+    assert key != cache_key("what is ai", "model-a", "other ctx")
+
+
+def test_hit_and_miss_counts():
+    cache = ResponseCache(max_size=4, ttl=60)
+    assert cache.get("k") is None
+    cache.put("k", "v")
+    assert cache.get("k") == "v"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(max_size=4, ttl=10)
+    cache.put("k", "v")
+    clock[0] += 9.9
+    assert cache.get("k") == "v"
+    clock[0] += 0.2
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_put_refreshes_ttl(clock):
+    cache = ResponseCache(max_size=4, ttl=10)
+    cache.put("k", "old")
+    clock[0] += 8
+    cache.put("k", "new")
+    clock[0] += 8
+    assert cache.get("k") == "new"
+
+
+def test_least_recently_used_is_evicted():
+    cache = ResponseCache(max_size=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["entries"] == 2
+
+
+@pytest.mark.parametrize("size, ttl", [(0, 60), (4, 0)])
+def test_disabled_cache_stores_nothing(size, ttl):
+    cache = ResponseCache(max_size=size, ttl=ttl)
+    cache.put("k", "v")
+    assert cache.get("k") is None
+
+
+def test_clear():
+    cache = ResponseCache(max_size=4, ttl=60)
+    cache.put("k", "v")
+    cache.clear()
+    assert cache.get("k") is None
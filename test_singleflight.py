@@ -0,0 +1,145 @@
+"""
+Tests for single-flight call coalescing
+Run this with: python -m pytest test_singleflight.py
+"""
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("q", fetch) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert results == ["answer"] * 5
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+
+def test_different_keys_run_separately():
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(flight.do("a", lambda: fetch("a")), flight.do("b", lambda: fetch("b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
+
+
+def test_exception_reaches_every_waiter():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("q", fail) for _ in range(3)), return_exceptions=True)
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert len(results) == 3
+    assert all(isinstance(r, ValueError) and str(r) == "upstream failed" for r in results)
+    assert flight.in_flight() == 0
+
+
+def test_next_call_after_an_error_runs_again():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("first call fails")
+        return "ok"
+
+    async def main():
+        flight = SingleFlight()
+        with pytest.raises(ValueError):
+            await flight.do("q", flaky)
+        return await flight.do("q", flaky)
+
+    assert asyncio.run(main()) == "ok"
+    assert len(calls) == 2
+
+
+def test_cancelling_one_waiter_keeps_the_shared_call():
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.create_task(flight.do("q", slow))
+        second = asyncio.create_task(flight.do("q", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "answer"
+
+
+def test_cancelling_last_waiter_cancels_the_call():
+    state = {}
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def main():
+        flight = SingleFlight()
+        waiter = asyncio.create_task(flight.do("q", slow))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        return flight
+
+    flight = asyncio.run(main())
+    assert state.get("cancelled")
+    assert flight.in_flight() == 0
+
+
+def test_caller_after_cancel_starts_a_fresh_call():
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        flight = SingleFlight()
+        waiter = asyncio.create_task(flight.do("q", slow))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # The cancelled task has not finished unwinding yet; a new caller
+        # must not join it
+        return await flight.do("q", slow)
+
+    assert asyncio.run(main()) == "answer"
+    assert len(calls) == 2
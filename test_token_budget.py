@@ -0,0 +1,76 @@
+"""
+Tests for token estimates and context packing
+Run this with: python -m pytest test_token_budget.py
+"""
+import token_budget
+from token_budget import (
+    estimate_tokens, format_turn, join_turns, pack_turns, token_budget as budget_for,
+    truncate_tokens, turn_tokens, _parse_budgets
+)
+
+
+def turn(query, response="ok"):
+    return {"query": query, "response": response}
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(None) == 0
+    assert estimate_tokens("abc") == 1
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_turn_tokens_is_cached_on_the_turn():
+    t = turn("hello there")
+    tokens = turn_tokens(t)
+    assert tokens == estimate_tokens(format_turn(t)) + 1
+    assert t["tokens"] == tokens
+    t["query"] = "x" * 1000
+    assert turn_tokens(t) == tokens
+
+
+def test_pack_takes_whole_turns_in_order_until_full():
+    turns = [turn("a" * 40), turn("b" * 40), turn("c" * 40)]
+    cost = turn_tokens(turns[0])
+    packed, used = pack_turns(turns, cost * 2 + 1)
+    assert packed == turns[:2]
+    assert used == cost * 2
+
+
+def test_pack_stops_at_the_first_turn_that_does_not_fit():
+    small, big = turn("s"), turn("b" * 400)
+    packed, _ = pack_turns([small, big, turn("t")], turn_tokens(small) + 5)
+    # Order matters more than filling the budget
+    assert packed == [small]
+
+
+def test_pack_with_no_budget():
+    assert pack_turns([turn("a")], 0) == ([], 0)
+    assert pack_turns([], 100) == ([], 0)
+
+
+def test_join_turns():
+    assert join_turns([turn("hi", "hello"), turn("bye", "see you")]) == \
+        "User: hi\nAssistant: hello\n\nUser: bye\nAssistant: see you"
+
+
+def test_truncate_tokens():
+    text = "short line"
+    assert truncate_tokens(text, 100) is text
+    long = "\n".join(f"- fact number {i}" for i in range(100))
+    cut = truncate_tokens(long, 50)
+    assert estimate_tokens(cut) <= 52
+    assert cut.endswith(" ...")
+    # Cut at a line break, not inside a bullet
+    assert cut[:-4].endswith(tuple(f"number {i}" for i in range(100)))
+
+
+def test_parse_budgets_skips_bad_items():
+    assert _parse_budgets("a=100, b = 200,junk,c=x") == {"a": 100, "b": 200}
+
+
+def test_model_budget_falls_back_to_default(monkeypatch):
+    monkeypatch.setattr(token_budget, "MODEL_TOKEN_BUDGETS", {"big-model": 8000})
+    assert budget_for("big-model") == 8000
+    assert budget_for("other-model") == token_budget.CONTEXT_TOKEN_BUDGET
@@ -0,0 +1,189 @@
+"""
+Tests for the tool executor
+Run this with: python -m pytest test_tools.py
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from tools import ToolExecutor
+
+
+class SlowTool:
+    """
+    Blocking fake tool that sleeps, records how many calls overlap and
+    which calls ran, and can be made to ignore its cancel event
+    """
+
+    def __init__(self, seconds=0.05, honour_cancel=True):
+        self.seconds = seconds
+        self.honour_cancel = honour_cancel
+        self.running = 0
+        self.peak = 0
+        self.calls = []
+        self.finished = []
+        self._lock = threading.Lock()
+
+    def __call__(self, arg, cancel):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            self.calls.append(arg)
+        try:
+            deadline = time.perf_counter() + self.seconds
+            while time.perf_counter() < deadline:
+                if self.honour_cancel and cancel.is_set():
+                    return "stopped"
+                time.sleep(0.005)
+            return f"done {arg}"
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.finished.append((arg, time.perf_counter()))
+
+
+def test_reports_result_and_timings():
+    executor = ToolExecutor(workers=2)
+    executor.register("slow", SlowTool(0.02))
+
+    report = asyncio.run(executor.run("slow", "x"))
+    assert report["status"] == "ok"
+    assert report["result"] == "done x"
+    assert report["run_time"] >= 0.02
+    assert report["queue_wait"] >= 0
+
+
+def test_errors_are_reported_not_raised():
+    def broken(arg):
+        raise ValueError("no such app")
+
+    executor = ToolExecutor(workers=1)
+    executor.register("broken", broken)
+    report = asyncio.run(executor.run("broken", "x"))
+    assert report["status"] == "error"
+    assert report["error"] == "ValueError: no such app"
+
+
+def test_unknown_tool_raises():
+    with pytest.raises(KeyError):
+        asyncio.run(ToolExecutor(workers=1).run("missing"))
+
+
+def test_dry_run_does_not_call_the_tool():
+    tool = SlowTool()
+    executor = ToolExecutor(workers=1)
+    executor.register("slow", tool)
+    report = asyncio.run(executor.run("slow", "x", dry_run=True))
+    assert report["status"] == "ok" and report["dry_run"]
+    assert tool.calls == []
+
+
+def test_per_tool_concurrency_limit():
+    tool = SlowTool(0.03)
+    executor = ToolExecutor(workers=8)
+    executor.register("slow", tool, max_concurrency=2)
+
+    async def main():
+        return await asyncio.gather(*(executor.run("slow", i) for i in range(6)))
+
+    reports = asyncio.run(main())
+    assert all(r["status"] == "ok" for r in reports)
+    assert tool.peak == 2
+    # Later calls waited for a slot
+    assert max(r["queue_wait"] for r in reports) >= 0.05
+
+
+def test_admission_queue_bounds_calls_across_tools():
+    a, b = SlowTool(0.05), SlowTool(0.05)
+    executor = ToolExecutor(workers=8, queue_size=2)
+    executor.register("a", a)
+    executor.register("b", b)
+
+    async def main():
+        calls = [executor.run(name, i) for i in range(3) for name in ("a", "b")]
+        tasks = [asyncio.create_task(c) for c in calls]
+        await asyncio.sleep(0.02)
+        admitted = executor.stats()["admitted"]
+        reports = await asyncio.gather(*tasks)
+        return admitted, reports
+
+    admitted, reports = asyncio.run(main())
+    assert admitted == 2
+    assert a.peak + b.peak <= 2
+    assert all(r["status"] == "ok" for r in reports)
+    assert executor.stats()["admitted"] == 0
+
+
+def test_timeout_sets_cancel_event():
+    tool = SlowTool(5)
+    executor = ToolExecutor(workers=1)
+    executor.register("slow", tool)
+
+    started = time.perf_counter()
+    report = asyncio.run(executor.run("slow", "x", timeout=0.05))
+    assert report["status"] == "timeout"
+    assert report["error"] == "Timed out after 0.05s"
+    assert time.perf_counter() - started < 1
+    # The worker saw the cancel event and stopped early
+    deadline = time.perf_counter() + 1
+    while not tool.finished and time.perf_counter() < deadline:
+        time.sleep(0.005)
+    assert tool.finished
+
+
+def test_slot_is_held_until_the_worker_returns():
+    tool = SlowTool(0.15, honour_cancel=False)
+    executor = ToolExecutor(workers=4)
+    executor.register("slow", tool, max_concurrency=1)
+
+    async def main():
+        first = await executor.run("slow", "first", timeout=0.02)
+        # The timed-out call is still running on its worker
+        assert executor.stats()["admitted"] == 1
+        second = await executor.run("slow", "second")
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first["status"] == "timeout"
+    assert second["status"] == "ok"
+    assert tool.peak == 1
+    assert second["queue_wait"] >= 0.1
+
+
+def test_cancellation_propagates_and_keeps_the_slot():
+    tool = SlowTool(0.15, honour_cancel=False)
+    executor = ToolExecutor(workers=4)
+    executor.register("slow", tool, max_concurrency=1)
+
+    async def main():
+        task = asyncio.create_task(executor.run("slow", "x"))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        held = executor.stats()["admitted"]
+        await asyncio.sleep(0.2)
+        return held
+
+    assert asyncio.run(main()) == 1
+    assert executor.stats()["admitted"] == 0
+
+
+def test_call_that_times_out_while_queued_never_runs():
+    tool = SlowTool(0.1, honour_cancel=False)
+    executor = ToolExecutor(workers=1)
+    executor.register("slow", tool)
+
+    async def main():
+        blocking = asyncio.create_task(executor.run("slow", "first"))
+        await asyncio.sleep(0.01)
+        queued = await executor.run("slow", "second", timeout=0.02)
+        await blocking
+        # Let the skipped call leave the pool
+        await asyncio.sleep(0.02)
+        return queued
+
+    assert asyncio.run(main())["status"] == "timeout"
+    assert tool.calls == ["first"]
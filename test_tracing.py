@@ -0,0 +1,142 @@
+"""
+Tests for request tracing
+Run this with: python -m pytest test_tracing.py
+"""
+import asyncio
+import json
+import threading
+
+import pytest
+
+import tracing
+from tracing import Span, SpanExporter, Trace, TraceStore, current_trace_id, span, trace
+
+
+def test_spans_nest_across_tasks():
+    async def child(name):
+        with span(name, item=name):
+            await asyncio.sleep(0.01)
+
+    async def main():
+        with trace("request", route="AI") as root:
+            with span("plan") as plan:
+                await asyncio.gather(child("a"), child("b"))
+            return root, plan
+
+    root, plan = asyncio.run(main())
+    spans = {s.name: s for s in root.trace.spans}
+    assert set(spans) == {"request", "plan", "a", "b"}
+    assert spans["plan"].parent_id == root.span_id
+    assert spans["a"].parent_id == plan.span_id
+    assert spans["b"].parent_id == plan.span_id
+    assert spans["a"].attributes == {"item": "a"}
+    assert tracing.traces.get(root.trace_id) is root.trace
+    assert root.trace.to_dict()["spans"][0]["name"] == "request"
+
+
+def test_span_outside_a_trace_does_nothing():
+    with span("orphan") as s:
+        assert s is None
+        assert current_trace_id() is None
+
+
+def test_span_records_errors_and_cancellation():
+    async def cancelled():
+        with span("cancelled"):
+            await asyncio.sleep(1)
+
+    async def main():
+        with trace("request") as root:
+            with pytest.raises(ValueError):
+                with span("failing"):
+                    raise ValueError("bad input")
+            task = asyncio.create_task(cancelled())
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        return root
+
+    spans = {s.name: s for s in asyncio.run(main()).trace.spans}
+    assert spans["failing"].status == "error"
+    assert spans["failing"].error == "ValueError: bad input"
+    assert spans["cancelled"].status == "cancelled"
+    assert spans["request"].status == "ok"
+
+
+def finished_trace(ms):
+    t = Trace()
+    t.root = Span(t, f"took {ms}")
+    t.root.duration = ms / 1000
+    return t
+
+
+def test_slow_traces_are_filtered_and_sorted():
+    store = TraceStore(max_traces=10)
+    for ms in (5, 1500, 900, 3000, 1200):
+        store.add(finished_trace(ms))
+    assert [t.root.name for t in store.slow(min_ms=1000)] == ["took 3000", "took 1500", "took 1200"]
+    assert [t.root.name for t in store.slow(min_ms=1000, limit=1)] == ["took 3000"]
+
+
+def test_trace_store_keeps_the_newest():
+    store = TraceStore(max_traces=2)
+    kept = [finished_trace(ms) for ms in (1, 2, 3)]
+    for t in kept:
+        store.add(t)
+    assert len(store) == 2
+    assert store.get(kept[0].trace_id) is None
+    assert store.get(kept[2].trace_id) is kept[2]
+
+
+def spans(n):
+    t = Trace()
+    out = []
+    for i in range(n):
+        s = Span(t, f"span {i}", attributes={"pad": "x" * 100})
+        s.duration = 0.001
+        out.append(s)
+    return out
+
+
+def read_names(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["name"] for line in f]
+
+
+def test_jsonl_export_rotates_at_max_bytes(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    exporter = SpanExporter(kind="jsonl", path=path, max_bytes=1000)
+    for batch in (spans(5), spans(5), spans(5)):
+        exporter._write(batch)
+
+    # One previous file is kept; the oldest batch is gone
+    assert read_names(path + ".1") == [f"span {i}" for i in range(5)]
+    assert read_names(path) == [f"span {i}" for i in range(5)]
+    assert not (tmp_path / "traces.jsonl.2").exists()
+    assert exporter.exported == 15
+
+
+def test_close_writes_queued_spans(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    exporter = SpanExporter(kind="jsonl", path=path)
+    for s in spans(3):
+        exporter.export(s)
+    exporter.close()
+    assert read_names(path) == ["span 0", "span 1", "span 2"]
+    assert exporter.stats()["queued"] == 0
+
+
+def test_worker_stops_when_close_lands_mid_batch(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    exporter = SpanExporter(kind="jsonl", path=path)
+    first, late = spans(2)
+    exporter._queue.put(first)
+    exporter._queue.put(None)
+    exporter._queue.put(late)
+
+    worker = threading.Thread(target=exporter._worker, daemon=True)
+    worker.start()
+    worker.join(1)
+    assert not worker.is_alive()
+    assert read_names(path) == ["span 0", "span 1"]
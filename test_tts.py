@@ -0,0 +1,135 @@
+"""
+Tests for the TTS queue, using the null backend
+Run this with: python -m pytest test_tts.py
+"""
+import threading
+
+import pytest
+
+from tts import NullBackend, SpeechStream, TTSQueue
+
+
+class GatedBackend(NullBackend):
+    """
+    Null backend that blocks in speak() until released, so tests can
+    stop the queue while a sentence is being spoken
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def speak(self, sentence):
+        self.started.set()
+        while not self.release.wait(0.01):
+            if self._stop.is_set():
+                return
+        self.spoken.append(sentence)
+
+
+class RacingBackend(NullBackend):
+    """
+    Null backend where a stop() arrives after the queue has picked the
+    first sentence but before the backend starts speaking it
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.queue = None
+        self.raced = False
+
+    def speak(self, sentence):
+        if not self.raced:
+            self.raced = True
+            stopper = threading.Thread(target=self.queue.stop)
+            stopper.start()
+            stopper.join()
+        super().speak(sentence)
+
+
+@pytest.fixture
+def tts():
+    queue = TTSQueue(NullBackend())
+    yield queue
+    queue.close(timeout=2)
+
+
+def test_stream_splits_sentences_across_chunks():
+    stream = SpeechStream(0)
+    for chunk in ["Hello th", "ere. How are", " you? Fine", "\nBye"]:
+        stream.write(chunk)
+    stream.close()
+    sentences = []
+    while True:
+        sentence = stream._sentences.get_nowait()
+        if sentence is None:
+            break
+        sentences.append(sentence)
+    assert sentences == ["Hello there.", "How are you?", "Fine", "Bye"]
+
+
+def test_say_speaks_in_order(tts):
+    tts.say("One. Two.")
+    tts.say("Three!")
+    assert tts.wait_idle(2)
+    assert tts.backend.spoken == ["One.", "Two.", "Three!"]
+
+
+def test_streams_speak_in_the_order_they_were_opened(tts):
+    first = tts.open()
+    second = tts.open()
+    second.write("Second answer.")
+    second.close()
+    first.write("First answer.")
+    first.close()
+    assert tts.wait_idle(2)
+    assert tts.backend.spoken == ["First answer.", "Second answer."]
+
+
+def test_stop_drops_current_and_queued_speech():
+    backend = GatedBackend()
+    tts = TTSQueue(backend)
+    try:
+        tts.say("Long sentence being spoken. Queued sentence.")
+        tts.say("Another queued answer.")
+        assert backend.started.wait(2)
+        tts.stop()
+        assert tts.wait_idle(2)
+        assert backend.spoken == []
+
+        # Speech opened after stop() plays normally
+        backend.release.set()
+        tts.say("After stop.")
+        assert tts.wait_idle(2)
+        assert backend.spoken == ["After stop."]
+    finally:
+        backend.release.set()
+        tts.close(timeout=2)
+
+
+def test_stop_abandons_a_stream_still_being_written(tts):
+    stream = tts.open()
+    stream.write("Partial")
+    tts.stop()
+    # The worker must not wait for close() on a stopped stream
+    assert tts.wait_idle(2)
+    tts.say("Next.")
+    assert tts.wait_idle(2)
+    assert tts.backend.spoken == ["Next."]
+
+
+def test_stop_just_before_speak_is_not_lost():
+    backend = RacingBackend()
+    tts = TTSQueue(backend)
+    backend.queue = tts
+    try:
+        tts.say("Interrupted before it started.")
+        assert tts.wait_idle(2)
+        assert backend.spoken == []
+
+        tts.say("Spoken normally.")
+        assert tts.wait_idle(2)
+        assert backend.spoken == ["Spoken normally."]
+    finally:
+        tts.close(timeout=2)
@@ -0,0 +1,87 @@
+"""
+Tests for the local vector index
+Run this with: python -m pytest test_vector_index.py
+"""
+import pytest
+
+pytest.importorskip("numpy")
+
+from vector_index import HashingEmbedder, VectorIndex
+
+
+def turn(id, query, response="ok", session_id="s"):
+    return {"id": id, "session_id": session_id, "query": query, "response": response}
+
+
+def test_embeddings_are_unit_length_and_deterministic():
+    import numpy as np
+
+    vectors = HashingEmbedder(dim=64).embed(["turn on the lights", "turn on the lights", ""])
+    assert vectors.shape == (3, 64)
+    assert np.allclose(vectors[0], vectors[1])
+    assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+    assert not vectors[2].any()
+
+
+def test_search_ranks_best_match_first():
+    index = VectorIndex()
+    index.add([
+        turn(1, "what is the weather in paris"),
+        turn(2, "play some jazz music"),
+        turn(3, "set a timer for ten minutes"),
+    ])
+    [matches] = index.search(["weather in paris tomorrow"], "s", k=2, min_score=-1.0)
+    assert matches[0][1]["id"] == 1
+    assert matches[0][0] > matches[1][0]
+    # Unrelated turns fall below the default cut-off
+    [matches] = index.search(["weather in paris tomorrow"], "s", k=3)
+    assert [row["id"] for _, row in matches] == [1]
+
+
+def test_search_stays_within_session():
+    index = VectorIndex()
+    index.add([turn(1, "play jazz", session_id="a"), turn(2, "play jazz", session_id="b")])
+    [matches] = index.search(["play jazz"], "a", k=5)
+    assert [row["id"] for _, row in matches] == [1]
+    assert index.search(["play jazz"], "missing") == [[]]
+
+
+def test_shards_grow_past_initial_capacity():
+    index = VectorIndex()
+    index.add([turn(i, f"note number {i}") for i in range(10)])
+    index.add([turn(10, "remember the milk")])
+    assert index.size == 11
+    [matches] = index.search(["remember the milk"], "s", k=1)
+    assert matches[0][1]["id"] == 10
+
+
+def test_add_skips_turns_already_indexed():
+    index = VectorIndex()
+    index.add([turn(1, "play jazz"), turn(2, "stop the music")])
+    index.add([turn(2, "stop the music"), turn(3, "volume up")])
+    assert index.size == 3
+
+
+def test_add_matches_unsaved_turn_by_text():
+    index = VectorIndex()
+    # A save() whose insert has not returned an id yet
+    index.add([turn(None, "play jazz", "playing")])
+    index.add([turn(7, "play jazz", "playing")])
+    assert index.size == 1
+
+
+def test_add_only_indexes_listed_sessions():
+    index = VectorIndex()
+    index.add([turn(1, "a", session_id="kept"), turn(2, "b", session_id="gone")],
+              sessions={"kept"})
+    assert "kept" in index and "gone" not in index
+    assert index.size == 1
+
+
+def test_drop_forgets_session():
+    index = VectorIndex()
+    index.add([turn(1, "a", session_id="x"), turn(2, "b", session_id="y")])
+    index.drop("x")
+    assert "x" not in index
+    assert index.sessions() == 1
+    assert index.size == 1
@@ -0,0 +1,79 @@
+"""
+Tests for offline wake-word spotting
+Run this with: python -m pytest test_wake_word.py
+
+The clips in fixtures/wake_word are synthetic: each "word" is three
+harmonic tone sweeps with a speech-like envelope, recorded at 16 kHz
+with background noise. The three templates are takes of "hey jarvis"
+at slightly different tempo and pitch.
+"""
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from wake_word import EnergyVAD, WakeWordDetector, read_wav, _segments
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "wake_word")
+
+
+def clip(name):
+    return read_wav(os.path.join(FIXTURES, name))
+
+
+@pytest.fixture(scope="module")
+def detector():
+    return WakeWordDetector.from_directory(os.path.join(FIXTURES, "templates"))
+
+
+def test_templates_load_with_labels(detector):
+    assert len(detector.templates) == 3
+    assert {label for label, _ in detector.templates} == {"hey jarvis"}
+    assert 0 < detector.threshold < 0.35
+
+
+def test_detects_wake_word(detector):
+    detection = detector.detect(clip("wake.wav"))
+    assert detection is not None
+    assert detection.label == "hey jarvis"
+    assert detection.score <= detector.threshold
+    assert 0.5 < detection.segment_seconds < 2.0
+
+
+def test_ignores_other_words(detector):
+    assert detector.detect(clip("other_word.wav")) is None
+
+
+def test_ignores_background_noise(detector):
+    assert detector.detect(clip("silence.wav")) is None
+
+
+def test_explicit_threshold_overrides_derived(detector):
+    strict = WakeWordDetector.from_directory(os.path.join(FIXTURES, "templates"), threshold=0.001)
+    assert strict.threshold == 0.001
+    assert strict.detect(clip("wake.wav")) is None
+
+
+def test_missing_directory_gives_no_detector(tmp_path):
+    assert WakeWordDetector.from_directory(str(tmp_path / "missing")) is None
+    assert WakeWordDetector.from_directory(str(tmp_path)) is None
+
+
+def test_vad_segments_do_not_depend_on_chunk_size():
+    pcm = clip("wake.wav")
+    whole = _segments(pcm)
+    assert len(whole) == 1
+
+    floor = EnergyVAD()
+    floor.feed(pcm[:6400])
+    for chunk in (320, 1000, 4096):
+        vad = EnergyVAD(floor_db=floor.floor_db)
+        segments = []
+        for i in range(0, len(pcm), chunk):
+            segments.extend(vad.feed(pcm[i:i + chunk]))
+        tail = vad.flush()
+        if tail is not None:
+            segments.append(tail)
+        assert len(segments) == 1
+        assert abs(len(segments[0]) - len(whole[0])) <= EnergyVAD().frame_samples * 5
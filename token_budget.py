@@ -0,0 +1,98 @@
+"""
+Token estimates and per-model context budgets for prompt construction
+"""
+import os
+
+# Characters per token assumed by estimate_tokens; about right for
+# English text on Gemini and cheap enough to run on every turn
+CHARS_PER_TOKEN = 4
+# Context tokens (summary plus past turns) allowed in one prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+# Per-model overrides, e.g. "gemini-2.5-pro=8000,gemini-2.5-flash-lite=1000"
+CONTEXT_TOKEN_BUDGETS = os.getenv("CONTEXT_TOKEN_BUDGETS", "")
+# Share of the budget the rolling summary may take; past turns get the rest
+CONTEXT_SUMMARY_SHARE = float(os.getenv("CONTEXT_SUMMARY_SHARE", "0.5"))
+
+
+def _parse_budgets(spec):
+    budgets = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        model, tokens = item.split("=", 1)
+        try:
+            budgets[model.strip()] = int(tokens)
+        except ValueError:
+            print(f"⚠️  Ignoring context budget {item.strip()!r}")
+    return budgets
+
+
+MODEL_TOKEN_BUDGETS = _parse_budgets(CONTEXT_TOKEN_BUDGETS)
+
+
+def token_budget(model):
+    """
+    Context tokens allowed for prompts sent to model
+    """
+    return MODEL_TOKEN_BUDGETS.get(model, CONTEXT_TOKEN_BUDGET)
+
+
+def summary_budget(model):
+    """
+    Tokens of rolling summary allowed in prompts sent to model
+    """
+    return int(token_budget(model) * CONTEXT_SUMMARY_SHARE)
+
+
+def estimate_tokens(text):
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_tokens(text, budget):
+    """
+    Cut text to about budget tokens, at a line break where possible
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    cut = text[:max(0, budget) * CHARS_PER_TOKEN]
+    line_end = cut.rfind("\n")
+    if line_end > len(cut) // 2:
+        cut = cut[:line_end]
+    return cut.rstrip() + " ..."
+
+
+def format_turn(turn):
+    return f"User: {turn.get('query') or ''}\nAssistant: {turn.get('response') or ''}"
+
+
+def turn_tokens(turn):
+    """
+    Estimated tokens of a formatted turn, cached on the turn dict
+    """
+    tokens = turn.get("tokens")
+    if tokens is None:
+        # +1 for the blank line that separates turns
+        tokens = turn["tokens"] = estimate_tokens(format_turn(turn)) + 1
+    return tokens
+
+
+def pack_turns(turns, budget):
+    """
+    Take whole turns in the order given (newest or most relevant first)
+    until the next one would exceed budget. Returns (turns, tokens used).
+    """
+    packed = []
+    used = 0
+    for turn in turns:
+        cost = turn_tokens(turn)
+        if used + cost > budget:
+            break
+        packed.append(turn)
+        used += cost
+    return packed, used
+
+
+def join_turns(turns):
+    return "\n\n".join(format_turn(t) for t in turns)
@@ -0,0 +1,281 @@
+"""
+Tool execution subsystem behind the Executor agent
+"""
+import asyncio
+import inspect
+import os
+import platform
+import subprocess
+import threading
+import time
+import weakref
+import webbrowser
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import registry
+from intent_router import IntentRouter
+
+IS_WINDOWS = platform.system() == "Windows"
+IS_MAC = platform.system() == "Darwin"
+
+# Worker threads shared by all tools
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "8"))
+# Calls admitted (running or waiting) before callers are made to wait
+TOOL_QUEUE_SIZE = int(os.getenv("TOOL_QUEUE_SIZE", "64"))
+# Default per-call timeout in seconds
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "10"))
+# Log tool calls instead of touching the desktop (servers, benchmarks)
+TOOLS_DRY_RUN = os.getenv("TOOLS_DRY_RUN", "").lower() in ("1", "true", "yes")
+# HTTP /ask runs on a server: only log its tool calls unless set to 0
+API_TOOLS_DRY_RUN = os.getenv("API_TOOLS_DRY_RUN", "1").lower() in ("1", "true", "yes")
+
+TOOL_CALLS = registry.counter(
+    "jarvis_tool_calls_total", "Tool calls by outcome", ["tool", "status"]
+)
+TOOL_QUEUE_WAIT = registry.histogram(
+    "jarvis_tool_queue_seconds", "Time a tool call waited before running", ["tool"]
+)
+TOOL_RUN_TIME = registry.histogram(
+    "jarvis_tool_run_seconds", "Tool call run time", ["tool"]
+)
+
+# ---------- ALLOWED TARGETS ----------
+# Cross-platform application paths
+ALLOWED_APPS = {
+    "notepad": r"C:\Windows\System32\notepad.exe" if IS_WINDOWS else "open -a TextEdit" if IS_MAC else "gedit",
+    "calculator": r"C:\Windows\System32\calc.exe" if IS_WINDOWS else "open -a Calculator" if IS_MAC else "gnome-calculator"
+}
+
+ALLOWED_WEBSITES = {
+    "google": "https://www.google.com",
+    "youtube": "https://www.youtube.com",
+    "facebook": "https://www.facebook.com",
+    "twitter": "https://www.twitter.com",
+    "instagram": "https://www.instagram.com",
+    "github": "https://www.github.com",
+    "linkedin": "https://www.linkedin.com",
+    "gmail": "https://mail.google.com",
+    "amazon": "https://www.amazon.com",
+    "netflix": "https://www.netflix.com",
+    "stackoverflow": "https://stackoverflow.com",
+    "chatgpt": "https://chat.openai.com",
+    "reddit": "https://www.reddit.com"
+}
+
+# Cross-platform folders
+FOLDERS = {
+    "documents": os.path.expanduser("~/Documents"),
+    "downloads": os.path.expanduser("~/Downloads"),
+    "desktop": os.path.expanduser("~/Desktop"),
+    "home": os.path.expanduser("~")
+}
+
+
+# ---------- TOOLS ----------
+def open_url(url):
+    """Open a URL in the default browser"""
+    if TOOLS_DRY_RUN:
+        print(f"[TOOL] open_url {url}")
+        return url
+    webbrowser.open(url)
+    return url
+
+
+def open_app(path):
+    """Launch a desktop application without waiting for it to exit"""
+    if TOOLS_DRY_RUN:
+        print(f"[TOOL] open_app {path}")
+        return path
+    if IS_WINDOWS:
+        subprocess.Popen(path)
+    else:
+        subprocess.Popen(path, shell=True)
+    return path
+
+
+def open_folder(path):
+    """Open a folder in the system file manager"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    if TOOLS_DRY_RUN:
+        print(f"[TOOL] open_folder {path}")
+        return path
+    if IS_WINDOWS:
+        os.startfile(path)
+    elif IS_MAC:
+        subprocess.Popen(["open", path])
+    else:
+        subprocess.Popen(["xdg-open", path])
+    return path
+
+
+def google_search(query):
+    """Open a Google search for query"""
+    return open_url(f"https://www.google.com/search?q={query.replace(' ', '+')}")
+
+
+# ---------- EXECUTION ----------
+class Tool:
+    """
+    A registered tool: a blocking callable plus its limits
+    """
+
+    def __init__(self, name, fn, max_concurrency=4, timeout=TOOL_TIMEOUT):
+        self.name = name
+        self.fn = fn
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        # Tools that take a `cancel` event can stop early on timeout
+        self.accepts_cancel = "cancel" in inspect.signature(fn).parameters
+
+
+class _LoopState:
+    """
+    asyncio primitives for one event loop
+    """
+
+    def __init__(self, queue_size, tools):
+        self.admission = asyncio.Semaphore(queue_size)
+        self.tool_slots = {name: asyncio.Semaphore(t.max_concurrency) for name, t in tools.items()}
+
+
+class ToolExecutor:
+    """
+    Runs blocking tool calls on a bounded worker pool. Each call waits
+    for a slot in the admission queue (backpressure once TOOL_QUEUE_SIZE
+    calls are in the system) and for its tool's concurrency limit, then
+    runs with a timeout. On timeout or cancellation the tool's cancel
+    event is set; the slot is only released once the worker returns.
+    """
+
+    def __init__(self, workers=TOOL_WORKERS, queue_size=TOOL_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool")
+        self._tools = {}
+        self._states = weakref.WeakKeyDictionary()
+        self._admitted = 0
+
+    def register(self, name, fn, max_concurrency=4, timeout=TOOL_TIMEOUT):
+        self._tools[name] = Tool(name, fn, max_concurrency, timeout)
+        self._states = weakref.WeakKeyDictionary()
+        return self._tools[name]
+
+    def _state(self, loop):
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = _LoopState(self.queue_size, self._tools)
+        return state
+
+    def stats(self):
+        return {"tools": sorted(self._tools), "admitted": self._admitted, "queue_size": self.queue_size}
+
+    async def run(self, name, *args, timeout=None, dry_run=False, **kwargs):
+        """
+        Run a tool and return a report dict:
+        tool, status (ok/error/timeout/cancelled), result or error,
+        queue_wait and run_time in seconds. With dry_run=True the call is
+        only logged.
+        """
+        tool = self._tools.get(name)
+        if tool is None:
+            raise KeyError(f"Unknown tool: {name}")
+
+        if dry_run:
+            print(f"[TOOL] {name} {' '.join(map(str, args))} (dry run)")
+            TOOL_CALLS.inc(tool=name, status="dry_run")
+            return {"tool": name, "status": "ok", "result": None, "dry_run": True,
+                    "queue_wait": 0.0, "run_time": 0.0}
+
+        loop = asyncio.get_running_loop()
+        state = self._state(loop)
+        timeout = tool.timeout if timeout is None else timeout
+        cancel = threading.Event()
+        if tool.accepts_cancel:
+            kwargs["cancel"] = cancel
+
+        report = {"tool": name, "status": "cancelled", "queue_wait": None, "run_time": None}
+        timing = {}
+        enqueued = time.perf_counter()
+
+        def invoke():
+            timing["started"] = time.perf_counter()
+            try:
+                if cancel.is_set():
+                    # Timed out or cancelled while still queued
+                    return None
+                return tool.fn(*args, **kwargs)
+            finally:
+                timing["finished"] = time.perf_counter()
+
+        await state.admission.acquire()
+        self._admitted += 1
+        slot = state.tool_slots[name]
+        try:
+            await slot.acquire()
+        except BaseException:
+            self._admitted -= 1
+            state.admission.release()
+            raise
+
+        def release(_):
+            slot.release()
+            state.admission.release()
+            self._admitted -= 1
+
+        future = loop.run_in_executor(self._pool, invoke)
+        future.add_done_callback(release)
+        try:
+            report["result"] = await asyncio.wait_for(asyncio.shield(future), timeout)
+            report["status"] = "ok"
+        except asyncio.TimeoutError:
+            cancel.set()
+            report["status"] = "timeout"
+            report["error"] = f"Timed out after {timeout}s"
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+        except Exception as e:
+            report["status"] = "error"
+            report["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            started = timing.get("started")
+            if started is not None:
+                report["queue_wait"] = round(started - enqueued, 4)
+                TOOL_QUEUE_WAIT.observe(started - enqueued, tool=name)
+                finished = timing.get("finished", time.perf_counter())
+                report["run_time"] = round(finished - started, 4)
+                TOOL_RUN_TIME.observe(finished - started, tool=name)
+            TOOL_CALLS.inc(tool=name, status=report["status"])
+
+        return report
+
+
+tool_executor = ToolExecutor()
+tool_executor.register("open_url", open_url, max_concurrency=4, timeout=5)
+tool_executor.register("open_app", open_app, max_concurrency=2, timeout=5)
+tool_executor.register("open_folder", open_folder, max_concurrency=2, timeout=5)
+tool_executor.register("google_search", google_search, max_concurrency=4, timeout=5)
+
+
+# ---------- COMMAND RESOLUTION ----------
+# Searches first, then desktop apps, websites and folders
+TOOL_COMMANDS = IntentRouter() \
+    .add("google_search", ["google search", "search for", "search"], data=None)
+for _app, _path in ALLOWED_APPS.items():
+    TOOL_COMMANDS.add("open_app", _app, data=_path)
+for _site, _url in ALLOWED_WEBSITES.items():
+    TOOL_COMMANDS.add("open_url", _site, data=_url)
+for _name, _path in FOLDERS.items():
+    TOOL_COMMANDS.add("open_folder", _name, data=_path)
+
+
+def resolve_command(command):
+    """
+    Map a spoken command to (tool, argument), or None if no tool fits
+    """
+    match = TOOL_COMMANDS.match(command)
+    if match is None:
+        return None
+    if match.name == "google_search":
+        return (match.name, match.args) if match.args else None
+    return match.name, match.data
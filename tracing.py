@@ -0,0 +1,373 @@
+"""
+Lightweight request tracing
+
+A trace is started where a request enters (/ask, the voice loop) and
+spans nest under it through a context variable, so they follow the
+request into the tasks it creates. Outside a trace, span() does nothing.
+The most recent traces are kept in memory for /debug/traces; finished
+spans can also be exported in the background to a size-capped JSONL
+file or an OTLP/HTTP (JSON) collector (off by default).
+"""
+import asyncio
+import atexit
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# none, jsonl or otlp
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+# The JSONL file is moved to TRACE_FILE.1 once it passes this size
+TRACE_FILE_MAX_MB = float(os.getenv("TRACE_FILE_MAX_MB", "50"))
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "jarvis-elite")
+# Finished traces kept in memory for /debug/traces
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "500"))
+# Traces at least this long are listed as slow
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "1000"))
+TRACE_EXPORT_BATCH = 256
+
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    """
+    One timed operation. Attributes are plain JSON values.
+    """
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes",
+                 "start_ns", "duration", "status", "error", "_start")
+
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+        self._start = time.perf_counter()
+
+    @property
+    def trace_id(self):
+        return self.trace.trace_id
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def end(self, error=None):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            self.status = "cancelled"
+        elif error is not None:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"
+        self.trace._finish(self)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """
+    The spans of one request. Finished when its root span ends; spans
+    from background work the request started may still arrive later.
+    """
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or new_trace_id()
+        self.root = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @property
+    def duration(self):
+        return self.root.duration if self.root else None
+
+    def _finish(self, span):
+        with self._lock:
+            self.spans.append(span)
+        exporter.export(span)
+        if span is self.root:
+            traces.add(self)
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start_ns)
+        root = self.root
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name,
+            "start": root.start_ns / 1e9,
+            "duration_ms": round(root.duration * 1000, 3) if root.duration is not None else None,
+            "status": root.status,
+            "attributes": root.attributes,
+            "spans": [s.to_dict() for s in spans],
+        }
+
+
+def new_trace_id():
+    return os.urandom(16).hex()
+
+
+def current_span():
+    return _current.get()
+
+
+def current_trace_id():
+    span = _current.get()
+    return span.trace_id if span else None
+
+
+def start_span(name, **attributes):
+    """
+    Start a child of the current span without making it current (for
+    async generators, whose context leaks into the caller). Returns None
+    outside a trace; call .end() when done.
+    """
+    parent = _current.get()
+    if parent is None:
+        return None
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+
+@contextmanager
+def _activate(span):
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.end(e)
+        raise
+    finally:
+        span.end()
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Closed from another context, e.g. an abandoned stream
+            pass
+
+
+@contextmanager
+def trace(name, trace_id=None, **attributes):
+    """
+    Start a new trace whose root span is current inside the block.
+    Yields the root span (its trace_id identifies the request).
+    """
+    t = Trace(trace_id)
+    t.root = Span(t, name, None, attributes)
+    with _activate(t.root) as span:
+        yield span
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time the block as a child of the current span; yields the span, or
+    None when no trace is active
+    """
+    s = start_span(name, **attributes)
+    if s is None:
+        yield None
+        return
+    with _activate(s):
+        yield s
+
+
+# ---------- RECENT TRACES ----------
+class TraceStore:
+    """
+    The last max_traces finished traces, for the debug endpoint
+    """
+
+    def __init__(self, max_traces=TRACE_BUFFER):
+        self.max_traces = max_traces
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, t):
+        with self._lock:
+            self._traces[t.trace_id] = t
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+
+    def get(self, trace_id):
+        with self._lock:
+            return self._traces.get(trace_id)
+
+    def slow(self, min_ms=TRACE_SLOW_MS, limit=20):
+        """
+        Slowest recent traces of at least min_ms, slowest first
+        """
+        with self._lock:
+            candidates = list(self._traces.values())
+        slow = [t for t in candidates if t.duration * 1000 >= min_ms]
+        slow.sort(key=lambda t: t.duration, reverse=True)
+        return slow[:limit]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._traces)
+
+
+# ---------- EXPORT ----------
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans):
+    """
+    OTLP/HTTP JSON body for a batch of finished spans
+    """
+    otlp_spans = []
+    for s in spans:
+        attributes = [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()]
+        if s.error:
+            attributes.append({"key": "error.message", "value": {"stringValue": s.error}})
+        item = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 2 if s.parent_id is None else 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.start_ns + int(s.duration * 1e9)),
+            "attributes": attributes,
+            "status": {"code": 2 if s.status == "error" else 1},
+        }
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        otlp_spans.append(item)
+
+    return {"resourceSpans": [{
+        "resource": {"attributes": [
+            {"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}
+        ]},
+        "scopeSpans": [{"scope": {"name": "tracing"}, "spans": otlp_spans}],
+    }]}
+
+
+class SpanExporter:
+    """
+    Hands finished spans to a background thread that writes them in
+    batches; export() never blocks and drops spans when the queue is full
+    """
+
+    def __init__(self, kind=TRACE_EXPORTER, path=TRACE_FILE, endpoint=TRACE_OTLP_ENDPOINT,
+                 max_queue=10000, max_bytes=int(TRACE_FILE_MAX_MB * 1024 * 1024)):
+        self.kind = kind
+        self.path = path
+        self.endpoint = endpoint
+        self.max_bytes = max_bytes
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        if self.kind == "none":
+            return
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._worker, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def _worker(self):
+        while True:
+            spans = [self._queue.get()]
+            while len(spans) < TRACE_EXPORT_BATCH:
+                try:
+                    spans.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # close() may land mid-batch when spans are still arriving
+            closing = any(s is None for s in spans)
+            spans = [s for s in spans if s is not None]
+            self._write(spans)
+            if closing:
+                return
+
+    def _write(self, spans):
+        if not spans:
+            return
+        try:
+            if self.kind == "otlp":
+                body = json.dumps(to_otlp(spans)).encode("utf-8")
+                request = urllib.request.Request(
+                    self.endpoint, data=body, headers={"Content-Type": "application/json"}
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+            else:
+                self._rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(s.to_dict()) + "\n" for s in spans))
+            self.exported += len(spans)
+        except Exception as e:
+            self.failed += len(spans)
+            print(f"Trace export error ({self.kind}): {e}")
+
+    def _rotate(self):
+        # Keep one previous file so disk use stays under twice max_bytes
+        try:
+            if self.max_bytes > 0 and os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, f"{self.path}.1")
+        except OSError:
+            pass
+
+    def close(self, timeout=5):
+        """
+        Write out queued spans and stop the exporter thread
+        """
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "exporter": self.kind,
+            "exported": self.exported,
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+traces = TraceStore()
+exporter = SpanExporter()
+atexit.register(exporter.close)
@@ -0,0 +1,216 @@
+"""
+Text-to-speech queue: sentences are spoken on a dedicated thread
+"""
+import os
+import platform
+import queue
+import re
+import threading
+import time
+
+from background_loop import VOICE_STAGE_LATENCY
+
+# Speaking rate assumed by the null backend; 0 finishes instantly
+TTS_NULL_WPS = float(os.getenv("TTS_NULL_WPS", "0"))
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# SAPI SpeakFlags
+_SVSF_ASYNC = 1
+_SVSF_PURGE_BEFORE_SPEAK = 2
+
+
+class NullBackend:
+    """
+    Speaks nothing; optionally takes as long as real speech would.
+    Interruptible and usable on any platform, e.g. for tests. Like every
+    backend, a stop() holds until the queue calls reset() for the next
+    sentence.
+    """
+
+    def __init__(self, words_per_second=TTS_NULL_WPS):
+        self.words_per_second = words_per_second
+        self.spoken = []
+        self._stop = threading.Event()
+
+    def reset(self):
+        self._stop.clear()
+
+    def speak(self, sentence):
+        if self.words_per_second > 0:
+            self._stop.wait(len(sentence.split()) / self.words_per_second)
+        if not self._stop.is_set():
+            self.spoken.append(sentence)
+
+    def stop(self):
+        self._stop.set()
+
+
+class SapiBackend:
+    """
+    Windows SAPI voice. Speech is started asynchronously and polled, so
+    stop() can purge it mid-sentence from another thread.
+    """
+
+    def __init__(self):
+        import pythoncom
+        import win32com.client
+
+        self._pythoncom = pythoncom
+        self._dispatch = win32com.client.Dispatch
+        self._voice = None
+        self._stop = threading.Event()
+
+    def reset(self):
+        self._stop.clear()
+
+    def speak(self, sentence):
+        if self._voice is None:
+            # COM objects belong to the thread that created them
+            self._pythoncom.CoInitialize()
+            self._voice = self._dispatch("SAPI.SpVoice")
+        if self._stop.is_set():
+            return
+        self._voice.Speak(sentence, _SVSF_ASYNC)
+        while not self._voice.WaitUntilDone(50):
+            if self._stop.is_set():
+                self._voice.Speak("", _SVSF_ASYNC | _SVSF_PURGE_BEFORE_SPEAK)
+                return
+
+    def stop(self):
+        self._stop.set()
+
+
+def default_backend():
+    """
+    SAPI on Windows when pywin32 is installed, otherwise the null backend
+    """
+    if platform.system() == "Windows":
+        try:
+            return SapiBackend()
+        except Exception as e:
+            print(f"⚠️  TTS initialization failed: {e}")
+    return NullBackend()
+
+
+class SpeechStream:
+    """
+    One response being spoken. write() accepts text in any chunks (e.g.
+    streamed tokens) and queues each sentence as soon as it is complete.
+    """
+
+    def __init__(self, generation):
+        self.generation = generation
+        self._sentences = queue.Queue()
+        self._buffer = ""
+        self._opened = time.perf_counter()
+
+    def write(self, text):
+        self._buffer += text
+        parts = _SENTENCE_END_RE.split(self._buffer)
+        self._buffer = parts.pop()
+        for sentence in parts:
+            if sentence.strip():
+                self._sentences.put(sentence.strip())
+
+    def close(self):
+        if self._buffer.strip():
+            self._sentences.put(self._buffer.strip())
+        self._buffer = ""
+        self._sentences.put(None)
+
+
+class TTSQueue:
+    """
+    Producer/consumer speech pipeline. Responses are opened as streams
+    and spoken in the order they were opened, each sentence starting as
+    soon as it arrives. stop() cancels the sentence being spoken and
+    everything queued behind it; the caller never blocks on playback.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or default_backend()
+        self._streams = queue.Queue()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._pending = 0
+        self._thread = threading.Thread(target=self._run, name="tts", daemon=True)
+        self._thread.start()
+
+    def open(self):
+        """
+        Reserve the next place in the speaking order
+        """
+        with self._lock:
+            stream = SpeechStream(self._generation)
+            self._pending += 1
+            self._idle.clear()
+        self._streams.put(stream)
+        return stream
+
+    def say(self, text):
+        """
+        Queue a complete text for speaking
+        """
+        stream = self.open()
+        stream.write(text)
+        stream.close()
+        return stream
+
+    def stop(self):
+        """
+        Silence the current sentence and drop everything queued
+        """
+        with self._lock:
+            self._generation += 1
+            self.backend.stop()
+
+    def wait_idle(self, timeout=None):
+        return self._idle.wait(timeout)
+
+    def close(self, timeout=10.0):
+        """
+        Let queued speech finish, then stop the thread
+        """
+        self.wait_idle(timeout)
+        self._streams.put(None)
+        self._thread.join(timeout)
+
+    def _current(self, stream):
+        return stream.generation == self._generation
+
+    def _run(self):
+        while True:
+            stream = self._streams.get()
+            if stream is None:
+                return
+            first = True
+            while True:
+                try:
+                    sentence = stream._sentences.get(timeout=0.05)
+                except queue.Empty:
+                    # Do not wait on a stopped response that is still generating
+                    if not self._current(stream):
+                        break
+                    continue
+                if sentence is None:
+                    break
+                with self._lock:
+                    if not self._current(stream):
+                        continue
+                    # Re-arm the backend only while this response is current;
+                    # a stop() from here on interrupts the sentence
+                    self.backend.reset()
+                if first:
+                    VOICE_STAGE_LATENCY.observe(time.perf_counter() - stream._opened, stage="tts_first")
+                    first = False
+                try:
+                    self.backend.speak(sentence)
+                except Exception as e:
+                    print(f"TTS Error: {e}")
+            with self._lock:
+                self._pending -= 1
+                if self._pending == 0:
+                    self._idle.set()
@@ -0,0 +1,209 @@
+"""
+Local vector index for relevance-based memory retrieval
+"""
+import importlib.util
+import os
+import re
+import threading
+import zlib
+
+# NumPy is imported on first use so it stays off the startup path
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+if not NUMPY_AVAILABLE:
+    print("⚠️  Warning: NumPy not available. Relevant-memory recall disabled.")
+
+# Embedding width; 256 float32 dims keep 100k turns around 100 MB
+VECTOR_DIM = int(os.getenv("VECTOR_DIM", "256"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """
+    Offline embedder: unigrams and bigrams hashed into a fixed number of
+    signed buckets, L2-normalised. No model download, no network.
+    """
+
+    def __init__(self, dim=VECTOR_DIM):
+        self.dim = dim
+        self._cache = {}
+
+    def _features(self, text):
+        tokens = _TOKEN_RE.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def _hash(self, feature):
+        h = self._cache.get(feature)
+        if h is None:
+            h = zlib.crc32(feature.encode("utf-8"))
+            if len(self._cache) < 200000:
+                self._cache[feature] = h
+        return h
+
+    def embed(self, texts):
+        """
+        Embed a batch of texts into an (n, dim) float32 matrix
+        """
+        import numpy as np
+
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (self._hash(f) for f in self._features(text)), dtype=np.uint32
+            )
+            if not hashes.size:
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], hashes % self.dim, signs)
+
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class _Shard:
+    """
+    Growable contiguous matrix of one session's turn vectors. Starts
+    small, since most sessions only ever hold a few turns.
+    """
+
+    def __init__(self, dim, capacity=4):
+        import numpy as np
+
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.rows = []
+
+    def add(self, vectors, rows):
+        import numpy as np
+
+        n = len(self.rows)
+        needed = n + len(rows)
+        if needed > self.vectors.shape[0]:
+            capacity = max(needed, self.vectors.shape[0] * 2)
+            grown = np.zeros((capacity, self.vectors.shape[1]), dtype=np.float32)
+            grown[:n] = self.vectors[:n]
+            self.vectors = grown
+        self.vectors[n:needed] = vectors
+        self.rows.extend(rows)
+
+    def unseen(self, rows):
+        """
+        Positions of the rows not held yet. A turn matches on its stored
+        id, or on its text while its write-behind insert has not
+        returned an id.
+        """
+        ids, pending = set(), set()
+        for r in self.rows:
+            if r.get("id") is None:
+                pending.add((r.get("query"), r.get("response")))
+            else:
+                ids.add(r["id"])
+        return [
+            i for i, r in enumerate(rows)
+            if r.get("id") not in ids and (r.get("query"), r.get("response")) not in pending
+        ]
+
+
+class VectorIndex:
+    """
+    In-memory cosine index over conversation turns, sharded by session.
+    A query only scans its own session's matrix, so cost does not grow
+    with the total number of stored turns. The owner drops a session's
+    shard when it forgets the session.
+    """
+
+    def __init__(self, embedder=None):
+        self.embedder = embedder or HashingEmbedder()
+        self._shards = {}
+        self._lock = threading.Lock()
+        self.size = 0
+
+    @staticmethod
+    def preload():
+        """
+        Import NumPy now, e.g. on a startup thread, so the first turn
+        indexed on the event loop does not pay for it
+        """
+        import numpy
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._shards
+
+    def sessions(self):
+        with self._lock:
+            return len(self._shards)
+
+    def drop(self, session_id):
+        """
+        Forget a session's vectors
+        """
+        with self._lock:
+            shard = self._shards.pop(session_id, None)
+            if shard is not None:
+                self.size -= len(shard.rows)
+
+    @staticmethod
+    def turn_text(row):
+        return f"{row.get('query', '')} {row.get('response', '')}"
+
+    def add(self, rows, session_key="session_id", sessions=None):
+        """
+        Incrementally index a batch of turns (dicts with query/response).
+        Turns already in their session's shard are skipped. If sessions
+        is given, only turns of sessions it contains are indexed; it is
+        checked under the index lock, so a concurrent drop() wins.
+        """
+        if sessions is not None:
+            rows = [r for r in rows if r.get(session_key) in sessions]
+        if not rows:
+            return
+        vectors = self.embedder.embed([self.turn_text(r) for r in rows])
+
+        by_session = {}
+        for i, row in enumerate(rows):
+            by_session.setdefault(row.get(session_key), []).append(i)
+
+        with self._lock:
+            for session_id, positions in by_session.items():
+                if sessions is not None and session_id not in sessions:
+                    continue
+                shard = self._shards.get(session_id)
+                if shard is None:
+                    shard = self._shards[session_id] = _Shard(self.embedder.dim)
+                else:
+                    fresh = shard.unseen([rows[i] for i in positions])
+                    positions = [positions[j] for j in fresh]
+                    if not positions:
+                        continue
+                shard.add(vectors[positions], [rows[i] for i in positions])
+                self.size += len(positions)
+
+    def search(self, queries, session_id, k=3, min_score=0.0):
+        """
+        Top-k cosine matches for a batch of query strings within one
+        session. Returns one list of (score, row) per query.
+        """
+        import numpy as np
+
+        with self._lock:
+            shard = self._shards.get(session_id)
+            if shard is None or not shard.rows:
+                return [[] for _ in queries]
+            n = len(shard.rows)
+            matrix = shard.vectors[:n]
+            rows = shard.rows[:n]
+
+        q = self.embedder.embed(queries)
+        scores = q @ matrix.T
+
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for qi in range(len(queries)):
+            order = top[qi][np.argsort(-scores[qi, top[qi]])]
+            results.append([
+                (float(scores[qi, j]), rows[j])
+                for j in order if scores[qi, j] > min_score
+            ])
+        return results
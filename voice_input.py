@@ -0,0 +1,140 @@
+"""
+Continuous microphone capture with overlapping speech recognition
+"""
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import speech_recognition as sr
+
+from background_loop import VOICE_STAGE_LATENCY
+from metrics import registry
+from wake_word import SAMPLE_RATE, SAMPLE_WIDTH
+
+# Seconds of ambient noise sampled once at startup
+VOICE_CALIBRATION_SECONDS = float(os.getenv("VOICE_CALIBRATION_SECONDS", "1.0"))
+# Longest single phrase captured before it is cut off
+VOICE_PHRASE_LIMIT = float(os.getenv("VOICE_PHRASE_LIMIT", "8"))
+# Phrases being recognized at the same time
+VOICE_RECOGNITION_WORKERS = int(os.getenv("VOICE_RECOGNITION_WORKERS", "2"))
+
+VOICE_RECOGNITIONS = registry.counter(
+    "jarvis_voice_recognitions_total", "Captured phrases by the engine that handled them", ["engine"]
+)
+
+
+class Utterance:
+    """
+    One captured phrase and its timings (seconds)
+    """
+    __slots__ = ("text", "audio_seconds", "captured", "recognize_seconds", "error", "engine")
+
+    def __init__(self, text="", audio_seconds=0.0, captured=0.0, recognize_seconds=0.0, error=None, engine=None):
+        self.text = text
+        self.audio_seconds = audio_seconds
+        self.captured = captured
+        self.recognize_seconds = recognize_seconds
+        self.error = error
+        self.engine = engine
+
+
+class VoiceInput:
+    """
+    Calibrates the energy threshold once, then keeps the microphone open
+    with listen_in_background. Each captured phrase is handed to a small
+    recognition pool, so recognizing one phrase overlaps with capturing
+    the next. Results are queued in the order they were spoken.
+
+    With dynamic_energy_threshold the recognizer keeps adapting the
+    threshold from the silence between phrases, which replaces the old
+    per-utterance adjust_for_ambient_noise call.
+
+    While awaiting_wake is set and a wake_detector is given, phrases are
+    checked for a wake word locally and never sent to the recognizer;
+    a detection comes back as an utterance whose text is the wake word.
+    """
+
+    def __init__(self, recognizer, mic, recognize=None, wake_detector=None,
+                 calibration_seconds=VOICE_CALIBRATION_SECONDS,
+                 phrase_time_limit=VOICE_PHRASE_LIMIT,
+                 workers=VOICE_RECOGNITION_WORKERS):
+        self.recognizer = recognizer
+        self.mic = mic
+        self.recognize = recognize or recognizer.recognize_google
+        self.wake_detector = wake_detector
+        self.awaiting_wake = False
+        self.calibration_seconds = calibration_seconds
+        self.phrase_time_limit = phrase_time_limit
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recognize")
+        self._results = queue.Queue()
+        self._stop = None
+
+    def start(self):
+        if self._stop is not None:
+            return self
+
+        with self.mic as source:
+            print("🎚️  Calibrating for ambient noise...")
+            self.recognizer.adjust_for_ambient_noise(source, duration=self.calibration_seconds)
+        self.recognizer.dynamic_energy_threshold = True
+        print(f"✓ Energy threshold {self.recognizer.energy_threshold:.0f}")
+
+        self._stop = self.recognizer.listen_in_background(
+            self.mic, self._on_phrase, phrase_time_limit=self.phrase_time_limit
+        )
+        return self
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop(wait_for_stop=False)
+            self._stop = None
+        self._pool.shutdown(wait=False)
+
+    def _on_phrase(self, recognizer, audio):
+        # Runs on the capture thread; hand off and get back to listening
+        captured = time.perf_counter()
+        audio_seconds = len(audio.frame_data) / float(audio.sample_rate * audio.sample_width)
+        spot = self.awaiting_wake and self.wake_detector is not None
+        self._results.put(self._pool.submit(self._transcribe, audio, audio_seconds, captured, spot))
+
+    def _spot(self, audio, utterance):
+        pcm = audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=SAMPLE_WIDTH)
+        detection = self.wake_detector.detect(pcm)
+        if detection is not None:
+            utterance.text = detection.label
+        utterance.recognize_seconds = time.perf_counter() - utterance.captured
+        VOICE_STAGE_LATENCY.observe(utterance.recognize_seconds, stage="wake")
+        return utterance
+
+    def _transcribe(self, audio, audio_seconds, captured, spot=False):
+        utterance = Utterance(audio_seconds=audio_seconds, captured=captured)
+        if spot:
+            utterance.engine = "wake_word"
+            VOICE_RECOGNITIONS.inc(engine="wake_word")
+            return self._spot(audio, utterance)
+
+        utterance.engine = "google"
+        VOICE_RECOGNITIONS.inc(engine="google")
+        try:
+            utterance.text = self.recognize(audio).lower()
+        except sr.UnknownValueError:
+            utterance.error = "unknown"
+        except sr.RequestError as e:
+            utterance.error = f"request: {e}"
+        except Exception as e:
+            utterance.error = f"unexpected: {e}"
+        utterance.recognize_seconds = time.perf_counter() - captured
+        VOICE_STAGE_LATENCY.observe(utterance.recognize_seconds, stage="recognize")
+        return utterance
+
+    def next_utterance(self, timeout=None):
+        """
+        The next phrase in spoken order, or None if nothing was captured
+        within timeout seconds
+        """
+        try:
+            future = self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return future.result()
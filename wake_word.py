@@ -0,0 +1,374 @@
+"""
+Offline wake-word front end: energy VAD and template keyword spotting
+Run this with: python wake_word.py record <label> [count]
+           or: python wake_word.py test <clip.wav> [...]
+
+Works on 16 kHz mono 16-bit PCM frames. The VAD tracks the noise floor
+and cuts speech segments out of the stream; each short segment is
+compared against recorded wake-word templates (MFCC features, DTW).
+Nothing leaves the machine until a wake word has been spotted.
+"""
+import os
+import re
+import sys
+import time
+import wave
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    print("⚠️  Warning: NumPy not available. Offline wake-word detection disabled.")
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+# Directory of <wake_word>_<n>.wav recordings, e.g. hey_jarvis_1.wav
+WAKE_TEMPLATES_DIR = os.getenv("WAKE_TEMPLATES_DIR", "wake_templates")
+# Normalised DTW distance for a match; derived from the templates if unset
+WAKE_THRESHOLD = os.getenv("WAKE_THRESHOLD")
+# dB above the noise floor that counts as speech
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "10"))
+
+_FRAME_MS = 20
+_PREROLL_MS = 100
+_HANGOVER_MS = 300
+_MIN_SPEECH_MS = 200
+_MAX_SEGMENT_MS = 2500
+_LABEL_RE = re.compile(r"_\d+$")
+
+
+# ---------- VOICE ACTIVITY ----------
+class EnergyVAD:
+    """
+    Streaming energy-based voice activity detector. feed() accepts PCM
+    bytes of any length and returns the speech segments that finished
+    within them. The noise floor follows quiet frames down immediately
+    and drifts up slowly, so it adapts to the room while listening.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, margin_db=VAD_MARGIN_DB, floor_db=None):
+        self.sample_rate = sample_rate
+        self.margin_db = margin_db
+        self.frame_samples = sample_rate * _FRAME_MS // 1000
+        self.floor_db = floor_db
+        self._pending = b""
+        self._preroll = []
+        self._segment = []
+        self._voiced = 0
+        self._silent = 0
+
+    def _frames_for(self, ms):
+        return max(1, ms // _FRAME_MS)
+
+    def feed(self, pcm):
+        self._pending += pcm
+        frame_bytes = self.frame_samples * SAMPLE_WIDTH
+        usable = len(self._pending) - len(self._pending) % frame_bytes
+        if not usable:
+            return []
+
+        samples = np.frombuffer(self._pending[:usable], dtype=np.int16).astype(np.float32)
+        self._pending = self._pending[usable:]
+        frames = samples.reshape(-1, self.frame_samples)
+        energy = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+        segments = []
+        for frame, db in zip(frames, energy):
+            segment = self._step(frame, float(db))
+            if segment is not None:
+                segments.append(segment)
+        return segments
+
+    def _step(self, frame, db):
+        if self.floor_db is None:
+            self.floor_db = db
+        speech = db > self.floor_db + self.margin_db
+
+        if not speech:
+            # Down immediately, up slowly, and only from non-speech frames
+            self.floor_db = min(db, 0.95 * self.floor_db + 0.05 * db)
+
+        if not self._segment:
+            if speech:
+                self._segment = self._preroll + [frame]
+                self._voiced, self._silent = 1, 0
+            else:
+                self._preroll.append(frame)
+                self._preroll = self._preroll[-self._frames_for(_PREROLL_MS):]
+            return None
+
+        self._segment.append(frame)
+        if speech:
+            self._voiced += 1
+            self._silent = 0
+        else:
+            self._silent += 1
+
+        if self._silent >= self._frames_for(_HANGOVER_MS) or \
+                len(self._segment) >= self._frames_for(_MAX_SEGMENT_MS):
+            return self._close()
+        return None
+
+    def _close(self):
+        segment, voiced = self._segment, self._voiced
+        self._segment, self._preroll = [], []
+        self._voiced = self._silent = 0
+        if voiced < self._frames_for(_MIN_SPEECH_MS):
+            return None
+        return np.concatenate(segment)
+
+    def flush(self):
+        """
+        End of stream: return the segment still open, if any
+        """
+        if not self._segment:
+            return None
+        return self._close()
+
+
+# ---------- FEATURES ----------
+def _mel_filterbank(n_mels, n_fft, sample_rate):
+    def hz_to_mel(hz):
+        return 2595 * np.log10(1 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700 * (10 ** (mel / 2595.0) - 1)
+
+    mels = np.linspace(hz_to_mel(60), hz_to_mel(sample_rate / 2), n_mels + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mels) / sample_rate).astype(int)
+    bank = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+    for m in range(1, n_mels + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        for k in range(left, center):
+            bank[m - 1, k] = (k - left) / max(1, center - left)
+        for k in range(center, right):
+            bank[m - 1, k] = (right - k) / max(1, right - center)
+    return bank
+
+
+class MFCC:
+    """
+    13 cepstral coefficients per 10 ms hop (c0 dropped), mean-normalised
+    and L2-normalised per frame so loudness does not matter
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, n_fft=512, n_mels=26, n_ceps=13):
+        self.win = sample_rate * 25 // 1000
+        self.hop = sample_rate * 10 // 1000
+        self.n_fft = n_fft
+        self.window = np.hamming(self.win).astype(np.float32)
+        self.bank = _mel_filterbank(n_mels, n_fft, sample_rate)
+        k = np.arange(n_mels)
+        self.dct = np.cos(np.pi / n_mels * (k + 0.5)[None, :] * np.arange(1, n_ceps)[:, None]).astype(np.float32)
+
+    def __call__(self, signal):
+        signal = np.asarray(signal, dtype=np.float32)
+        signal = np.append(signal[0], signal[1:] - 0.97 * signal[:-1])
+        if len(signal) < self.win:
+            signal = np.pad(signal, (0, self.win - len(signal)))
+        count = 1 + (len(signal) - self.win) // self.hop
+        idx = np.arange(self.win)[None, :] + self.hop * np.arange(count)[:, None]
+        frames = signal[idx] * self.window
+        power = np.abs(np.fft.rfft(frames, self.n_fft)) ** 2
+        ceps = np.log(power @ self.bank.T + 1e-6) @ self.dct.T
+        ceps -= ceps.mean(axis=0)
+        ceps /= np.linalg.norm(ceps, axis=1, keepdims=True) + 1e-6
+        return ceps
+
+
+def dtw_distance(a, b, band=0.3):
+    """
+    Length-normalised DTW over cosine distance, inside a Sakoe-Chiba band
+    """
+    n, m = len(a), len(b)
+    cost = (1.0 - a @ b.T).tolist()
+    width = max(int(band * max(n, m)), abs(n - m) + 1)
+    inf = float("inf")
+    prev = [inf] * (m + 1)
+    prev[0] = 0.0
+    for i in range(1, n + 1):
+        row = [inf] * (m + 1)
+        center = i * m // n
+        lo, hi = max(1, center - width), min(m, center + width)
+        ci = cost[i - 1]
+        for j in range(lo, hi + 1):
+            best = prev[j - 1]
+            if prev[j] < best:
+                best = prev[j]
+            if row[j - 1] < best:
+                best = row[j - 1]
+            row[j] = ci[j - 1] + best
+        prev = row
+    return prev[m] / (n + m)
+
+
+# ---------- KEYWORD SPOTTING ----------
+class WakeDetection:
+    __slots__ = ("label", "score", "segment_seconds", "elapsed")
+
+    def __init__(self, label, score, segment_seconds, elapsed):
+        self.label = label
+        self.score = score
+        self.segment_seconds = segment_seconds
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return f"WakeDetection({self.label!r}, score={self.score:.3f}, segment={self.segment_seconds:.2f}s)"
+
+
+def read_wav(path):
+    """
+    16 kHz mono 16-bit PCM bytes from a WAV file
+    """
+    with wave.open(path, "rb") as f:
+        if f.getframerate() != SAMPLE_RATE or f.getnchannels() != 1 or f.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError(f"{path}: expected {SAMPLE_RATE} Hz mono 16-bit PCM")
+        return f.readframes(f.getnframes())
+
+
+def write_wav(path, pcm):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(SAMPLE_WIDTH)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(pcm)
+
+
+def _segments(pcm, sample_rate=SAMPLE_RATE):
+    """
+    All VAD segments of a complete clip, with the noise floor seeded from
+    the quietest tenth of the clip
+    """
+    frame = sample_rate * _FRAME_MS // 1000
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+    frames = samples[:len(samples) - len(samples) % frame].reshape(-1, frame)
+    if not len(frames):
+        return []
+    energy = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    vad = EnergyVAD(sample_rate, floor_db=float(np.percentile(energy, 10)))
+    segments = vad.feed(pcm)
+    tail = vad.flush()
+    if tail is not None:
+        segments.append(tail)
+    return segments
+
+
+def _speech(pcm):
+    """
+    Longest speech segment of a clip, or the whole clip if none is found
+    """
+    segments = _segments(pcm)
+    if segments:
+        return max(segments, key=len)
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+
+
+class WakeWordDetector:
+    """
+    Spots wake words in a captured phrase by comparing each VAD segment
+    with the templates. Segments much shorter or longer than every
+    template are rejected before any DTW work.
+    """
+
+    def __init__(self, templates, threshold=None, sample_rate=SAMPLE_RATE):
+        if not templates:
+            raise ValueError("At least one wake-word template is required")
+        self.sample_rate = sample_rate
+        self.mfcc = MFCC(sample_rate)
+        self.templates = [(label, self.mfcc(_speech(pcm))) for label, pcm in templates]
+        self.threshold = float(threshold) if threshold is not None else self._derive_threshold()
+
+    @classmethod
+    def from_directory(cls, path=WAKE_TEMPLATES_DIR, threshold=WAKE_THRESHOLD):
+        """
+        Load <label>_<n>.wav templates; None if there are none
+        """
+        if not NUMPY_AVAILABLE or not os.path.isdir(path):
+            return None
+        templates = []
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith(".wav"):
+                label = _LABEL_RE.sub("", name[:-4]).replace("_", " ").lower()
+                templates.append((label, read_wav(os.path.join(path, name))))
+        return cls(templates, threshold) if templates else None
+
+    def _derive_threshold(self):
+        # Allow a little more than the spread between the user's own takes
+        spread = [
+            dtw_distance(a, b)
+            for i, (la, a) in enumerate(self.templates)
+            for lb, b in self.templates[i + 1:]
+            if la == lb
+        ]
+        return max(spread) * 1.25 if spread else 0.35
+
+    def score(self, segment):
+        """
+        Best (label, distance) for one speech segment
+        """
+        feats = self.mfcc(segment)
+        best = (None, float("inf"))
+        for label, template in self.templates:
+            ratio = len(feats) / len(template)
+            if ratio < 0.5 or ratio > 2.0:
+                continue
+            distance = dtw_distance(feats, template)
+            if distance < best[1]:
+                best = (label, distance)
+        return best
+
+    def _check(self, segment):
+        start = time.perf_counter()
+        label, distance = self.score(segment)
+        if label is None or distance > self.threshold:
+            return None
+        return WakeDetection(label, distance, len(segment) / self.sample_rate, time.perf_counter() - start)
+
+    def detect(self, pcm):
+        """
+        Whole clip: first detection in it, or None
+        """
+        for segment in _segments(pcm, self.sample_rate):
+            detection = self._check(segment)
+            if detection is not None:
+                return detection
+        return None
+
+
+# ---------- CLI ----------
+def _record(label, count):
+    import speech_recognition as sr
+
+    os.makedirs(WAKE_TEMPLATES_DIR, exist_ok=True)
+    recognizer = sr.Recognizer()
+    with sr.Microphone(sample_rate=SAMPLE_RATE) as source:
+        recognizer.adjust_for_ambient_noise(source, duration=1.0)
+        for n in range(1, count + 1):
+            print(f"🎤 Say '{label}' ({n}/{count})...")
+            audio = recognizer.listen(source, timeout=10, phrase_time_limit=3)
+            path = os.path.join(WAKE_TEMPLATES_DIR, f"{label.replace(' ', '_')}_{n}.wav")
+            write_wav(path, audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=SAMPLE_WIDTH))
+            print(f"✓ Saved {path}")
+
+
+def _test(paths):
+    detector = WakeWordDetector.from_directory()
+    if detector is None:
+        print(f"No templates in {WAKE_TEMPLATES_DIR}/ (record some first)")
+        return
+    print(f"Templates: {len(detector.templates)}  threshold: {detector.threshold:.3f}")
+    for path in paths:
+        start = time.perf_counter()
+        detection = detector.detect(read_wav(path))
+        print(f"{path}: {detection} in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "record":
+        _record(sys.argv[2].lower(), int(sys.argv[3]) if len(sys.argv) > 3 else 3)
+    elif len(sys.argv) >= 3 and sys.argv[1] == "test":
+        _test(sys.argv[2:])
+    else:
+        print(__doc__)